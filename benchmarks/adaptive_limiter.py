@@ -0,0 +1,95 @@
+"""Throughput and throttling of many threads against an API that can only serve so many calls at once.
+
+A simulated API takes `--latency` per call and answers 429 right away to calls beyond its
+`--capacity`. Every thread of a shared `Client` makes calls back to back, first without a
+limiter, then with an `AdaptiveLimiter`. No request leaves the process.
+
+    python -m benchmarks.adaptive_limiter [--threads 32] [--capacity 8] [--seconds 3]
+"""
+
+import argparse
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from futurehealth.client import Client, exceptions
+from futurehealth.client.limiter import AdaptiveLimiter
+
+
+class Response:
+    def __init__(self, status_code):
+        self.status_code = status_code
+        self.text = ''
+
+    def json(self):
+        return {'success': self.status_code == 200, 'body': {}}
+
+
+class OverloadedTransport:
+    def __init__(self, capacity: int, latency: float):
+        self.capacity = capacity
+        self.latency = latency
+        self.in_flight = 0
+        self.lock = threading.Lock()
+
+    def send(self, method, url, **kwargs):
+        with self.lock:
+            if self.in_flight >= self.capacity:
+                return Response(429)
+            self.in_flight += 1
+        time.sleep(self.latency)
+        with self.lock:
+            self.in_flight -= 1
+        return Response(200)
+
+    def close(self):
+        pass
+
+
+def run(client: Client, threads: int, seconds: float) -> tuple[int, int]:
+    """Successful and throttled calls made by `threads` threads in `seconds`."""
+    deadline = time.monotonic() + seconds
+    counts = {'ok': 0, 'throttled': 0}
+    lock = threading.Lock()
+
+    def worker():
+        while time.monotonic() < deadline:
+            try:
+                client.get('unified-refunds')
+                outcome = 'ok'
+            except exceptions.ClientError:
+                outcome = 'throttled'
+            with lock:
+                counts[outcome] += 1
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        for _ in range(threads):
+            pool.submit(worker)
+    return counts['ok'], counts['throttled']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--threads', type=int, default=32, help='Threads sharing the client')
+    parser.add_argument('--capacity', type=int, default=8, help='Calls the API serves at once')
+    parser.add_argument('--latency', type=float, default=0.01, help='Seconds per served call')
+    parser.add_argument('--seconds', type=float, default=3, help='Seconds each variant runs')
+    args = parser.parse_args()
+    # the limiter logs every halving
+    logging.disable(logging.WARNING)
+
+    variants = {
+        'no limiter': None,
+        'AdaptiveLimiter': AdaptiveLimiter(maximum=args.threads),
+    }
+    print(f'{"variant":<20} {"ok/s":>10} {"429/s":>10} {"429 share":>10}')
+    for name, limiter in variants.items():
+        client = Client(token='token', transport=OverloadedTransport(args.capacity, args.latency), limiter=limiter)
+        ok, throttled = run(client, args.threads, args.seconds)
+        share = throttled / max(1, ok + throttled)
+        print(f'{name:<20} {ok / args.seconds:>10.0f} {throttled / args.seconds:>10.0f} {share:>10.1%}')
+
+
+if __name__ == '__main__':
+    main()
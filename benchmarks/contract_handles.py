@@ -0,0 +1,50 @@
+"""Memory and creation time of `ContractClient` handles.
+
+Compares handles sharing one `Client` with what each handle used to cost as its own
+`requests.Session` (adapters, connection pools, cookie jar). No request is made.
+
+    python -m benchmarks.contract_handles [--handles 10000]
+"""
+
+import argparse
+import gc
+import time
+import tracemalloc
+
+import requests
+
+from futurehealth.client import Client, ContractClient
+
+
+def measure(factory, count: int) -> tuple[float, float]:
+    """Bytes allocated and seconds spent per object, creating `count` of them (and keeping them alive)."""
+    gc.collect()
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    start = time.perf_counter()
+    handles = [factory(i) for i in range(count)]
+    elapsed = time.perf_counter() - start
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del handles
+    return (after - before) / count, elapsed / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--handles', type=int, default=10_000, help='Number of handles created per variant')
+    args = parser.parse_args()
+
+    client = Client(token='token')
+    variants = {
+        'ContractClient view': lambda i: ContractClient(client, f'contract-{i}'),
+        'requests.Session per handle': lambda i: requests.Session(),
+    }
+    print(f'{"variant":<30} {"bytes/handle":>14} {"µs/handle":>12}')
+    for name, factory in variants.items():
+        size, seconds = measure(factory, args.handles)
+        print(f'{name:<30} {size:>14,.0f} {seconds * 1e6:>12.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""Tail latency of building lookups with and without hedged requests.
+
+A simulated API answers in `--fast` seconds, except for a `--slow-share` of requests that take
+`--slow` seconds. Lookups run one after another, first without a hedger, then with one hedging
+at the observed p95 (capped to 10% extra requests). No request leaves the process.
+
+    python -m benchmarks.hedging [--calls 1000] [--slow-share 0.03]
+"""
+
+import argparse
+import random
+import statistics
+import time
+
+from futurehealth.client import Client, ContractClient
+from futurehealth.client.hedge import Hedger
+
+
+class Response:
+    status_code = 200
+    text = ''
+
+    def json(self):
+        return {'success': True, 'body': {'buildings': []}}
+
+
+class LongTailTransport:
+    def __init__(self, fast: float, slow: float, slow_share: float):
+        self.fast = fast
+        self.slow = slow
+        self.slow_share = slow_share
+        self.sent = 0
+
+    def send(self, method, url, **kwargs):
+        self.sent += 1
+        time.sleep(self.slow if random.random() < self.slow_share else self.fast)
+        return Response()
+
+    def close(self):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--calls', type=int, default=1000, help='Lookups timed per variant')
+    parser.add_argument('--fast', type=float, default=0.005, help='Seconds of most responses')
+    parser.add_argument('--slow', type=float, default=0.1, help='Seconds of slow responses')
+    parser.add_argument('--slow-share', type=float, default=0.03, help='Share of slow responses')
+    args = parser.parse_args()
+
+    print(f'{"variant":<12} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8} {"requests":>9} {"win ratio":>10}')
+    for name, hedger in {'no hedging': None, 'hedged p95': Hedger()}.items():
+        transport = LongTailTransport(args.fast, args.slow, args.slow_share)
+        client = Client(token='token', transport=transport, hedger=hedger)
+        contract = ContractClient(client, 'contract')
+        latencies = []
+        for i in range(args.calls):
+            start = time.perf_counter()
+            contract.load_buildings(f'{i:09d}')
+            latencies.append((time.perf_counter() - start) * 1000)
+        p = statistics.quantiles(latencies, n=100)
+        ratio = client.metrics.ratio('hedge_wins', 'hedges')
+        print(
+            f'{name:<12} {p[49]:>8.1f} {p[94]:>8.1f} {p[98]:>8.1f} {transport.sent / args.calls:>8.2f}x'
+            f' {"-" if ratio is None else f"{ratio:.0%}":>10}'
+        )
+        client.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""Per-call overhead of the middleware pipeline in `Client.request`.
+
+Calls go to an in-memory transport returning a canned response, so only client-side work is
+timed: the built-in middlewares alone, with extra no-op middlewares, and the same steps
+(URL joining, headers, timeout, decoding) inlined as `Client.request` did before middlewares.
+
+    python -m benchmarks.middleware_overhead [--calls 100000]
+"""
+
+import argparse
+import time
+
+from futurehealth.client import Client
+from futurehealth.client.middleware import Middleware, _api_headers, _parse_response, endpoint_name
+
+
+class Response:
+    status_code = 200
+    text = '{"success": true, "body": {}}'
+
+    def json(self):
+        return {'success': True, 'body': {}}
+
+
+class MemoryTransport:
+    response = Response()
+
+    def send(self, method, url, **kwargs):
+        return self.response
+
+    def close(self):
+        pass
+
+
+def inline_request(client: Client, method, url, headers=None, **kwargs):
+    """What `Client.request` did before middlewares, for comparison."""
+    endpoint_name(url)
+    url = f'{client.base_url}/{url.lstrip("/")}'
+    headers = _api_headers(client.partnership, client.language, client.token, headers)
+    if client.timeout is not None and 'timeout' not in kwargs:
+        kwargs['timeout'] = client.timeout
+    return _parse_response(client.transport.send(method, url, headers=headers, **kwargs))
+
+
+def per_call(fn, calls: int) -> float:
+    start = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    return (time.perf_counter() - start) / calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--calls', type=int, default=100_000, help='Number of calls timed per variant')
+    args = parser.parse_args()
+
+    client = Client(token='token', transport=MemoryTransport())
+    extra = Client(token='token', transport=MemoryTransport(), middlewares=[Middleware() for _ in range(5)])
+    variants = {
+        'inlined (before middlewares)': lambda: inline_request(client, 'GET', 'contracts'),
+        'built-in middlewares': lambda: client.request('GET', 'contracts', _token=True),
+        '+5 no-op middlewares': lambda: extra.request('GET', 'contracts', _token=True),
+    }
+    baseline = None
+    print(f'{"variant":<30} {"µs/call":>10} {"overhead":>10}')
+    for name, fn in variants.items():
+        seconds = per_call(fn, args.calls)
+        baseline = baseline or seconds
+        print(f'{name:<30} {seconds * 1e6:>10.2f} {(seconds - baseline) * 1e6:>+9.2f}µs')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,12 @@
+import hashlib
+import itertools
+import json
 import mimetypes
-import random
+import threading
+import time
+from collections import deque
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
 from dataclasses import dataclass
 from pathlib import Path
 from urllib.parse import quote
@@ -7,6 +14,91 @@ from urllib.parse import quote
 import requests
 
 from . import exceptions, models
+from .breaker import CircuitBreaker
+from .hedge import Hedger
+from .limiter import AdaptiveLimiter
+from .metrics import Metrics
+from .middleware import Call, default_middlewares, run_after, run_before, run_on_error
+from .multipart import CHUNK_SIZE, MultipartFile
+from .retry import LOGGER as RETRY_LOGGER
+from .retry import RetryPolicy
+from .singleflight import SingleFlight
+from .transport import RequestsTransport, Transport
+
+# How long (seconds) an uploaded but not yet submitted document can be reused instead of uploaded again
+UPLOAD_CACHE_TTL = 24 * 60 * 60
+# Default TTLs (seconds) for responses kept in `Client.cache`, per endpoint
+CACHE_TTLS = {
+    'contracts': 6 * 60 * 60,
+    'validate-feature': 6 * 60 * 60,
+    'refunds-requests/setup': 60 * 60,
+    'refunds-requests/loadBuildings': 30 * 24 * 60 * 60,
+    # uploaded documents (by content hash), reused while the server keeps them unattached
+    'files': UPLOAD_CACHE_TTL,
+}
+# TTLs used instead of CACHE_TTLS when the response is empty (negative caching)
+NEGATIVE_CACHE_TTLS = {
+    'refunds-requests/loadBuildings': 60 * 60,
+}
+# Endpoints whose cache entries are bounded, evicting the least recently used
+CACHE_MAX_ENTRIES = {
+    'refunds-requests/loadBuildings': 5000,
+}
+# Endpoints whose responses do not depend on the account, so survive a new login
+SHARED_CACHE_ENDPOINTS = {'refunds-requests/loadBuildings'}
+# Read-only endpoints: repeating a call has no side effect, so concurrent identical calls can share one request
+IDEMPOTENT_ENDPOINTS = {
+    'contracts',
+    'validate-feature',
+    'refunds-requests/setup',
+    'refunds-requests/loadBuildings',
+    'unified-refunds',
+}
+# `originId` values stay below this, to fit the 32-bit integers the API may use
+ORIGIN_ID_MODULUS = 10**9
+# Default number of `refundSubmissions` entries packed into each multiple-refunds-requests call
+REFUND_SUBMISSIONS_BATCH_SIZE = 10
+# Keys of multiple-refunds-requests responses (or of their body) listing per-entry results
+ENTRY_RESULTS_KEYS = ('results', 'resultCodeDetail')
+
+# Connections kept open to the API host, enough for the default worker pools of every command to share them
+POOL_MAXSIZE = 20
+
+
+def _flight_key(call: Call):
+    """Key under which identical concurrent calls share one response, or None if the call must not be shared.
+
+    Only calls to IDEMPOTENT_ENDPOINTS with nothing but query params and a JSON body qualify. The key includes
+    the Authorization header, so calls made for different accounts are never shared.
+    """
+    # requests.Session.get/post pass data/json/params=None, and allow_redirects=True for GET
+    given = {name for name, value in call.kwargs.items() if value is not None}
+    if (
+        call.endpoint not in IDEMPOTENT_ENDPOINTS
+        or call.args
+        or not given <= {'params', 'json', 'timeout', 'allow_redirects'}
+    ):
+        return None
+    return (
+        call.method.upper(),
+        call.url,
+        json.dumps(call.kwargs.get('params'), sort_keys=True, default=str),
+        json.dumps(call.kwargs.get('json'), sort_keys=True, default=str),
+        (call.headers or {}).get('Authorization'),
+    )
+
+
+def _retry_policy(policy: RetryPolicy | None, call: Call) -> RetryPolicy | None:
+    """The retry policy applying to `call`, if any."""
+    if policy is None:
+        return None
+    endpoints = IDEMPOTENT_ENDPOINTS if policy.endpoints is None else policy.endpoints
+    return policy if call.endpoint in endpoints else None
+
+
+def _log_retry(call: Call, attempt: int, delay: float, response=None, error=None):
+    outcome = error if error is not None else f'status {response.status_code}'
+    RETRY_LOGGER.warning('%s failed (%s), retrying in %.1fs (attempt %d)', call.endpoint, outcome, delay, attempt + 1)
 
 
 class Client(requests.Session):
@@ -14,6 +106,13 @@ class Client(requests.Session):
 
     Inherits from requests.Session to provide connection pooling
     and persistent configuration across requests.
+
+    One instance can be shared by many threads, which then reuse the same pooled (TLS) connections:
+    up to `pool_maxsize` per host, so size it to the number of threads making requests at once.
+    Each request reads the token once and builds its own headers, so a concurrent `login` never
+    mixes accounts within a request, and requests already in flight finish with the old token.
+    Session-level settings (`verify`, `headers`, adapters, `base_url`, ...) must not be changed
+    while requests are in flight.
     """
 
     def __init__(
@@ -24,6 +123,18 @@ class Client(requests.Session):
         language='en-US',
         timeout=30,
         verify=True,
+        cache=None,
+        cache_ttls=None,
+        refresh_cache=False,
+        single_flight=False,
+        pool_connections=requests.adapters.DEFAULT_POOLSIZE,
+        pool_maxsize=POOL_MAXSIZE,
+        transport: Transport | None = None,
+        middlewares=(),
+        retry: RetryPolicy | None = None,
+        limiter: AdaptiveLimiter | None = None,
+        hedger: Hedger | None = None,
+        breaker: CircuitBreaker | None = None,
         *args,
         **kwargs,
     ):
@@ -32,19 +143,105 @@ class Client(requests.Session):
         Args:
             base_url: Optional base URL for API requests
             partnership: Partnership identifier (default: 'vic')
+            cache: Optional `cache.DiskCache` for contract metadata and refund setup responses
+            cache_ttls: Per-endpoint TTL overrides for `CACHE_TTLS` (0 disables caching that endpoint)
+            refresh_cache: Skip cached responses, but still store fresh ones
+            single_flight: Share one in-flight request among threads making the same read at the same
+                time (same method, URL, params, body and account), see IDEMPOTENT_ENDPOINTS
+            pool_connections: Number of hosts to keep connection pools for
+            pool_maxsize: Connections kept open per host, at least the number of concurrent requests
+            transport: Backend sending the requests, such as `transport.HttpxTransport()` for HTTP/2
+                (default: this session, through `requests`, with the pool settings above)
+            middlewares: Extra `middleware.Middleware`s every call goes through, after the built-in ones
+            retry: `retry.RetryPolicy` for calls to idempotent endpoints failing on overload (429/502/503)
+                or network errors; retries are counted per endpoint in `metrics`
+            limiter: `limiter.AdaptiveLimiter` adapting how many requests are in flight at once to how the API
+                copes, optionally within a `limiter.RateBudget` shared with other processes
+            hedger: `hedge.Hedger` sending a second request for slow reads (building lookups and refund setup),
+                taking the first success; hedges sent and won are counted per endpoint in `metrics`
+            breaker: `breaker.CircuitBreaker` failing calls to an endpoint fast while it keeps failing, with
+                `exceptions.ClientCircuitOpenError`
             *args: Additional positional arguments for requests.Session
             **kwargs: Additional keyword arguments for requests.Session
         """
         super().__init__(*args, **kwargs)
+        for prefix in ('https://', 'http://'):
+            self.mount(
+                prefix, requests.adapters.HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+            )
         self.verify = verify
         self.base_url = base_url.rstrip('/')
         self.partnership = partnership
         self.language = language
         self.timeout = timeout
         self.token = token
+        self.cache = cache
+        self.cache_ttls = {**CACHE_TTLS, **(cache_ttls or {})}
+        self.refresh_cache = refresh_cache
+        # guid -> ((digest, is_invoice), response body) of documents uploaded (or reused) by this client and
+        # not attached to a submission yet, see `forget_uploads` and `release_uploads`
+        self._uploads = {}
+        self._uploads_lock = threading.Lock()
+        self.flights = SingleFlight() if single_flight else None
+        self.transport = transport if transport is not None else RequestsTransport(self, self._session_request)
+        self.middlewares = [*default_middlewares(), *middlewares]
+        self.retry = retry
+        self.limiter = limiter
+        self.hedger = hedger
+        # runs hedged calls, so the caller can wait on both requests of a call at once
+        self._hedge_pool = ThreadPoolExecutor(pool_maxsize * 2, 'futurehealth-hedge') if hedger is not None else None
+        self.metrics = Metrics()
+        self.breaker = breaker
+        if breaker is not None and breaker.metrics is None:
+            breaker.metrics = self.metrics
+        # serializes logins, which swap the token and clear the account cache together
+        self._login_lock = threading.Lock()
+
+    @property
+    def account_key(self) -> str:
+        """Stable, non-reversible identifier of the account behind the current token."""
+        token = self.token
+        if not token:
+            return ''
+        return hashlib.sha256(token.encode()).hexdigest()[:16]
+
+    def cached(self, endpoint: str, key: tuple, fetch):
+        """Return `fetch()`, going through `self.cache` when enabled for `endpoint`.
+
+        Entries are keyed by account (by partnership and API URL for SHARED_CACHE_ENDPOINTS), language
+        and `key`, and expire after `cache_ttls[endpoint]`, or NEGATIVE_CACHE_TTLS for empty responses.
+        """
+        ttl = self.cache_ttls.get(endpoint)
+        if self.cache is None or not ttl:
+            return fetch()
+        cache_key = self._cache_key(endpoint, key)
+        max_entries = CACHE_MAX_ENTRIES.get(endpoint)
+        if not self.refresh_cache:
+            value = self.cache.get(endpoint, cache_key, touch=max_entries is not None)
+            if value is not None:
+                return value
+        value = fetch()
+        if not value and endpoint in NEGATIVE_CACHE_TTLS:
+            ttl = min(ttl, NEGATIVE_CACHE_TTLS[endpoint])
+        self.cache.set(endpoint, cache_key, value, ttl, max_entries=max_entries)
+        return value
+
+    def _cache_key(self, endpoint: str, key: tuple) -> str:
+        if endpoint in SHARED_CACHE_ENDPOINTS:
+            # shared across accounts, never across partnerships or API environments
+            account = f'{self.partnership}@{self.base_url}'
+        else:
+            account = self.account_key
+        return '|'.join((account, self.language, *map(str, key)))
+
+    def invalidate_cache(self):
+        """Drop every cached response that depends on the account."""
+        if self.cache is not None:
+            for endpoint in self.cache_ttls.keys() - SHARED_CACHE_ENDPOINTS:
+                self.cache.clear(endpoint)
 
     def request(self, method, url, *args, _token=False, headers=None, **kwargs):
-        """Make an HTTP request.
+        """Make an HTTP request, through `self.middlewares`.
 
         If base_url is set and url is relative, prepends base_url to the URL.
 
@@ -55,41 +252,114 @@ class Client(requests.Session):
             **kwargs: Additional keyword arguments for requests.Session.request
 
         Returns:
-            requests.Response object
+            dict: decoded response body
         """
-        if self.base_url and not url.startswith(('http://', 'https://')):
-            url = f'{self.base_url}/{url.lstrip("/")}'
-            if headers is None:
-                headers = {}
-            headers['X-Partnership'] = self.partnership
-            headers['X-Partnershipapilink'] = self.partnership
-            headers['X-Language'] = self.language
-            headers['User-Agent'] = (
-                'Mozilla/5.0 (Macintosh; Intel Mac OS X 10.15; rv:145.0) Gecko/20100101 Firefox/145.0'
-            )
-            if _token:
-                headers['Authorization'] = f'Bearer {self.token}'
-        if self.timeout is not None and 'timeout' not in kwargs:
-            kwargs['timeout'] = self.timeout
-        r = super().request(method, url, *args, headers=headers, **kwargs)
-        if r.status_code != 200:
+        call = Call(self, method, url, args, kwargs, headers, authenticated=_token)
+        try:
+            run_before(self.middlewares, call)
+            return run_after(self.middlewares, call, self._send(call))
+        except Exception as e:
+            error = run_on_error(self.middlewares, call, e)
+            if error is e:
+                raise
+            raise error from e
+
+    def _send(self, call: Call):
+        """Send the call through the transport, returning the raw response."""
+        if self.flights is not None:
+            key = _flight_key(call)
+            if key is not None:
+                return self.flights.do(key, lambda: self._transport_send(call))
+        return self._transport_send(call)
+
+    def _transport_send(self, call: Call):
+        policy = _retry_policy(self.retry, call)
+        if policy is None:
+            return self._attempt(call)
+        delay = 0.0
+        for attempt in itertools.count(1):
+            response = error = None
             try:
-                rd = r.json()
-            except Exception:
-                exc = exceptions.ClientError(f'Unexpected error: {r.text}')
-            else:
-                exc = exceptions.ClientAPIError(
-                    rd,
-                    status_code=r.status_code,
-                    response=r,
-                    message=f'Contracts - {rd.get("resultMessage")} - {rd.get("resultCodeDetail")} ({r.status_code})',
-                )
-            raise exc
+                response = self._attempt(call)
+            except exceptions.ClientNetworkError as e:
+                error = e
+            delay = policy.wait(attempt, delay, response, error)
+            if delay is None:
+                if policy.retryable(response, error):
+                    self.metrics.incr('retries_exhausted', call.endpoint)
+                if error is not None:
+                    raise error
+                return response
+            self.metrics.incr('retries', call.endpoint)
+            _log_retry(call, attempt, delay, response, error)
+            time.sleep(delay)
+
+    def _attempt(self, call: Call):
+        if self.breaker is None or call.endpoint is None:
+            return self._send_hedged(call)
+        self.breaker.before(call.endpoint)
+        response = None
+        try:
+            response = self._send_hedged(call)
+        finally:
+            self.breaker.record(call.endpoint, response)
+        return response
+
+    def _send_hedged(self, call: Call):
+        if self.hedger is None or call.endpoint not in self.hedger.endpoints:
+            return self._send_once(call)
+        self.hedger.started()
+        delay = self.hedger.delay(call.endpoint)
+        if delay is None:
+            return self._observed_send(call)
+        return self._hedged_send(call, delay)
+
+    def _hedged_send(self, call: Call, delay: float):
+        """Send the call, plus an identical hedge if it got no response within `delay`, returning the first success."""
+        futures = [self._hedge_pool.submit(self._observed_send, call)]
+        if not wait(futures, timeout=delay).done and self.hedger.allow():
+            self.metrics.incr('hedges', call.endpoint)
+            futures.append(self._hedge_pool.submit(self._observed_send, call))
+        # when every request fails, the call fails as the first one did
+        winner = futures[0]
+        for future in as_completed(futures):
+            if future.exception() is None and future.result().status_code == 200:
+                winner = future
+                break
+        if winner is not futures[0]:
+            self.metrics.incr('hedge_wins', call.endpoint)
+        for future in futures:
+            # the other request, if still waiting for the pool, is not needed anymore
+            future.cancel()
+        return winner.result()
+
+    def _observed_send(self, call: Call):
+        started = time.monotonic()
+        response = self._send_once(call)
+        if response.status_code == 200:
+            self.hedger.observe(call.endpoint, time.monotonic() - started)
+        return response
+
+    def _send_once(self, call: Call):
+        if self.limiter is None:
+            return self.transport.send(call.method, call.url, *call.args, headers=call.headers, **call.kwargs)
+        started = self.limiter.acquire()
+        response = None
+        try:
+            response = self.transport.send(call.method, call.url, *call.args, headers=call.headers, **call.kwargs)
+        finally:
+            self.limiter.release(started, response, call.endpoint)
+        return response
 
-        r = r.json()
-        if not r['success']:
-            raise exceptions.ClientError('Unexpected!! Status 200 without success??')
-        return r
+    def _session_request(self, *args, **kwargs):
+        return super().request(*args, **kwargs)
+
+    def close(self):
+        super().close()
+        if getattr(self.transport, 'session', None) is not self:
+            self.transport.close()
+        if self._hedge_pool is not None:
+            self._hedge_pool.shutdown(wait=False, cancel_futures=True)
 
     def login(self, username, password) -> dict:
         """Login."""
@@ -101,20 +371,30 @@ class Client(requests.Session):
         except exceptions.ClientError as e:
             raise exceptions.LoginError(str(e))
 
-        self.token = r['body']['token']
+        with self._login_lock:
+            if r['body']['token'] != self.token:
+                self.invalidate_cache()
+            self.token = r['body']['token']
         return r
 
     def contracts(self) -> dict:
         """Retrieve contracts for the current account."""
 
-        r = self.get('contracts', _token=True)
-        return r['body']['Contracts']
+        return self.cached('contracts', (), lambda: self.get('contracts', _token=True)['body']['Contracts'])
 
-    def files(self, path: Path, is_invoice=False):
+    def files(self, path: Path, is_invoice=False, progress=None):
         """Upload a file to the files endpoint.
 
+        The multipart body is streamed from disk in chunks, so memory use does not grow with the file size.
+        With a cache, a file with the same content (and `is_invoice`) uploaded less than `cache_ttls['files']`
+        ago and released by `release_uploads` is not uploaded again: the previous document is returned instead.
+        Reusing a document takes it out of the cache, so two submissions never share one, even from processes
+        sharing the cache: the file is uploaded again for the second.
+
         Args:
             path: Path to the file to upload
+            progress: Optional callable receiving a `multipart.UploadProgress` (bytes sent, throughput)
+                after each chunk is handed to the connection
 
         Returns:
             dict: Response from the server
@@ -122,12 +402,69 @@ class Client(requests.Session):
         if not path.exists():
             raise exceptions.ClientError(f'File not found: {path}')
 
-        mime_type, _ = mimetypes.guess_type(path)
-        with path.open('rb') as f:
-            files = {'filename': (path.name, f, mime_type)}
-            r = self.post('files', files=files, _token=True, headers={'X-Isinvoice': 'true' if is_invoice else 'false'})
+        def upload():
+            mime_type, _ = mimetypes.guess_type(path)
+            body = MultipartFile('filename', path, mime_type, progress=progress)
+            r = self.post(
+                'files',
+                data=body,
+                _token=True,
+                headers={
+                    'X-Isinvoice': 'true' if is_invoice else 'false',
+                    'Content-Type': body.content_type,
+                    'Content-Length': str(len(body)),
+                },
+            )
+            return r['body']
+
+        if self.cache is None or not self.cache_ttls.get('files'):
+            return upload()
+        key = (file_digest(path), is_invoice)
+        body = None if self.refresh_cache else self.cache.pop('files', self._cache_key('files', key))
+        if body is None:
+            body = upload()
+        if isinstance(body, dict) and body.get('guid'):
+            with self._uploads_lock:
+                self._uploads[body['guid']] = (key, body)
+        return body
+
+    def upload_keys(self, guids: list[str]) -> dict[str, tuple]:
+        """`(digest, is_invoice)` of these documents handed out by `files`, for `forget_uploads` in a later process."""
+        with self._uploads_lock:
+            return {guid: self._uploads[guid][0] for guid in guids if guid in self._uploads}
+
+    def release_uploads(self):
+        """Let later uploads of the same files reuse the documents not attached to a submission (e.g. it failed)."""
+        with self._uploads_lock:
+            uploads, self._uploads = self._uploads, {}
+        ttl = self.cache_ttls.get('files')
+        if self.cache is None or not ttl:
+            return
+        for key, body in uploads.values():
+            self.cache.set('files', self._cache_key('files', key), body, ttl)
+
+    def forget_uploads(self, guids: list[str], keys: dict | None = None):
+        """Stop reusing these uploaded documents, typically once they are attached to a submission.
+
+        `keys` has the `upload_keys` of documents uploaded by another client, e.g. before a submission was resumed.
+        """
+        keys = keys or {}
+        for guid in guids:
+            with self._uploads_lock:
+                upload = self._uploads.pop(guid, None)
+            # documents handed out by this client are not in the cache anymore
+            key = keys.get(guid) if upload is None else None
+            if key is not None and self.cache is not None:
+                self.cache.delete('files', self._cache_key('files', tuple(key)))
+
 
-        return r['body']
+def file_digest(path: Path) -> str:
+    """SHA-256 hex digest of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with path.open('rb') as f:
+        while chunk := f.read(CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
 
 
 @dataclass
@@ -136,17 +473,208 @@ class RefundsRequestSetupResponse:
     insured_persons: list[models.Person]
     other: dict
 
+    @classmethod
+    def from_body(cls, data: dict) -> 'RefundsRequestSetupResponse':
+        data = dict(data)
+        services = [models.Service(**obj) for obj in data.pop('Services')]
+        ip = [models.Person(**obj) for obj in data.pop('InsuredPersons')]
+        return cls(services, ip, data)
 
-class ContractClient(requests.Session):
-    def __init__(
-        self,
-        client: Client,
-        contract_token: str,
-        *args,
-        **kwargs,
-    ):
-        """Initialize a client for contract-specific endpoints."""
-        super().__init__(*args, **kwargs)
+
+def submission_key(card_number: str, nif: str, receipt: str, total: float, treatment_date: str) -> str:
+    """Stable identity of an expense: card number, NIF, receipt number, amount and date."""
+    fields = (
+        str(card_number).strip(),
+        str(nif).strip(),
+        str(receipt).strip().casefold(),
+        f'{float(total):.2f}',
+        str(treatment_date).strip(),
+    )
+    return hashlib.sha256('\x1f'.join(fields).encode()).hexdigest()
+
+
+@dataclass
+class RefundSubmission:
+    """One expense to submit, with the same fields as `ContractClient.multiple_refunds_requests`."""
+
+    card_number: str
+    service_id: str
+    nif: str
+    receipt: str
+    total: float
+    treatment_date: str
+    docs: list[str]
+    primary_entity: bool
+    accident: bool
+    building: str
+    email: str
+
+    @property
+    def key(self) -> str:
+        """Stable identity of this expense, see `submission_key`."""
+        return submission_key(self.card_number, self.nif, self.receipt, self.total, self.treatment_date)
+
+    @property
+    def origin_id(self) -> int:
+        """`originId` derived from `key`, so that retrying the same expense sends the same one."""
+        return int(self.key[:15], 16) % ORIGIN_ID_MODULUS
+
+    def payload(self) -> dict:
+        """Build its `refundSubmissions` entry for the multiple-refunds-requests endpoint."""
+        return {
+            'CardNumber': self.card_number,
+            'ServiceId': str(self.service_id),
+            'NationalPractice': True,
+            'PracticeFiscalNumber': self.nif,
+            'practiceFiscalNumberPrefix': 'PT',
+            'ReceiptNumber': self.receipt,
+            'TotalValue': self.total,
+            'DateOfTreatment': self.treatment_date,
+            'DocumentGuidList': self.docs,
+            'IsPrimaryEntity': self.primary_entity,
+            'IsAccident': self.accident,
+            'IsInternalNetwork': True,
+            'MeanOfPayment': 'IBAN',
+            'PhonePrefix': '+351',
+            'originId': self.origin_id,
+            'BuildingId': self.building,
+            'Email': self.email,
+        }
+
+
+@dataclass
+class RefundSubmissionResult:
+    """Outcome of one `RefundSubmission` sent through `ContractClient.multiple_refunds_requests_batch`.
+
+    `index` is the position of the submission in the input list and `error` is None when it was accepted.
+    """
+
+    index: int
+    submission: RefundSubmission
+    error: exceptions.ClientError | None = None
+    data: dict | None = None
+
+    @property
+    def success(self) -> bool:
+        return self.error is None
+
+
+def _refund_submissions_payload(submissions: list[RefundSubmission]) -> dict:
+    return {'refundSubmissions': [submission.payload() for submission in submissions]}
+
+
+def _batches(items: list, size: int) -> Iterator[tuple[int, list]]:
+    """Yield (offset, chunk) pairs of at most `size` items."""
+    if size <= 0:
+        raise ValueError('batch size must be greater than 0')
+    for offset in range(0, len(items), size):
+        yield offset, items[offset : offset + size]
+
+
+def _entry_results(data, submissions: list[RefundSubmission]) -> list | None:
+    """Find the per-entry results of a multiple-refunds-requests response (or error response), if it has any.
+
+    They are listed as the body itself or under one of ENTRY_RESULTS_KEYS. Entries carrying an
+    `originId` belong to the submission sent with it; entries without one are only taken as aligned
+    with `refundSubmissions` when there are exactly as many. Returns the entry of each submission
+    (None for those without one), or None when the response does not tell entries apart.
+    """
+    for entries in _entry_lists(data):
+        by_origin = {str(e['originId']): e for e in entries if isinstance(e, dict) and e.get('originId') is not None}
+        if by_origin:
+            return [by_origin.get(str(submission.origin_id)) for submission in submissions]
+        if len(entries) == len(submissions):
+            return entries
+    return None
+
+
+def _entry_lists(data) -> Iterator[list]:
+    if isinstance(data, list):
+        yield data
+    elif isinstance(data, dict):
+        for key in ENTRY_RESULTS_KEYS:
+            if isinstance(data.get(key), list):
+                yield data[key]
+        yield from _entry_lists(data.get('body'))
+
+
+def _numeric_result_code(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _entry_error(entry, status_code=None) -> exceptions.ClientAPIError | None:
+    """Map a per-entry result to a ClientAPIError, or None if the entry was accepted."""
+    if not isinstance(entry, dict):
+        return None
+    failed = (
+        entry.get('success') is False
+        or entry.get('resultCodeDetail')
+        or entry.get('errorCode')
+        or (_numeric_result_code(entry.get('resultCode')) or 0) < 0
+    )
+    if not failed:
+        return None
+    if 'resultCodeDetail' not in entry and entry.get('errorCode'):
+        entry = {**entry, 'resultCodeDetail': entry['errorCode']}
+    return exceptions.ClientAPIError(
+        entry,
+        status_code=status_code,
+        message=f'Refund submission - {entry.get("resultMessage")} - {entry.get("resultCodeDetail")}',
+    )
+
+
+def _batch_results(
+    offset: int, submissions: list[RefundSubmission], response: dict | None = None, error=None
+) -> list[RefundSubmissionResult]:
+    """Map one multiple-refunds-requests call (its response, or the error it raised) back to its submissions.
+
+    Per-entry results in the response (or in the error response) are used when present. Otherwise
+    the whole call succeeded or failed, and so did each of its submissions.
+    """
+    data = error.data if isinstance(error, exceptions.ClientAPIError) else response
+    entries = _entry_results(data, submissions)
+    status_code = getattr(error, 'status_code', None)
+    results = []
+    for position, submission in enumerate(submissions):
+        result = RefundSubmissionResult(offset + position, submission)
+        if entries is not None:
+            entry = entries[position]
+            result.data = entry if isinstance(entry, dict) else None
+            result.error = _entry_error(entry, status_code)
+            if result.error is None and error is not None and not result.data:
+                # nothing tells this entry apart, so it shares the error of the call
+                result.error = error
+        else:
+            result.error = error
+        results.append(result)
+    return results
+
+
+def _resubmit_singly(submissions: list[RefundSubmission], error: exceptions.ClientError) -> list[int]:
+    """Positions of the submissions of a refused batch to send again one by one.
+
+    The API may refuse a batch as a whole while listing per-entry results for none of its entries,
+    or only for those it objects to: the others are not known to be wrong. Sending the same
+    `originId` again is not a new submission, so this only finds out which entries the API refuses.
+    Server errors are left alone: the retries already gave up on them.
+    """
+    if len(submissions) < 2 or not isinstance(error, exceptions.ClientAPIError) or (error.status_code or 0) >= 500:
+        return []
+    entries = _entry_results(error.data, submissions)
+    return [position for position in range(len(submissions)) if entries is None or not entries[position]]
+
+
+class ContractClient:
+    """Client for contract-specific endpoints: a lightweight view of a `Client`.
+
+    It only holds the parent client and the contract token. Every call goes through the parent,
+    sharing its connection pools, token and cache, so handles are cheap to create by the thousand.
+    """
+
+    def __init__(self, client: Client, contract_token: str):
         self._client = client
         self._contract_token = contract_token
 
@@ -155,22 +683,30 @@ class ContractClient(requests.Session):
             url = f'contracts/{quote(self._contract_token, safe="")}/{url.lstrip("/")}'
         return self._client.request(method, url, *args, _token=True, **kwargs)
 
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
     def validate_feature(self, feature: str) -> bool:
         """Validate that contract has feature."""
 
-        r = self.post('validate-feature', json={'feature': feature})
-        return r['body']['valid']
+        return self._client.cached(
+            'validate-feature',
+            (self._contract_token, feature),
+            lambda: self.post('validate-feature', json={'feature': feature})['body']['valid'],
+        )
 
     def refunds_request_setup(self) -> RefundsRequestSetupResponse:
         """Validate that contract has feature."""
 
-        r = self.get('refunds-requests/setup')
-        data = r['body']
-        services = [models.Service(**obj) for obj in data['Services']]
-        ip = [models.Person(**obj) for obj in data['InsuredPersons']]
-        del data['Services']
-        del data['InsuredPersons']
-        return RefundsRequestSetupResponse(services, ip, data)
+        body = self._client.cached(
+            'refunds-requests/setup',
+            (self._contract_token,),
+            lambda: self.get('refunds-requests/setup')['body'],
+        )
+        return RefundsRequestSetupResponse.from_body(body)
 
     def unified_refunds(self, page_size=5, page=1) -> models.UnifiedRefundsResult:
         """Validate that contract has feature."""
@@ -181,14 +717,57 @@ class ContractClient(requests.Session):
         )
         return models.UnifiedRefundsResult.model_validate(r['body'])
 
+    def iter_unified_refunds(self, page_size=20, prefetch=1) -> Iterator[models.Reimbursement]:
+        """Yield refunds lazily across all pages, newest first.
+
+        Page 1 tells how many pages exist. Up to `prefetch` of the following pages are then
+        requested in background threads, so page N+1 is already in flight while the caller
+        handles page N. Only those pages are held in memory, and pages not yet started are
+        cancelled when the generator is closed. `prefetch=0` fetches pages sequentially.
+        """
+        r = self.unified_refunds(page_size=page_size, page=1)
+        yield from r.refunds or []
+
+        pagination = r.pagination_result
+        if not (pagination and pagination.current_page and pagination.total_pages):
+            return
+        pages = iter(range(pagination.current_page + 1, pagination.total_pages + 1))
+
+        if prefetch <= 0:
+            for page in pages:
+                yield from self.unified_refunds(page_size=page_size, page=page).refunds or []
+            return
+
+        pool = ThreadPoolExecutor(max_workers=prefetch)
+        pending = deque()
+
+        def submit_next():
+            page = next(pages, None)
+            if page is not None:
+                pending.append(pool.submit(self.unified_refunds, page_size=page_size, page=page))
+
+        try:
+            for _ in range(prefetch):
+                submit_next()
+            while pending:
+                r = pending.popleft().result()
+                submit_next()
+                yield from r.refunds or []
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+
     def load_buildings(self, nif: str) -> list[models.Building]:
         """Validate that contract has feature."""
 
-        r = self.post(
+        buildings = self._client.cached(
             'refunds-requests/loadBuildings',
-            json={'practiceNif': nif, 'practiceNifCode': 'PT'},
+            (nif,),
+            lambda: self.post(
+                'refunds-requests/loadBuildings',
+                json={'practiceNif': nif, 'practiceNifCode': 'PT'},
+            )['body']['buildings'],
         )
-        return [models.Building(**building) for building in r['body']['buildings']]
+        return [models.Building(**building) for building in buildings]
 
     def multiple_refunds_requests(
         self,
@@ -206,28 +785,46 @@ class ContractClient(requests.Session):
     ) -> bool:
         """Validate that contract has feature."""
 
-        payload = {
-            'refundSubmissions': [
-                {
-                    'CardNumber': card_number,
-                    'ServiceId': str(service_id),
-                    'NationalPractice': True,
-                    'PracticeFiscalNumber': nif,
-                    'practiceFiscalNumberPrefix': 'PT',
-                    'ReceiptNumber': receipt,
-                    'TotalValue': total,
-                    'DateOfTreatment': treatment_date,
-                    'DocumentGuidList': docs,
-                    'IsPrimaryEntity': primary_entity,
-                    'IsAccident': accident,
-                    'IsInternalNetwork': True,
-                    'MeanOfPayment': 'IBAN',
-                    'PhonePrefix': '+351',
-                    'originId': int(random.random() * 9999),
-                    'BuildingId': building,
-                    'Email': email,
-                }
+        payload = _refund_submissions_payload(
+            [
+                RefundSubmission(
+                    card_number,
+                    service_id,
+                    nif,
+                    receipt,
+                    total,
+                    treatment_date,
+                    docs,
+                    primary_entity,
+                    accident,
+                    building,
+                    email,
+                )
             ]
-        }
+        )
         # nothing to return - "success" and errors already checked by self.request
         self.post('multiple-refunds-requests', json=payload)
+
+    def multiple_refunds_requests_batch(
+        self, submissions: list[RefundSubmission], batch_size=REFUND_SUBMISSIONS_BATCH_SIZE
+    ) -> list[RefundSubmissionResult]:
+        """Submit many refunds, packing up to `batch_size` of them into each request.
+
+        Errors do not stop the remaining batches: every submission gets a `RefundSubmissionResult`,
+        in input order, carrying the per-entry error reported by the API (or the error of its batch).
+        Submissions of a refused batch without a per-entry result of their own are sent again one at a time.
+        """
+        results = []
+        for offset, batch in _batches(submissions, batch_size):
+            results.extend(self._post_batch(offset, batch))
+        return results
+
+    def _post_batch(self, offset: int, batch: list[RefundSubmission]) -> list[RefundSubmissionResult]:
+        try:
+            r = self.post('multiple-refunds-requests', json=_refund_submissions_payload(batch))
+        except exceptions.ClientError as e:
+            results = _batch_results(offset, batch, error=e)
+            for position in _resubmit_singly(batch, e):
+                (results[position],) = self._post_batch(offset + position, [batch[position]])
+            return results
+        return _batch_results(offset, batch, response=r)
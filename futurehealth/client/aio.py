@@ -0,0 +1,303 @@
+"""Asyncio client for Future Healthcare API.
+
+Requires the optional `httpx` dependency (`pip install "future-healthcare[async]"`).
+"""
+
+import asyncio
+import itertools
+import mimetypes
+from pathlib import Path
+from urllib.parse import quote
+
+import httpx
+
+from . import (
+    REFUND_SUBMISSIONS_BATCH_SIZE,
+    RefundsRequestSetupResponse,
+    RefundSubmission,
+    RefundSubmissionResult,
+    _batch_results,
+    _batches,
+    _flight_key,
+    _log_retry,
+    _refund_submissions_payload,
+    _resubmit_singly,
+    _retry_policy,
+    exceptions,
+    models,
+)
+from .breaker import CircuitBreaker
+from .metrics import Metrics
+from .middleware import Call, default_middlewares, run_after, run_before, run_on_error
+from .multipart import MultipartFile
+from .retry import RetryPolicy
+from .singleflight import AsyncSingleFlight
+
+
+class AsyncClient:
+    """Asyncio HTTP Client for Future Healthcare API.
+
+    Mirrors `Client` on top of `httpx.AsyncClient`, so many calls can be in flight
+    on a single event loop. At most `max_concurrency` requests run at the same time.
+    """
+
+    def __init__(
+        self,
+        base_url='https://ws.future-healthcare.net/prd/api/fhc/fhcp/',
+        token=None,
+        partnership='vic',
+        language='en-US',
+        timeout=30,
+        verify=True,
+        max_concurrency=20,
+        single_flight=False,
+        middlewares=(),
+        retry: RetryPolicy | None = None,
+        breaker: CircuitBreaker | None = None,
+        **kwargs,
+    ):
+        """Initialize the AsyncClient.
+
+        Args:
+            base_url: Optional base URL for API requests
+            partnership: Partnership identifier (default: 'vic')
+            max_concurrency: Maximum number of requests in flight at once
+            single_flight: Share one in-flight request among identical concurrent reads, see `Client`
+            middlewares: Extra `middleware.Middleware`s every call goes through, see `Client`
+            retry: `retry.RetryPolicy` for idempotent calls, see `Client`
+            breaker: `breaker.CircuitBreaker` failing calls to failing endpoints fast, see `Client`
+            **kwargs: Additional keyword arguments for httpx.AsyncClient
+        """
+        kwargs.setdefault('limits', httpx.Limits(max_connections=max_concurrency))
+        # a None timeout disables httpx's default one
+        kwargs.setdefault('timeout', timeout)
+        self.session = httpx.AsyncClient(verify=verify, **kwargs)
+        self.base_url = base_url.rstrip('/')
+        self.partnership = partnership
+        self.language = language
+        self.timeout = timeout
+        self.token = token
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.flights = AsyncSingleFlight() if single_flight else None
+        self.middlewares = [*default_middlewares(), *middlewares]
+        self.retry = retry
+        self.metrics = Metrics()
+        self.breaker = breaker
+        if breaker is not None and breaker.metrics is None:
+            breaker.metrics = self.metrics
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def aclose(self):
+        await self.session.aclose()
+
+    async def request(self, method, url, _token=False, headers=None, **kwargs):
+        """Make an HTTP request, same semantics as `Client.request`."""
+        call = Call(self, method, url, kwargs=kwargs, headers=headers, authenticated=_token)
+        try:
+            run_before(self.middlewares, call)
+            return run_after(self.middlewares, call, await self._send(call))
+        except Exception as e:
+            error = run_on_error(self.middlewares, call, e)
+            if error is e:
+                raise
+            raise error from e
+
+    async def _send(self, call: Call):
+        """Send the call, returning the raw response."""
+        if self.flights is not None:
+            key = _flight_key(call)
+            if key is not None:
+                return await self.flights.do(key, lambda: self._transport_send(call))
+        return await self._transport_send(call)
+
+    async def _transport_send(self, call: Call):
+        policy = _retry_policy(self.retry, call)
+        if policy is None:
+            return await self._attempt(call)
+        delay = 0.0
+        for attempt in itertools.count(1):
+            response = error = None
+            try:
+                response = await self._attempt(call)
+            except exceptions.ClientNetworkError as e:
+                error = e
+            delay = policy.wait(attempt, delay, response, error)
+            if delay is None:
+                if policy.retryable(response, error):
+                    self.metrics.incr('retries_exhausted', call.endpoint)
+                if error is not None:
+                    raise error
+                return response
+            self.metrics.incr('retries', call.endpoint)
+            _log_retry(call, attempt, delay, response, error)
+            # the concurrency slot is released while waiting
+            await asyncio.sleep(delay)
+
+    async def _attempt(self, call: Call):
+        if self.breaker is None or call.endpoint is None:
+            return await self._send_once(call)
+        self.breaker.before(call.endpoint)
+        response = None
+        try:
+            response = await self._send_once(call)
+        finally:
+            self.breaker.record(call.endpoint, response)
+        return response
+
+    async def _send_once(self, call: Call):
+        async with self._semaphore:
+            try:
+                return await self.session.request(call.method, call.url, headers=call.headers, **call.kwargs)
+            except httpx.TransportError as e:
+                raise exceptions.ClientNetworkError(f'Network error: {e}') from e
+
+    async def get(self, url, **kwargs):
+        return await self.request('GET', url, **kwargs)
+
+    async def post(self, url, **kwargs):
+        return await self.request('POST', url, **kwargs)
+
+    async def login(self, username, password) -> dict:
+        """Login."""
+
+        payload = {'username': username, 'password': password}
+
+        try:
+            r = await self.post('login', json=payload)
+        except exceptions.ClientError as e:
+            raise exceptions.LoginError(str(e))
+
+        self.token = r['body']['token']
+        return r
+
+    async def contracts(self) -> dict:
+        """Retrieve contracts for the current account."""
+
+        r = await self.get('contracts', _token=True)
+        return r['body']['Contracts']
+
+    async def files(self, path: Path, is_invoice=False, progress=None):
+        """Upload a file to the files endpoint, streamed from disk, see `Client.files`."""
+        if not path.exists():
+            raise exceptions.ClientError(f'File not found: {path}')
+
+        mime_type, _ = mimetypes.guess_type(path)
+        body = MultipartFile('filename', path, mime_type, progress=progress)
+
+        async def content():
+            chunks = iter(body)
+            # disk reads happen off the event loop
+            while (chunk := await asyncio.to_thread(next, chunks, None)) is not None:
+                yield chunk
+
+        r = await self.post(
+            'files',
+            content=content(),
+            _token=True,
+            headers={
+                'X-Isinvoice': 'true' if is_invoice else 'false',
+                'Content-Type': body.content_type,
+                'Content-Length': str(len(body)),
+            },
+        )
+        return r['body']
+
+
+class AsyncContractClient:
+    def __init__(self, client: AsyncClient, contract_token: str):
+        """Initialize an asyncio client for contract-specific endpoints."""
+        self._client = client
+        self._contract_token = contract_token
+
+    async def request(self, method: str, url: str, **kwargs):
+        if not url.startswith(('http://', 'https://')):
+            url = f'contracts/{quote(self._contract_token, safe="")}/{url.lstrip("/")}'
+        return await self._client.request(method, url, _token=True, **kwargs)
+
+    async def get(self, url, **kwargs):
+        return await self.request('GET', url, **kwargs)
+
+    async def post(self, url, **kwargs):
+        return await self.request('POST', url, **kwargs)
+
+    async def validate_feature(self, feature: str) -> bool:
+        """Validate that contract has feature."""
+
+        r = await self.post('validate-feature', json={'feature': feature})
+        return r['body']['valid']
+
+    async def refunds_request_setup(self) -> RefundsRequestSetupResponse:
+        r = await self.get('refunds-requests/setup')
+        return RefundsRequestSetupResponse.from_body(r['body'])
+
+    async def unified_refunds(self, page_size=5, page=1) -> models.UnifiedRefundsResult:
+        r = await self.get(
+            'unified-refunds',
+            params={'page': page, 'pageSize': page_size},
+        )
+        return models.UnifiedRefundsResult.model_validate(r['body'])
+
+    async def load_buildings(self, nif: str) -> list[models.Building]:
+        r = await self.post(
+            'refunds-requests/loadBuildings',
+            json={'practiceNif': nif, 'practiceNifCode': 'PT'},
+        )
+        return [models.Building(**building) for building in r['body']['buildings']]
+
+    async def multiple_refunds_requests(
+        self,
+        card_number: str,
+        service_id: str,
+        nif: str,
+        receipt: str,
+        total: float,
+        treatment_date: str,
+        docs: list[str],
+        primary_entity: bool,
+        accident: bool,
+        building: str,
+        email: str,
+    ) -> bool:
+        payload = _refund_submissions_payload(
+            [
+                RefundSubmission(
+                    card_number,
+                    service_id,
+                    nif,
+                    receipt,
+                    total,
+                    treatment_date,
+                    docs,
+                    primary_entity,
+                    accident,
+                    building,
+                    email,
+                )
+            ]
+        )
+        # nothing to return - "success" and errors already checked by self.request
+        await self.post('multiple-refunds-requests', json=payload)
+
+    async def multiple_refunds_requests_batch(
+        self, submissions: list[RefundSubmission], batch_size=REFUND_SUBMISSIONS_BATCH_SIZE
+    ) -> list[RefundSubmissionResult]:
+        """Submit many refunds in batches, see `ContractClient.multiple_refunds_requests_batch`."""
+        results = []
+        for offset, batch in _batches(submissions, batch_size):
+            results.extend(await self._post_batch(offset, batch))
+        return results
+
+    async def _post_batch(self, offset: int, batch: list[RefundSubmission]) -> list[RefundSubmissionResult]:
+        try:
+            r = await self.post('multiple-refunds-requests', json=_refund_submissions_payload(batch))
+        except exceptions.ClientError as e:
+            results = _batch_results(offset, batch, error=e)
+            for position in _resubmit_singly(batch, e):
+                (results[position],) = await self._post_batch(offset + position, [batch[position]])
+            return results
+        return _batch_results(offset, batch, response=r)
@@ -0,0 +1,99 @@
+import logging
+import threading
+import time
+from dataclasses import dataclass
+
+from . import exceptions
+from .metrics import Metrics
+
+LOGGER = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half-open'
+
+
+@dataclass
+class _Circuit:
+    state: str = CLOSED
+    failures: int = 0
+    opened_at: float = 0.0
+
+
+class CircuitBreaker:
+    """Per-endpoint circuit breakers, failing calls fast while their endpoint is down.
+
+    An endpoint's circuit opens after `failures` consecutive failed requests (network errors and
+    5xx responses; throttling is left to retries and the limiter). While open, calls fail right
+    away with `ClientCircuitOpenError`. After `reset_timeout` seconds it turns half-open and lets
+    a single probe through: a success closes it, a failure opens it for another `reset_timeout`.
+
+    State changes are logged and counted in `metrics` (`circuit_opened`, `circuit_closed`), as
+    are calls failed fast (`circuit_rejected`). A `Client` given a breaker without `metrics`
+    counts them in its own.
+    """
+
+    def __init__(self, failures=5, reset_timeout=30.0, metrics: Metrics | None = None):
+        self.failures = failures
+        self.reset_timeout = reset_timeout
+        self.metrics = metrics
+        self._circuits: dict[str, _Circuit] = {}
+        self._lock = threading.Lock()
+
+    def state(self, endpoint: str) -> str:
+        with self._lock:
+            circuit = self._circuits.get(endpoint)
+            return circuit.state if circuit is not None else CLOSED
+
+    def states(self) -> dict[str, str]:
+        """State of every endpoint that has failed so far."""
+        with self._lock:
+            return {endpoint: circuit.state for endpoint, circuit in self._circuits.items()}
+
+    def before(self, endpoint: str):
+        """Let a call to `endpoint` through, or raise `ClientCircuitOpenError` when its circuit is open."""
+        with self._lock:
+            circuit = self._circuits.get(endpoint)
+            if circuit is None or circuit.state == CLOSED:
+                return
+            retry_in = circuit.opened_at + self.reset_timeout - time.monotonic()
+            if circuit.state == OPEN and retry_in <= 0:
+                circuit.state = HALF_OPEN
+                LOGGER.info('%s circuit half-open, probing', endpoint)
+                return
+        self._count('circuit_rejected', endpoint)
+        # a probe is already in flight when half-open
+        raise exceptions.ClientCircuitOpenError(endpoint, max(0.0, retry_in))
+
+    def record(self, endpoint: str, response=None):
+        """Record the outcome of a call let through by `before`: its `response`, or None if it got none."""
+        failed = response is None or response.status_code >= 500
+        with self._lock:
+            circuit = self._circuits.setdefault(endpoint, _Circuit()) if failed else self._circuits.get(endpoint)
+            if circuit is None:
+                return
+            previous = circuit.state
+            if not failed:
+                circuit.state = CLOSED
+                circuit.failures = 0
+            else:
+                circuit.failures += 1
+                # failures of calls sent before the circuit opened do not keep it open longer
+                if previous == HALF_OPEN or (previous == CLOSED and circuit.failures >= self.failures):
+                    circuit.state = OPEN
+                    circuit.opened_at = time.monotonic()
+            state, failures = circuit.state, circuit.failures
+        if state == previous:
+            return
+        if state == OPEN:
+            LOGGER.warning(
+                '%s circuit open after %d failures, failing fast for %.0fs', endpoint, failures, self.reset_timeout
+            )
+            self._count('circuit_opened', endpoint)
+        else:
+            LOGGER.warning('%s circuit closed, endpoint recovered', endpoint)
+            self._count('circuit_closed', endpoint)
+
+    def _count(self, name: str, endpoint: str):
+        if self.metrics is not None:
+            self.metrics.incr(name, endpoint)
@@ -0,0 +1,114 @@
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+# bump when SCHEMA changes: the cache is disposable, so older databases are simply recreated
+SCHEMA_VERSION = 2
+SCHEMA = """
+DROP TABLE IF EXISTS cache;
+CREATE TABLE cache (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    accessed_at REAL NOT NULL,
+    PRIMARY KEY (namespace, key)
+);
+CREATE INDEX cache_lru ON cache (namespace, accessed_at);
+"""
+
+
+class DiskCache:
+    """SQLite-backed JSON cache with per-entry TTL, shared by threads and processes.
+
+    Entries live in namespaces, usually one per endpoint. Namespaces can be bounded with
+    `max_entries` on write, evicting the least recently used entries (reads with `touch=True`
+    count as use). The database is only opened on first use.
+    """
+
+    def __init__(self, path: Path | str):
+        self.path = Path(path)
+        self._conn = None
+        self._lock = threading.Lock()
+
+    @property
+    def conn(self):
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False, isolation_level=None)
+            if self._conn.execute('PRAGMA user_version').fetchone()[0] != SCHEMA_VERSION:
+                self._conn.executescript(f'BEGIN; {SCHEMA} PRAGMA user_version = {SCHEMA_VERSION}; COMMIT;')
+        return self._conn
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def get(self, namespace: str, key: str, touch=False):
+        """Return the cached value, or None when missing or expired."""
+        now = time.time()
+        with self._lock:
+            row = self.conn.execute(
+                'SELECT value, expires_at FROM cache WHERE namespace = ? AND key = ?', (namespace, key)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] <= now:
+                self.conn.execute('DELETE FROM cache WHERE namespace = ? AND key = ?', (namespace, key))
+                return None
+            if touch:
+                self.conn.execute(
+                    'UPDATE cache SET accessed_at = ? WHERE namespace = ? AND key = ?', (now, namespace, key)
+                )
+        return json.loads(row[0])
+
+    def set(self, namespace: str, key: str, value, ttl: float, max_entries: int | None = None):
+        now = time.time()
+        with self._lock:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO cache (namespace, key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?)',
+                (namespace, key, json.dumps(value), now + ttl, now),
+            )
+            if max_entries is not None:
+                self.conn.execute(
+                    'DELETE FROM cache WHERE namespace = ? AND key NOT IN '
+                    '(SELECT key FROM cache WHERE namespace = ? ORDER BY accessed_at DESC LIMIT ?)',
+                    (namespace, namespace, max_entries),
+                )
+
+    def pop(self, namespace: str, key: str):
+        """Remove and return the cached value, or None when missing or expired.
+
+        Only one of the threads and processes popping the same entry gets it.
+        """
+        now = time.time()
+        with self._lock:
+            conn = self.conn
+            # IMMEDIATE locks the file for writing, so another process cannot read the entry in between
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                row = conn.execute(
+                    'SELECT value, expires_at FROM cache WHERE namespace = ? AND key = ?', (namespace, key)
+                ).fetchone()
+                conn.execute('DELETE FROM cache WHERE namespace = ? AND key = ?', (namespace, key))
+                conn.execute('COMMIT')
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+        if row is None or row[1] <= now:
+            return None
+        return json.loads(row[0])
+
+    def delete(self, namespace: str, key: str):
+        with self._lock:
+            self.conn.execute('DELETE FROM cache WHERE namespace = ? AND key = ?', (namespace, key))
+
+    def clear(self, namespace: str | None = None):
+        with self._lock:
+            if namespace is None:
+                self.conn.execute('DELETE FROM cache')
+            else:
+                self.conn.execute('DELETE FROM cache WHERE namespace = ?', (namespace,))
@@ -22,5 +22,18 @@ class ClientAPIError(ClientError):
         super().__init__(message)
 
 
+class ClientNetworkError(ClientError):
+    """The request did not get a response (connection failure or timeout), so its outcome is unknown."""
+
+
 class LoginError(ClientError):
     """Errors during login"""
+
+
+class ClientCircuitOpenError(ClientError):
+    """The endpoint's circuit breaker is open after repeated failures, so the request was not sent."""
+
+    def __init__(self, endpoint, retry_in):
+        self.endpoint = endpoint
+        self.retry_in = retry_in
+        super().__init__(f'{endpoint} is failing, not calling it again for {retry_in:.0f}s')
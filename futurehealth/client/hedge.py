@@ -0,0 +1,63 @@
+import math
+import threading
+from collections import defaultdict, deque
+
+# Reads whose slowest responses dominate tail latency, worth a second request
+HEDGED_ENDPOINTS = frozenset({'refunds-requests/loadBuildings', 'refunds-requests/setup'})
+
+
+class Hedger:
+    """When to send a second, identical request for a read still waiting on its first one.
+
+    A call to one of `endpoints` gets a hedge once it has waited `delay` seconds, or by default
+    the `percentile` of the latencies observed for its endpoint (over the last `window` responses,
+    once there are `min_samples` of them). Hedges are capped to `max_rate` of the calls, so the
+    extra load stays bounded even when the API is slow across the board.
+    """
+
+    def __init__(
+        self,
+        delay: float | None = None,
+        percentile=0.95,
+        max_rate=0.1,
+        endpoints: frozenset[str] = HEDGED_ENDPOINTS,
+        window=200,
+        min_samples=20,
+    ):
+        self.fixed_delay = delay
+        self.percentile = percentile
+        self.max_rate = max_rate
+        self.endpoints = endpoints
+        self.min_samples = min_samples
+        self._latencies: dict[str, deque] = defaultdict(lambda: deque(maxlen=window))
+        self._calls = 0
+        self._hedges = 0
+        self._lock = threading.Lock()
+
+    def delay(self, endpoint: str) -> float | None:
+        """Seconds to wait for the first response before hedging, or None while it is unknown."""
+        if self.fixed_delay is not None:
+            return self.fixed_delay
+        with self._lock:
+            latencies = sorted(self._latencies[endpoint])
+        if len(latencies) < self.min_samples:
+            return None
+        return latencies[min(len(latencies) - 1, math.ceil(self.percentile * len(latencies)) - 1)]
+
+    def observe(self, endpoint: str, latency: float):
+        """Record the latency of a successful response."""
+        with self._lock:
+            self._latencies[endpoint].append(latency)
+
+    def started(self):
+        """Count a call that may be hedged, towards the `max_rate` budget."""
+        with self._lock:
+            self._calls += 1
+
+    def allow(self) -> bool:
+        """Whether a hedge can be sent without exceeding `max_rate`, counting it if so."""
+        with self._lock:
+            if self._hedges + 1 > self.max_rate * self._calls:
+                return False
+            self._hedges += 1
+            return True
@@ -0,0 +1,135 @@
+import logging
+import math
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+LOGGER = logging.getLogger(__name__)
+
+# Requests per second the CLI lets every process on a host make together, by default none: a shared
+# budget is only worth a write to its file per request when several processes run at once
+RATE_LIMIT = 0.0
+
+
+class AdaptiveLimiter:
+    """AIMD concurrency limit for the calls a client makes, shared by its threads.
+
+    The limit grows additively, by one every `limit` calls (about one slot per round trip), while
+    calls succeed within `latency_factor` times the moving average latency of their endpoint (a
+    large upload is not slow compared to a lookup, only to other uploads). It is halved when a
+    call is throttled (429), fails on the server (5xx) or the network, or is slower than that, at
+    most once per round trip: failures of calls started before the last halving are not counted
+    again. Calls beyond the limit wait for a slot.
+
+    With a `budget`, every call also takes a token from it first, so that processes sharing the
+    budget stay under its rate together.
+    """
+
+    def __init__(self, initial=4, minimum=1, maximum=20, latency_factor=2.0, budget: 'RateBudget | None' = None):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.latency_factor = latency_factor
+        self.budget = budget
+        self.in_flight = 0
+        # moving average latency of healthy calls, by endpoint
+        self.latencies: dict[str | None, float] = {}
+        self._backed_off_at = 0.0
+        self._cond = threading.Condition()
+
+    def acquire(self) -> float:
+        """Wait for a slot and a budget token, returning when the call started (to pass to `release`)."""
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                self._cond.wait()
+            self.in_flight += 1
+        if self.budget is not None:
+            # only callers holding a slot take tokens, so none are spent by callers still waiting
+            try:
+                self.budget.take()
+            except BaseException:
+                with self._cond:
+                    self.in_flight -= 1
+                    self._cond.notify_all()
+                raise
+        return time.monotonic()
+
+    def release(self, started: float, response=None, endpoint: str | None = None):
+        """Free the slot of a call to `endpoint` started at `started`, adapting the limit to its `response`.
+
+        `response` is None if the call failed.
+        """
+        now = time.monotonic()
+        latency = now - started
+        with self._cond:
+            self.in_flight -= 1
+            healthy = response is not None and response.status_code != 429 and response.status_code < 500
+            average = self.latencies.get(endpoint)
+            slow = healthy and average is not None and latency > average * self.latency_factor
+            if healthy:
+                self.latencies[endpoint] = latency if average is None else 0.9 * average + 0.1 * latency
+            if not healthy or slow:
+                if started >= self._backed_off_at:
+                    self._backed_off_at = now
+                    self.limit = max(self.minimum, self.limit / 2)
+                    outcome = 'failed' if response is None else f'{response.status_code} in {latency:.2f}s'
+                    LOGGER.warning('API overloaded (%s), concurrency limit down to %d', outcome, self.limit)
+            else:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self._cond.notify_all()
+
+
+class RateBudget:
+    """Token bucket shared by every process on the host through a small SQLite file.
+
+    Holds up to `burst` tokens (default: one second worth), refilled at `rate` per second. Taking
+    a token from an empty bucket reserves the next one to come and waits for it, so waiting
+    callers are served in turn. The database is only opened on first use.
+    """
+
+    def __init__(self, path: Path | str, rate: float, burst: int | None = None):
+        self.path = Path(path)
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1, math.ceil(rate))
+        self._conn = None
+        self._lock = threading.Lock()
+
+    @property
+    def conn(self):
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False, isolation_level=None)
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS bucket (id INTEGER PRIMARY KEY CHECK (id = 1), tokens REAL, updated_at REAL)'
+            )
+        return self._conn
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def reserve(self) -> float:
+        """Take a token, returning how many seconds to wait before it is due."""
+        with self._lock:
+            conn = self.conn
+            # IMMEDIATE locks the file for writing, so processes update the bucket one at a time
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                now = time.time()
+                row = conn.execute('SELECT tokens, updated_at FROM bucket').fetchone()
+                tokens = self.burst if row is None else min(self.burst, row[0] + max(0.0, now - row[1]) * self.rate)
+                tokens -= 1
+                conn.execute('INSERT OR REPLACE INTO bucket (id, tokens, updated_at) VALUES (1, ?, ?)', (tokens, now))
+                conn.execute('COMMIT')
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+        return max(0.0, -tokens / self.rate)
+
+    def take(self):
+        """Take a token, waiting until it is due."""
+        wait = self.reserve()
+        if wait:
+            time.sleep(wait)
@@ -0,0 +1,30 @@
+import threading
+from collections import Counter, defaultdict
+
+
+class Metrics:
+    """Thread-safe counters of client events (retries, ...), per endpoint."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: dict[str, Counter] = defaultdict(Counter)
+
+    def incr(self, name: str, endpoint: str | None, n=1):
+        with self._lock:
+            self._counters[name][endpoint] += n
+
+    def get(self, name: str, endpoint: str | None = None) -> int:
+        """Count of `name` for `endpoint`, or for every endpoint when None."""
+        with self._lock:
+            counter = self._counters.get(name, Counter())
+            return counter[endpoint] if endpoint is not None else sum(counter.values())
+
+    def ratio(self, name: str, of: str, endpoint: str | None = None) -> float | None:
+        """Count of `name` over count of `of` (such as `hedge_wins` of `hedges`), None when there is no `of`."""
+        total = self.get(of, endpoint)
+        return self.get(name, endpoint) / total if total else None
+
+    def snapshot(self) -> dict[str, dict[str, int]]:
+        """Copy of every counter, as `{name: {endpoint: count}}`."""
+        with self._lock:
+            return {name: dict(counter) for name, counter in self._counters.items()}
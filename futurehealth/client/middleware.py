@@ -0,0 +1,147 @@
+"""Middlewares: the stages every API call goes through, shared by `Client` and `AsyncClient`.
+
+A call runs the `before` stage of each middleware in order, is sent, then runs the `after`
+stage of each middleware in reverse order (like nested wrappers), the last one returning the
+result. If sending or any `after` stage raises, the `on_error` stage of each middleware runs
+in reverse order instead.
+
+The built-in behaviour is itself a list of middlewares, see `default_middlewares`: they come
+first, so they resolve the call before any other middleware sees it, and decode the response
+after every other middleware saw it raw.
+"""
+
+import time
+from dataclasses import dataclass, field
+
+from . import exceptions
+
+USER_AGENT = 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10.15; rv:145.0) Gecko/20100101 Firefox/145.0'
+
+
+@dataclass(slots=True)
+class Call:
+    """One call going through the middlewares, which may change any of its fields in `before`."""
+
+    client: object
+    method: str
+    url: str
+    args: tuple = ()
+    kwargs: dict = field(default_factory=dict)
+    headers: dict | None = None
+    # whether the account token is sent
+    authenticated: bool = False
+    # API endpoint (see `endpoint_name`), None for absolute URLs outside the API
+    endpoint: str | None = None
+    started: float = field(default_factory=time.monotonic)
+    # scratch space for middlewares to keep per-call state between stages
+    state: dict = field(default_factory=dict)
+
+
+class Middleware:
+    """Base class for middlewares: every stage does nothing unless overridden."""
+
+    def before(self, call: Call):
+        """Pre-request stage, before the call is sent."""
+
+    def after(self, call: Call, response):
+        """Post-response stage, returning the response (or whatever it becomes) for the next middleware."""
+        return response
+
+    def on_error(self, call: Call, error: Exception) -> Exception | None:
+        """Error stage, returning another exception to raise instead of `error`, or None to keep it."""
+
+
+class ApiUrl(Middleware):
+    """Resolve API paths against the client `base_url`, adding the headers every API call needs."""
+
+    def before(self, call: Call):
+        client = call.client
+        if client.base_url and not call.url.startswith(('http://', 'https://')):
+            call.endpoint = endpoint_name(call.url)
+            call.url = f'{client.base_url}/{call.url.lstrip("/")}'
+            token = client.token if call.authenticated else None
+            call.headers = _api_headers(client.partnership, client.language, token, call.headers)
+
+
+class DefaultTimeout(Middleware):
+    """Apply the client `timeout` to calls not setting their own."""
+
+    def before(self, call: Call):
+        if call.client.timeout is not None and 'timeout' not in call.kwargs:
+            call.kwargs['timeout'] = call.client.timeout
+
+
+class ParseResponse(Middleware):
+    """Decode the response, raising ClientError/ClientAPIError for failures."""
+
+    def after(self, call: Call, response):
+        return _parse_response(response)
+
+
+def default_middlewares() -> list[Middleware]:
+    return [ParseResponse(), ApiUrl(), DefaultTimeout()]
+
+
+def run_before(middlewares: list[Middleware], call: Call):
+    for middleware in middlewares:
+        middleware.before(call)
+
+
+def run_after(middlewares: list[Middleware], call: Call, response):
+    for middleware in reversed(middlewares):
+        response = middleware.after(call, response)
+    return response
+
+
+def run_on_error(middlewares: list[Middleware], call: Call, error: Exception) -> Exception:
+    for middleware in reversed(middlewares):
+        error = middleware.on_error(call, error) or error
+    return error
+
+
+def endpoint_name(path: str) -> str:
+    """Endpoint of an API path, without the contract token: `contracts/<token>/unified-refunds` is `unified-refunds`."""
+    path = path.split('?', 1)[0].strip('/')
+    if path.startswith('contracts/'):
+        parts = path.split('/', 2)
+        if len(parts) == 3:
+            return parts[2]
+    return path
+
+
+def _api_headers(partnership, language, token=None, headers=None) -> dict:
+    """Build the headers every API call needs, on top of the caller-provided ones."""
+    headers = dict(headers or {})
+    headers['X-Partnership'] = partnership
+    headers['X-Partnershipapilink'] = partnership
+    headers['X-Language'] = language
+    headers['User-Agent'] = USER_AGENT
+    if token is not None:
+        headers['Authorization'] = f'Bearer {token}'
+    return headers
+
+
+def _parse_response(r) -> dict:
+    """Decode an API response, raising ClientError/ClientAPIError for failures.
+
+    Works with any response object exposing `status_code`, `text` and `json()`
+    (requests and httpx alike), so sync and async clients map errors the same way.
+    """
+    if r.status_code != 200:
+        try:
+            rd = r.json()
+        except Exception:
+            exc = exceptions.ClientError(f'Unexpected error: {r.text}')
+        else:
+            exc = exceptions.ClientAPIError(
+                rd,
+                status_code=r.status_code,
+                response=r,
+                message=f'Contracts - {rd.get("resultMessage")} - {rd.get("resultCodeDetail")} ({r.status_code})',
+            )
+        raise exc
+
+    r = r.json()
+    if not r['success']:
+        raise exceptions.ClientError('Unexpected!! Status 200 without success??')
+    return r
@@ -0,0 +1,91 @@
+"""Streaming multipart/form-data bodies for file uploads."""
+
+import os
+import secrets
+import time
+from collections.abc import Callable, Iterator
+from dataclasses import dataclass
+from pathlib import Path
+
+CHUNK_SIZE = 64 * 1024
+
+# same escaping as HTML5 forms (and urllib3): quotes and control characters are percent-encoded
+_HEADER_PARAM_ESCAPES = {ord('"'): '%22', ord('\\'): '\\\\'} | {
+    cc: f'%{cc:02X}' for cc in range(0x20) if cc not in (0x1B,)
+}
+
+
+@dataclass
+class UploadProgress:
+    """Snapshot of an upload in progress, passed to the `progress` callback of `Client.files`."""
+
+    path: Path
+    sent: int
+    total: int
+    elapsed: float
+
+    @property
+    def throughput(self) -> float:
+        """Average bytes per second so far."""
+        return self.sent / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def done(self) -> bool:
+        return self.sent >= self.total
+
+
+class MultipartFile:
+    """multipart/form-data body with a single file field, read from disk in chunks as it is sent.
+
+    Iterating it yields the encoded body without ever loading the whole file in memory, and
+    its length is known upfront so it is sent with a Content-Length. `progress`, if set, is
+    called with an `UploadProgress` after each chunk.
+    """
+
+    def __init__(
+        self,
+        field: str,
+        path: Path,
+        mime_type: str | None = None,
+        progress: Callable[[UploadProgress], None] | None = None,
+        chunk_size=CHUNK_SIZE,
+    ):
+        self.path = path
+        self.progress = progress
+        self.chunk_size = chunk_size
+        boundary = secrets.token_hex(16)
+        self.content_type = f'multipart/form-data; boundary={boundary}'
+        head = (
+            f'--{boundary}\r\n'
+            f'Content-Disposition: form-data; name="{_header_param(field)}"; filename="{_header_param(path.name)}"\r\n'
+        )
+        if mime_type:
+            head += f'Content-Type: {mime_type}\r\n'
+        self.head = f'{head}\r\n'.encode()
+        self.tail = f'\r\n--{boundary}--\r\n'.encode()
+        self.size = os.path.getsize(path)
+
+    def __len__(self):
+        return len(self.head) + self.size + len(self.tail)
+
+    def __iter__(self) -> Iterator[bytes]:
+        total = len(self)
+        sent = 0
+        start = time.monotonic()
+
+        def report(chunk):
+            nonlocal sent
+            sent += len(chunk)
+            if self.progress is not None:
+                self.progress(UploadProgress(self.path, sent, total, time.monotonic() - start))
+            return chunk
+
+        yield report(self.head)
+        with self.path.open('rb') as f:
+            while chunk := f.read(self.chunk_size):
+                yield report(chunk)
+        yield report(self.tail)
+
+
+def _header_param(value: str) -> str:
+    return value.translate(_HEADER_PARAM_ESCAPES)
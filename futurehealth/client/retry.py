@@ -0,0 +1,66 @@
+import datetime as dt
+import email.utils
+import logging
+import random
+from dataclasses import dataclass
+
+LOGGER = logging.getLogger(__name__)
+
+# Statuses the API returns when overloaded, worth another try
+RETRY_STATUSES = frozenset({429, 502, 503})
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """When and how long to wait before retrying a call that failed on an overloaded API or the network.
+
+    Only calls to `endpoints` (default: `IDEMPOTENT_ENDPOINTS`) are retried, since repeating them has no
+    side effect. Waits use decorrelated jitter: each one is random between `base_delay` and three times
+    the previous one, capped at `max_delay`. A longer `Retry-After` from the server is honoured, unless
+    it exceeds `max_delay`, in which case the call fails right away.
+    """
+
+    attempts: int = 4
+    base_delay: float = 0.5
+    max_delay: float = 30.0
+    statuses: frozenset[int] = RETRY_STATUSES
+    endpoints: frozenset[str] | None = None
+    network_errors: bool = True
+
+    def wait(self, attempt: int, previous: float, response=None, error: Exception | None = None) -> float | None:
+        """Seconds to wait before retrying after `attempt` (from 1) got `response` or `error`, or None to stop."""
+        if attempt >= self.attempts or not self.retryable(response, error):
+            return None
+        return self.next_delay(previous, response)
+
+    def retryable(self, response=None, error: Exception | None = None) -> bool:
+        if error is not None:
+            return self.network_errors
+        return response.status_code in self.statuses
+
+    def next_delay(self, previous: float, response=None) -> float | None:
+        """Seconds to wait before the next attempt, or None if it is not worth waiting for."""
+        delay = min(self.max_delay, random.uniform(self.base_delay, max(self.base_delay, previous * 3)))
+        retry_after = parse_retry_after(response.headers.get('Retry-After')) if response is not None else None
+        if retry_after is not None:
+            if retry_after > self.max_delay:
+                return None
+            delay = max(delay, retry_after)
+        return delay
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    """Seconds to wait from a Retry-After header, given in seconds or as an HTTP date."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=dt.timezone.utc)
+    return max(0.0, (when - dt.datetime.now(dt.timezone.utc)).total_seconds())
@@ -0,0 +1,74 @@
+"""Coalescing of concurrent identical calls ("single-flight")."""
+
+import asyncio
+import threading
+from collections.abc import Awaitable, Callable, Hashable
+from concurrent.futures import Future
+
+
+class SingleFlight:
+    """Share the outcome of one call among threads making the same call at the same time.
+
+    The first caller of `do` for a key runs `fn`. Callers with the same key arriving while it
+    runs wait for it and get the same result (or exception) instead of running `fn` themselves.
+    Once it finishes, the next call for that key runs `fn` again: nothing is cached.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: dict[Hashable, Future] = {}
+        # calls answered by another caller's in-flight call
+        self.shared = 0
+
+    def do(self, key: Hashable, fn: Callable):
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+            else:
+                self.shared += 1
+        if not leader:
+            return future.result()
+
+        try:
+            result = fn()
+        except BaseException as e:
+            self._forget(key)
+            future.set_exception(e)
+            raise
+        self._forget(key)
+        future.set_result(result)
+        return result
+
+    def _forget(self, key: Hashable):
+        with self._lock:
+            del self._calls[key]
+
+
+class AsyncSingleFlight:
+    """`SingleFlight` for coroutines on one event loop.
+
+    The shared call runs in its own task, so a caller being cancelled does not cancel it for
+    the others waiting on it.
+    """
+
+    def __init__(self):
+        self._calls: dict[Hashable, asyncio.Task] = {}
+        self.shared = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable]):
+        task = self._calls.get(key)
+        if task is not None:
+            self.shared += 1
+        else:
+            task = self._calls[key] = asyncio.ensure_future(fn())
+            task.add_done_callback(lambda task: self._done(key, task))
+        return await asyncio.shield(task)
+
+    def _done(self, key: Hashable, task: asyncio.Task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            # mark the exception retrieved, even if every caller was cancelled
+            task.exception()
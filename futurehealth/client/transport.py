@@ -0,0 +1,76 @@
+"""HTTP backends used by `Client` to send requests.
+
+A transport sends one request and returns the raw response (anything with `status_code`, `text`,
+`headers` and `json()`), raising `exceptions.ClientNetworkError` when no response is received.
+Turning responses into results or `ClientAPIError`s is left to the client, so it is the same for
+every backend.
+"""
+
+from collections.abc import Callable, Mapping
+from typing import Protocol
+
+import requests
+
+from . import exceptions
+
+
+class Transport(Protocol):
+    def send(self, method: str, url: str, **kwargs): ...
+
+    def close(self): ...
+
+
+class RequestsTransport:
+    """Send requests through a `requests.Session` (the default, with the `Client` itself as session).
+
+    `request` replaces `session.request`, for sessions overriding it (as `Client` does, to go
+    through its transport).
+    """
+
+    def __init__(self, session: requests.Session, request: Callable | None = None):
+        self.session = session
+        self.request = request or session.request
+
+    def send(self, method: str, url: str, *args, **kwargs):
+        try:
+            return self.request(method, url, *args, **kwargs)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            raise exceptions.ClientNetworkError(f'Network error: {e}') from e
+
+    def close(self):
+        self.session.close()
+
+
+class HttpxTransport:
+    """Send requests through an `httpx.Client`, with HTTP/2 by default.
+
+    With HTTP/2, concurrent requests from any number of threads are multiplexed over a single
+    connection per host. Requires the optional `httpx` dependency, with `h2` for HTTP/2
+    (`pip install "future-healthcare[http2]"`).
+    """
+
+    def __init__(self, http2=True, verify=True, **kwargs):
+        """
+        Args:
+            http2: Negotiate HTTP/2 when the server supports it
+            verify: Verify TLS certificates
+            **kwargs: Additional keyword arguments for httpx.Client
+        """
+        import httpx
+
+        self.httpx = httpx
+        self.session = httpx.Client(http2=http2, verify=verify, **kwargs)
+
+    def send(self, method: str, url: str, data=None, allow_redirects=None, **kwargs):
+        if allow_redirects is not None:
+            kwargs['follow_redirects'] = allow_redirects
+        if data is not None:
+            # requests' `data` is form fields when a mapping, the raw (possibly streamed) body otherwise
+            kwargs['data' if isinstance(data, Mapping) else 'content'] = data
+        try:
+            return self.session.request(method, url, **kwargs)
+        except self.httpx.TransportError as e:
+            raise exceptions.ClientNetworkError(f'Network error: {e}') from e
+
+    def close(self):
+        self.session.close()
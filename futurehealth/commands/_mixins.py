@@ -4,8 +4,14 @@ from functools import cached_property
 import classyclick
 import click
 
-from ..client import Client, ContractClient
-from ..utils import token_path
+from ..client import UPLOAD_CACHE_TTL, Client, ContractClient
+from ..client.breaker import CircuitBreaker
+from ..client.cache import DiskCache
+from ..client.hedge import Hedger
+from ..client.limiter import RATE_LIMIT, AdaptiveLimiter, RateBudget
+from ..client.retry import RetryPolicy
+from ..utils import cache_path, rate_budget_path, refunds_db_path, token_path
+from ..utils.store import RefundStore
 
 
 class ContractMixin:
@@ -17,28 +23,86 @@ class ContractMixin:
         return ContractClient(self.client, contract['Token'])
 
 
+class LedgerMixin:
+    @cached_property
+    def ledger(self):
+        """Local refund history and submissions ledger."""
+        return RefundStore(refunds_db_path())
+
+
+# Replace with classyclick.ContextMeta(..., default=...) if/when supported:
+# https://github.com/fopina/classyclick/issues/81
+class _DefaultContextMeta(classyclick.Context):
+    def __init__(self, key: str, default=True, **attrs):
+        super().__init__(default=default, **attrs)
+        self.attrs.pop('default')
+        self._ctx_meta_key = key
+
+    def __call__(self, command):
+        self.store_field_name(command)
+        return self.click.decorators.pass_meta_key(self._ctx_meta_key, **self.attrs)(command)
+
+
 @dataclass(init=False)
 class TlsVerifyMixin:
-    # Replace with classyclick.ContextMeta(..., default=True) if/when supported:
-    # https://github.com/fopina/classyclick/issues/81
-    class _DefaultContextMeta(classyclick.Context):
-        default = True
+    tls_verify: bool = _DefaultContextMeta('tls_verify')
 
-        def __init__(self, key: str, **attrs):
-            super().__init__(**attrs)
-            self._ctx_meta_key = key
 
-        def __call__(self, command):
-            self.store_field_name(command)
-            return self.click.decorators.pass_meta_key(self._ctx_meta_key, **self.attrs)(command)
+@dataclass(init=False)
+class CacheMixin:
+    no_cache: bool = _DefaultContextMeta('no_cache', default=False)
+    refresh_cache: bool = _DefaultContextMeta('refresh_cache', default=False)
+    upload_cache_ttl: int = _DefaultContextMeta('upload_cache_ttl', default=UPLOAD_CACHE_TTL)
 
-    tls_verify: bool = _DefaultContextMeta('tls_verify')
+    @cached_property
+    def cache(self):
+        if self.no_cache:
+            return None
+        return DiskCache(cache_path())
+
+    @property
+    def cache_ttls(self):
+        return {'files': self.upload_cache_ttl}
 
 
-class ClientMixin(TlsVerifyMixin):
+@dataclass(init=False)
+class LimiterMixin:
+    rate_limit: float = _DefaultContextMeta('rate_limit', default=RATE_LIMIT)
+
+    @cached_property
+    def limiter(self):
+        budget = RateBudget(rate_budget_path(), self.rate_limit) if self.rate_limit > 0 else None
+        return AdaptiveLimiter(budget=budget)
+
+
+@dataclass(init=False)
+class HedgeMixin:
+    hedge: bool = _DefaultContextMeta('hedge', default=False)
+
+    @property
+    def hedger(self):
+        return Hedger() if self.hedge else None
+
+
+class ClientMixin(CacheMixin, TlsVerifyMixin, LimiterMixin, HedgeMixin):
+    @property
+    def client_kwargs(self) -> dict:
+        """Arguments of the `Client` commands use."""
+        return {
+            'verify': self.tls_verify,
+            'cache': self.cache,
+            'cache_ttls': self.cache_ttls,
+            'refresh_cache': self.refresh_cache,
+            'single_flight': True,
+            'retry': RetryPolicy(),
+            'limiter': self.limiter,
+            'hedger': self.hedger,
+            'breaker': CircuitBreaker(),
+        }
+
     @cached_property
     def client(self):
-        return Client(verify=self.tls_verify)
+        return Client(**self.client_kwargs)
 
 
 class TokenMixin(ClientMixin):
@@ -51,6 +115,6 @@ class TokenMixin(ClientMixin):
             raise click.ClickException('Run `login` first')
         return token
 
-    @cached_property
-    def client(self):
-        return Client(token=self.token, verify=self.tls_verify)
+    @property
+    def client_kwargs(self) -> dict:
+        return {'token': self.token, **super().client_kwargs}
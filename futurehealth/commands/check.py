@@ -1,32 +1,57 @@
 import datetime as dt
+from contextlib import closing
 
 import classyclick
 import click
 
-from .. import client
+from .. import client, utils
+from ..utils.store import RefundStore
 from . import _mixins
 from .cli import CLI
 from .fetch_error_details import ensure_error_details_files
 
+PAGE_SIZE = 20
+
 
 class Check(CLI.Command, _mixins.ContractMixin, _mixins.TokenMixin):
     limit: int = classyclick.Option(default=None, help='Maximum number of refunds to show')
     last_days: int = classyclick.Option(default=None, help='Only show refunds from the last N days')
+    workers: int = classyclick.Option(default=4, help='Number of refund pages fetched ahead, concurrently')
+    sync: bool = classyclick.Option(
+        help='Incrementally sync the local refund store, fetching only new or changed refunds, and list from it'
+    )
+    full: bool = classyclick.Option(
+        default=False, help='With --sync, walk the whole refund history instead of only the newest pages'
+    )
 
     def __call__(self):
         ensure_error_details_files(tls_verify=self.tls_verify)
         self.validate_options()
-        cutoff_date = self.cutoff_date
-        shown = 0
         try:
             if not self.contract.validate_feature('REFUNDS_CONSULT'):
                 raise click.ClickException('Refund check not available')
         except client.exceptions.ClientError as e:
             raise click.ClickException(str(e))
-        page = 1
-        while True:
-            r = self.contract.unified_refunds(page_size=20, page=page)
-            for refund in r.refunds or []:
+        if self.sync:
+            with RefundStore(utils.refunds_db_path()) as store:
+                try:
+                    # only prefetch pages when the whole history is walked
+                    full = self.full or not store.history_complete
+                    result = store.sync(
+                        self.contract, page_size=PAGE_SIZE, prefetch=self.workers if full else 0, full=full
+                    )
+                except client.exceptions.ClientError as e:
+                    raise click.ClickException(str(e))
+                click.echo(f'Synced {result.fetched} refunds, {result.changed} new or updated', err=True)
+                self.show_refunds(store.refunds())
+        else:
+            self.show_refunds(self.contract.iter_unified_refunds(page_size=self.page_size, prefetch=self.workers))
+
+    def show_refunds(self, refunds):
+        cutoff_date = self.cutoff_date
+        shown = 0
+        with closing(refunds):
+            for refund in refunds:
                 if cutoff_date and not self.is_within_cutoff(refund, cutoff_date):
                     return
 
@@ -36,16 +61,12 @@ class Check(CLI.Command, _mixins.ContractMixin, _mixins.TokenMixin):
                 shown += 1
                 if self.limit and shown >= self.limit:
                     return
-            pagination = r.pagination_result
-            if (
-                pagination
-                and pagination.current_page
-                and pagination.total_pages
-                and pagination.current_page < pagination.total_pages
-            ):
-                page += 1
-            else:
-                break
+
+    @property
+    def page_size(self):
+        if self.limit:
+            return min(PAGE_SIZE, self.limit)
+        return PAGE_SIZE
 
     @property
     def cutoff_date(self):
@@ -54,10 +75,14 @@ class Check(CLI.Command, _mixins.ContractMixin, _mixins.TokenMixin):
         return dt.date.today() - dt.timedelta(days=self.last_days)
 
     def validate_options(self):
+        if self.full and not self.sync:
+            raise click.ClickException('--full requires --sync')
         if self.limit is not None and self.limit <= 0:
             raise click.ClickException('--limit must be greater than 0')
         if self.last_days is not None and self.last_days <= 0:
             raise click.ClickException('--last-days must be greater than 0')
+        if self.workers is not None and self.workers <= 0:
+            raise click.ClickException('--workers must be greater than 0')
 
     def is_within_cutoff(self, refund, cutoff_date):
         expense_date = self.parse_refund_date(refund.expense_date)
@@ -4,6 +4,8 @@ import classyclick
 import click
 
 from .. import utils
+from ..client import UPLOAD_CACHE_TTL
+from ..client.limiter import RATE_LIMIT
 
 
 class CLI(classyclick.helpers.ConfigFileMixin, classyclick.Group):
@@ -23,6 +25,27 @@ class CLI(classyclick.helpers.ConfigFileMixin, classyclick.Group):
         help='Path to the cached Future Healthcare error details JSON file',
         show_default='errors.json next to --config',
     )
+    refunds_db: Path = classyclick.Option(
+        help='Path to the local refund history database used by `check --sync`',
+        show_default='refunds.sqlite3 next to --config',
+    )
+    cache_path: Path = classyclick.Option(
+        help='Path to the local API response cache',
+        show_default='cache.sqlite3 next to --config',
+    )
+    no_cache: bool = classyclick.Option(help='Do not read or write the local API response cache')
+    refresh: bool = classyclick.Option(help='Ignore cached API responses, fetching and caching fresh ones')
+    upload_cache_ttl: int = classyclick.Option(
+        default=UPLOAD_CACHE_TTL,
+        help='Seconds an uploaded document is reused for identical files not yet submitted (0 disables)',
+    )
+    rate_limit: float = classyclick.Option(
+        default=RATE_LIMIT,
+        help='Requests per second shared by every futurehealth process on this host (0 disables)',
+    )
+    hedge: bool = classyclick.Option(
+        help='Send a second request when a building lookup or refund setup is slower than usual (p95)'
+    )
     locale: str = classyclick.Option(
         default=utils.locale(),
         help='Locale for translated Future Healthcare API error messages: pt-PT or en-US',
@@ -36,6 +59,9 @@ class CLI(classyclick.helpers.ConfigFileMixin, classyclick.Group):
         self.token_path = utils.token_path(self.config, override=self.token_path)
         self.log_dir = utils.logs_path(self.config, override=self.log_dir)
         self.errors_path = utils.errors_path(self.config, override=self.errors_path)
+        self.refunds_db = utils.refunds_db_path(self.config, override=self.refunds_db)
+        self.cache_path = utils.cache_path(self.config, override=self.cache_path)
+        rate_budget_path = utils.rate_budget_path(self.config)
         try:
             self.locale = utils.locale(override=self.locale)
         except ValueError as e:
@@ -43,5 +69,13 @@ class CLI(classyclick.helpers.ConfigFileMixin, classyclick.Group):
         self.ctx.meta['token_path'] = self.token_path
         self.ctx.meta['log_dir'] = self.log_dir
         self.ctx.meta['errors_path'] = self.errors_path
+        self.ctx.meta['refunds_db'] = self.refunds_db
+        self.ctx.meta['cache_path'] = self.cache_path
+        self.ctx.meta['no_cache'] = self.no_cache
+        self.ctx.meta['refresh_cache'] = self.refresh
+        self.ctx.meta['upload_cache_ttl'] = self.upload_cache_ttl
+        self.ctx.meta['rate_limit'] = self.rate_limit
+        self.ctx.meta['rate_budget_path'] = rate_budget_path
+        self.ctx.meta['hedge'] = self.hedge
         self.ctx.meta['locale'] = self.locale
         self.ctx.meta['tls_verify'] = not self.insecure
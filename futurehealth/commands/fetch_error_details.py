@@ -10,6 +10,7 @@ import click
 import requests
 
 from .. import client, utils
+from ..client import _numeric_result_code
 from . import _mixins
 from .cli import CLI
 
@@ -128,13 +129,6 @@ def format_error_detail(error_detail, i18n_labels):
     return f'[{error_detail["resultCode"]}][{label}] {strip_html_tags(i18n_message_for(label, i18n_labels))}'
 
 
-def _numeric_result_code(value):
-    try:
-        return int(value)
-    except (TypeError, ValueError):
-        return None
-
-
 def _error_message_key(label):
     return label.rsplit('.', 1)[-1]
 
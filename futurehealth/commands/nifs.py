@@ -1,3 +1,8 @@
+import json
+from collections.abc import Iterable, Iterator
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from pathlib import Path
+
 import classyclick
 import click
 
@@ -27,8 +32,10 @@ def select_building(
     *,
     prompt_for_nif: bool = True,
     prompt_for_building: bool = True,
+    known_buildings: dict[str, list[Building]] | None = None,
 ) -> tuple[Building, str]:
     building_name = normalize_building_name(building_name)
+    known_buildings = known_buildings or {}
     while True:
         if not utils.validate_nif(nif):
             if not prompt_for_nif:
@@ -36,7 +43,7 @@ def select_building(
             nif = click.prompt(f'{nif} is not a valid NIF, enter correct one')
             continue
 
-        cands = contract.load_buildings(nif)
+        cands = known_buildings[nif] if nif in known_buildings else contract.load_buildings(nif)
         if cands:
             break
 
@@ -85,23 +92,101 @@ def select_building_from_candidates(
             raise click.ClickException('Building selection cancelled')
 
 
+def read_nifs(nifs: Iterable[str], path: Path | None = None) -> list[str]:
+    """Collect NIFs from arguments and from a file ("-" for stdin) with one or more per line, without duplicates.
+
+    Spaces inside a NIF are dropped and lines starting with "#" are ignored. The first occurrence sets the order.
+    """
+    if path is not None:
+        try:
+            with click.open_file(str(path)) as f:
+                lines = f.read().splitlines()
+        except OSError as e:
+            raise click.ClickException(f'Could not read NIFs from {path}: {e}')
+        nifs = [*nifs, *(nif for line in lines if not line.lstrip().startswith('#') for nif in line.split(','))]
+    return list(dict.fromkeys(nif for nif in (''.join(nif.split()) for nif in nifs) if nif))
+
+
+def lookup_buildings(contract, nifs: list[str], workers: int) -> Iterator[tuple[str, list[Building] | Exception]]:
+    """Load the buildings of each NIF concurrently, yielding `(nif, buildings or error)` as each lookup completes.
+
+    Invalid NIFs are reported first, without any request. A NIF listed more than once is only looked up once.
+    """
+    lookups: dict[str, Future] = {}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for nif in nifs:
+            if not utils.validate_nif(nif):
+                yield nif, click.ClickException(f'{nif} is not a valid NIF')
+            elif nif not in lookups:
+                lookups[nif] = pool.submit(contract.load_buildings, nif)
+        try:
+            futures = {future: nif for nif, future in lookups.items()}
+            for future in as_completed(futures):
+                try:
+                    yield futures[future], future.result()
+                except client.exceptions.ClientError as e:
+                    yield futures[future], e
+        finally:
+            # stop early if the consumer does
+            for future in lookups.values():
+                future.cancel()
+
+
 class Nifs(CLI.Command, _mixins.ContractMixin, _mixins.TokenMixin):
-    """Look up refund submission buildings/addresses for a business NIF."""
+    """Look up refund submission buildings/addresses for business NIFs.
+
+    NIFs are given as arguments, in --file (one or more per line, comma separated, "-" for stdin) or piped in.
+    With a single NIF its buildings are listed. With more, they are looked up concurrently and one JSON line is
+    written per NIF as soon as it is resolved.
+    """
 
-    nif: str = classyclick.Argument()
+    nifs: tuple[str, ...] = classyclick.Argument(nargs=-1)
+    file: Path = classyclick.Option('-f', default=None, help='File with NIFs to look up, "-" for stdin')
+    workers: int = classyclick.Option(default=8, help='Number of NIFs looked up concurrently')
+    jsonl: bool = classyclick.Option(help='Write one JSON line per NIF, even when looking up a single one')
 
     def __call__(self):
+        if self.workers <= 0:
+            raise click.ClickException('--workers must be greater than 0')
+        path = self.file
+        if path is None and not self.nifs and not click.get_text_stream('stdin').isatty():
+            path = Path('-')
+        nifs = read_nifs(self.nifs, path)
+        if not nifs:
+            raise click.ClickException('No NIFs given, pass them as arguments or with --file')
         try:
             if not self.contract.validate_feature('REFUNDS_SUBMISSION'):
                 raise click.ClickException('Refund submission not available')
-            if not utils.validate_nif(self.nif):
-                raise click.ClickException(f'{self.nif} is not a valid NIF')
-            buildings = self.contract.load_buildings(self.nif)
+        except client.exceptions.ClientError as e:
+            raise click.ClickException(str(e))
+
+        if len(nifs) == 1 and not self.jsonl:
+            self.show_buildings(nifs[0])
+            return
+
+        failed = 0
+        for nif, result in lookup_buildings(self.contract, nifs, self.workers):
+            if isinstance(result, Exception):
+                line = {'nif': nif, 'error': getattr(result, 'message', None) or str(result)}
+            elif not result:
+                line = {'nif': nif, 'error': f'{nif} has no buildings'}
+            else:
+                line = {'nif': nif, 'buildings': [building.model_dump(exclude_none=True) for building in result]}
+            failed += 'error' in line
+            click.echo(json.dumps(line, ensure_ascii=False))
+        if failed:
+            raise click.ClickException(f'{failed} of {len(nifs)} NIFs could not be resolved')
+
+    def show_buildings(self, nif: str):
+        try:
+            if not utils.validate_nif(nif):
+                raise click.ClickException(f'{nif} is not a valid NIF')
+            buildings = self.contract.load_buildings(nif)
         except client.exceptions.ClientError as e:
             raise click.ClickException(str(e))
 
         if not buildings:
-            raise click.ClickException(f'{self.nif} has no buildings')
+            raise click.ClickException(f'{nif} has no buildings')
 
         for building in buildings:
             click.echo(format_building(building))
@@ -1,6 +1,9 @@
 import logging
 import re
 import shutil
+import time
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+from dataclasses import astuple
 from datetime import datetime
 from functools import cached_property
 from pathlib import Path
@@ -9,18 +12,208 @@ import classyclick
 import click
 
 from .. import client, utils
-from ..client.models import Building
+from ..client.models import Building, Person, Service
+from ..utils.dag import StepGraph
+from ..utils.journal import SubmissionJournal
 from ..utils.models import ReceiptData
+from ..utils.store import FAILED, PENDING, SUBMITTED, RefundStore
 from . import _mixins
 from .cli import CLI
 from .fetch_error_details import ensure_error_details_files, translated_api_error_message
 from .nifs import select_building
 
+LOGGER = logging.getLogger(__name__)
+
+# documents uploaded concurrently by default, per submission
+UPLOAD_WORKERS = 4
+# network failures retried by submit_refund, waiting SUBMIT_RETRY_DELAY, then twice as long, and so on
+SUBMIT_RETRIES = 2
+SUBMIT_RETRY_DELAY = 1.0
+# journal of completed steps, next to the log of each submission
+JOURNAL_SUFFIX = '.journal.jsonl'
+
+
+def normalize_date(value: str) -> str:
+    # It's either YEAR MM DD or DD MM YEAR (no US format), easy to detect.
+    date_parts = re.findall(r'\b(\d+)\b', value)
+    if len(date_parts) < 3:
+        raise click.ClickException(f'{value} does not seem to contain a full date')
+    if len(date_parts[2]) == 4:
+        date_parts.reverse()
+    elif len(date_parts[0]) != 4:
+        raise click.ClickException(f'{value} does not seem to contain full year')
+    return '-'.join(date_parts[:3])
+
+
+def select_service(services: list[Service], service_name: str | None = None, *, prompt: bool = False) -> Service:
+    cands = services
+    if service_name:
+        ls = service_name.lower()
+        cands = [service for service in cands if ls in service.name.lower()]
+
+    if not cands:
+        raise click.ClickException(f"No service found matching '{service_name}'")
+
+    if len(cands) == 1:
+        return cands[0]
+
+    choices = [f'{i + 1}. {cand.name}' for i, cand in enumerate(cands)]
+    click.secho('Multiple services found:', fg='red')
+    for choice in choices:
+        click.echo(choice)
+
+    if not prompt:
+        raise click.ClickException(
+            'Multiple services found. Pass --service with a more specific value, or use --interactive.'
+        )
+
+    while True:
+        try:
+            selection = click.prompt('Select service number', type=int, default=1)
+            if 1 <= selection <= len(cands):
+                return cands[selection - 1]
+            else:
+                click.echo(f'Please enter a number between 1 and {len(cands)}')
+        except click.Abort:
+            raise click.ClickException('Service selection cancelled')
+
+
+def select_person(persons: list[Person], person_name: str | None = None, *, prompt: bool = False) -> Person:
+    cands = persons
+    if person_name:
+        lp = person_name.lower()
+        cands = [person for person in cands if lp in person.name.lower()]
+
+    if not cands:
+        raise click.ClickException(f"No person found matching '{person_name}'")
+    if len(cands) == 1:
+        return cands[0]
+
+    choices = [f'{i + 1}. {cand.name}' for i, cand in enumerate(cands)]
+    click.secho('Multiple persons found:', fg='red')
+    for choice in choices:
+        click.echo(choice)
+
+    if not prompt:
+        raise click.ClickException(
+            'Multiple persons found. Pass --person with a more specific value, or use --interactive.'
+        )
 
-class Submit(CLI.Command, _mixins.ContractMixin, _mixins.TokenMixin):
+    while True:
+        try:
+            selection = click.prompt('Select person number', type=int, default=1)
+            if 1 <= selection <= len(cands):
+                return cands[selection - 1]
+            else:
+                click.echo(f'Please enter a number between 1 and {len(cands)}')
+        except click.Abort:
+            raise click.ClickException('Person selection cancelled')
+
+
+def upload_documents(
+    api_client, receipt_file: Path, other_attachments: list[Path] | None = None, workers=UPLOAD_WORKERS
+) -> list[str]:
+    """Upload the receipt (as invoice) and its attachments, returning document GUIDs in the same order.
+
+    Up to `workers` documents are uploaded concurrently. When one upload fails, uploads not yet
+    started are cancelled, the ones in flight are left to finish, and the first error is raised.
+    """
+    uploads = [(receipt_file, True)] + [(other, False) for other in other_attachments or []]
+    if workers <= 1 or len(uploads) == 1:
+        return [api_client.files(path, is_invoice=is_invoice)['guid'] for path, is_invoice in uploads]
+
+    pool = ThreadPoolExecutor(max_workers=min(workers, len(uploads)))
+    try:
+        futures = [pool.submit(api_client.files, path, is_invoice=is_invoice) for path, is_invoice in uploads]
+        done, _ = wait(futures, return_when=FIRST_EXCEPTION)
+        for future in futures:
+            if future in done and future.exception() is not None:
+                raise future.exception()
+        return [future.result()['guid'] for future in futures]
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def submit_refund(
+    contract, ledger: RefundStore, submission: client.RefundSubmission, retries=SUBMIT_RETRIES, logger=LOGGER
+) -> bool:
+    """Submit one refund, keeping track of it in the submissions ledger.
+
+    Network failures are retried (with exponential backoff) up to `retries` times: this is safe as the
+    `originId` of a submission only depends on the expense, so the API sees the same request again.
+    Returns False, without submitting, if the ledger shows the expense was already submitted.
+    """
+    entry = ledger.submission(submission.key)
+    if entry is not None and entry.status == SUBMITTED:
+        return False
+    for attempt in range(retries + 1):
+        ledger.record_submission(submission, PENDING, attempt=True)
+        try:
+            contract.multiple_refunds_requests(*astuple(submission))
+        except client.exceptions.ClientNetworkError as e:
+            ledger.record_submission(submission, PENDING, error=str(e))
+            if attempt == retries:
+                raise
+            logger.warning('Submission failed (%s), retrying', e)
+            time.sleep(SUBMIT_RETRY_DELAY * 2**attempt)
+        except client.exceptions.ClientError as e:
+            ledger.record_submission(submission, FAILED, error=str(e))
+            raise
+        else:
+            ledger.record_submission(submission, SUBMITTED)
+            return True
+
+
+def submit_refunds(
+    contract,
+    ledger: RefundStore,
+    submissions: list[client.RefundSubmission],
+    batch_size=client.REFUND_SUBMISSIONS_BATCH_SIZE,
+    retries=SUBMIT_RETRIES,
+    logger=LOGGER,
+) -> list[client.RefundSubmissionResult]:
+    """Batched `submit_refund`: one result per submission, in input order.
+
+    Submissions that failed on the network are retried together, and the ones already submitted
+    according to the ledger fail without being sent.
+    """
+    results = [None] * len(submissions)
+    todo = []
+    for index, submission in enumerate(submissions):
+        entry = ledger.submission(submission.key)
+        if entry is not None and entry.status == SUBMITTED:
+            error = client.exceptions.ClientError('Already submitted from this machine')
+            results[index] = client.RefundSubmissionResult(index, submission, error=error)
+        else:
+            todo.append(index)
+
+    for attempt in range(retries + 1):
+        for index in todo:
+            ledger.record_submission(submissions[index], PENDING, attempt=True)
+        batch = contract.multiple_refunds_requests_batch([submissions[index] for index in todo], batch_size=batch_size)
+        retry = []
+        for index, result in zip(todo, batch):
+            result.index = index
+            results[index] = result
+            if result.success:
+                ledger.record_submission(result.submission, SUBMITTED)
+            elif isinstance(result.error, client.exceptions.ClientNetworkError):
+                ledger.record_submission(result.submission, PENDING, error=str(result.error))
+                retry.append(index)
+            else:
+                ledger.record_submission(result.submission, FAILED, error=str(result.error))
+        if not retry or attempt == retries:
+            break
+        logger.warning('%d submissions failed on the network, retrying', len(retry))
+        time.sleep(SUBMIT_RETRY_DELAY * 2**attempt)
+        todo = retry
+    return results
+
+
+class Submit(CLI.Command, _mixins.ContractMixin, _mixins.LedgerMixin, _mixins.TokenMixin):
     """Submit an expense, providing the receipt and, optionally, other attachments such as prescription"""
 
-    receipt_file: Path = classyclick.Argument()
+    receipt_file: Path = classyclick.Argument(required=False)
     other_attachments: list[Path] = classyclick.Argument(nargs=-1, type=Path)
     business_nif: str = classyclick.Option(help='Business NIF from the receipt')
     invoice_number: str = classyclick.Option(help='Invoice or receipt number')
@@ -43,35 +236,75 @@ class Submit(CLI.Command, _mixins.ContractMixin, _mixins.TokenMixin):
     primary_entity: bool = classyclick.Option(
         help='Whether this expense was already partially covered by another entity'
     )
+    upload_workers: int = classyclick.Option(default=UPLOAD_WORKERS, help='Number of documents uploaded concurrently')
+    allow_duplicate: bool = classyclick.Option(
+        help='Submit even if the local ledger or synced refund history already has this receipt'
+    )
+    resume: str = classyclick.Option(
+        default=None,
+        help='Log prefix (e.g. 20260314_1030) of an interrupted submission to continue from its last completed step',
+    )
+
+    # set up by setup_logging: steps completed by this submission (and their outputs)
+    journal = None
 
     def __call__(self):
         self.setup_logging()
         ensure_error_details_files(tls_verify=self.tls_verify)
         try:
+            if self.journaled('submitted') is not None:
+                self.console_logger.info('Submission %s was already completed', self.resume)
+                return
             data = self.get_receipt_data()
             self.console_logger.info(f'Receipt data: {data}')
 
-            if not self.contract.validate_feature('REFUNDS_SUBMISSION'):
-                raise click.ClickException('Refund submission not available')
-            building, new_nif = self.get_building(data.business_nif)
-            self.console_logger.info('Building selected: %s', building)
-            if new_nif != data.business_nif:
-                self.console_logger.info('NIF fixed from %s to %s', data.business_nif, new_nif)
-                data.business_nif = new_nif
-
-            service = self.get_service()
-            self.console_logger.info('Service selected: %s - %s', service.id, service.name)
-            person = self.get_person()
-            self.console_logger.info('Person selected: %s - %s', person.card_number, person.name)
-
-            docs = []
-            docs.append(self.client.files(self.receipt_file, is_invoice=True)['guid'])
-            self.console_logger.info('Document created: %s', docs[-1])
-            for other in self.other_attachments or []:
-                docs.append(self.client.files(other)['guid'])
-                self.console_logger.info('Document created: %s', docs[-1])
-
-            self.contract.multiple_refunds_requests(
+            # every step below only needs the contract: independent ones run concurrently, and
+            # selections (which may prompt) run in this thread once their data is fetched.
+            # Steps found in the journal of a resumed submission are not run again.
+            contract = self.contract
+            steps = StepGraph(max_workers=3)
+            steps.add('feature', self.check_feature)
+            steps.add('setup', self.prefetch_setup)
+            steps.add('buildings', lambda: self.prefetch_buildings(data.business_nif))
+            steps.add(
+                'service',
+                lambda *_: self.resumed('service', Service) or self.select_service(),
+                after=('feature', 'setup'),
+                main=True,
+            )
+            steps.add(
+                'person',
+                lambda *_: self.resumed('person', Person) or self.select_person(),
+                after=('feature', 'setup'),
+                main=True,
+            )
+            # before any prompt for the building and before uploading anything
+            steps.add('duplicate', lambda person: self.check_duplicate(data, person), after=('person',), main=True)
+            steps.add(
+                'building',
+                lambda _, known: self.resumed_building(data) or self.select_building(data, known),
+                after=('duplicate', 'buildings'),
+                main=True,
+            )
+            # the building selection may fix the NIF, which the ledger matches submissions on
+            steps.add(
+                'fixed_nif_duplicate',
+                lambda person, _: self.check_duplicate(data, person),
+                after=('person', 'building'),
+                main=True,
+            )
+            # uploads only start once the submission is known to be possible
+            steps.add(
+                'docs',
+                lambda *_: self.resumed_documents() or self.upload_documents(),
+                after=('service', 'fixed_nif_duplicate'),
+            )
+            results = steps.run()
+            building, service, person, docs = (results[name] for name in ('building', 'service', 'person', 'docs'))
+            for doc in docs:
+                self.console_logger.info('Document created: %s', doc)
+
+            submission = client.RefundSubmission(
                 person.card_number,
                 service.id,
                 data.business_nif,
@@ -84,6 +317,13 @@ class Submit(CLI.Command, _mixins.ContractMixin, _mixins.TokenMixin):
                 building.id,
                 person.email,
             )
+            if not submit_refund(contract, self.ledger, submission, logger=self.console_logger):
+                raise click.ClickException(
+                    f'Receipt {data.invoice_number} from {data.business_nif} was already submitted from this machine'
+                )
+            self.record('submitted')
+            # attached now, so identical files must be uploaded again next time
+            self.client.forget_uploads(docs, keys=(self.journaled('docs') or {}).get('keys'))
         except client.exceptions.ClientAPIError as e:
             self.file_logger.exception('Failed to submit with exception')
             raise click.ClickException(translated_api_error_message(e) or str(e))
@@ -93,9 +333,56 @@ class Submit(CLI.Command, _mixins.ContractMixin, _mixins.TokenMixin):
         except Exception:
             self.file_logger.exception('Failed to submit with exception')
             raise
+        finally:
+            # documents not attached to a submission are left for the next attempt to reuse
+            if 'client' in self.__dict__:
+                self.client.release_uploads()
         self.console_logger.info('Submission completed')
 
+    def record(self, step: str, **data):
+        if self.journal is not None:
+            self.journal.record(step, **data)
+
+    def journaled(self, step: str) -> dict | None:
+        """Outputs of `step` if this is a resumed submission that already completed it."""
+        if self.journal is None or not self.resume:
+            return None
+        return self.journal.get(step)
+
+    def resumed(self, step: str, model):
+        found = self.journaled(step)
+        if found is None:
+            return None
+        value = model.model_validate(found[step])
+        self.console_logger.info('%s resumed: %s', step.capitalize(), value)
+        return value
+
+    def resumed_building(self, data: ReceiptData) -> Building | None:
+        building = self.resumed('building', Building)
+        if building is not None:
+            data.business_nif = self.journaled('building')['nif']
+        return building
+
+    def resumed_documents(self) -> list[str] | None:
+        found = self.journaled('docs')
+        return found['documents'] if found else None
+
+    def upload_documents(self) -> list[str]:
+        docs = upload_documents(self.client, self.receipt_file, self.other_attachments, workers=self.upload_workers)
+        self.record('docs', documents=docs, keys=self.client.upload_keys(docs))
+        return docs
+
     def get_receipt_data(self):
+        resumed = self.journaled('receipt')
+        if resumed is not None:
+            # the receipt and attachments were copied to the logs directory when the submission started
+            self.receipt_file = Path(resumed['receipt_file'])
+            self.other_attachments = [Path(attachment) for attachment in resumed['other_attachments']]
+            self.primary_entity = resumed['primary_entity']
+            data = ReceiptData.model_validate(resumed['data'])
+            self.console_logger.debug(f'Using receipt data from resumed submission: {data}')
+            return data
+
         self.validate_required_receipt_fields()
         data = ReceiptData(
             business_nif=self.business_nif,
@@ -105,6 +392,14 @@ class Submit(CLI.Command, _mixins.ContractMixin, _mixins.TokenMixin):
         )
         data.date = self.normalize_date(data.date)
         self.console_logger.debug(f'Using receipt data from CLI flags: {data}')
+        if self.journal is not None:
+            self.journal.record(
+                'receipt',
+                data=data.model_dump(),
+                receipt_file=str(self.input_copies[0]),
+                other_attachments=[str(copy) for copy in self.input_copies[1:]],
+                primary_entity=self.primary_entity,
+            )
         return data
 
     def validate_required_receipt_fields(self):
@@ -126,24 +421,26 @@ class Submit(CLI.Command, _mixins.ContractMixin, _mixins.TokenMixin):
             )
 
     def normalize_date(self, value: str) -> str:
-        # It's either YEAR MM DD or DD MM YEAR (no US format), easy to detect.
-        date_parts = re.findall(r'\b(\d+)\b', value)
-        if len(date_parts) < 3:
-            raise click.ClickException(f'{value} does not seem to contain a full date')
-        if len(date_parts[2]) == 4:
-            date_parts.reverse()
-        elif len(date_parts[0]) != 4:
-            raise click.ClickException(f'{value} does not seem to contain full year')
-        return '-'.join(date_parts[:3])
+        return normalize_date(value)
 
     def setup_logging(self):
         # Set up logging directory and file copying
         logs_dir = utils.logs_path()
         logs_dir.mkdir(parents=True, exist_ok=True)
 
-        # Generate prefix based on YEARMMDD_HHMM format
-        now = datetime.now()
-        prefix = now.strftime('%Y%m%d_%H%M')
+        if self.resume:
+            prefix = self.resume
+            if not (logs_dir / f'{prefix}{JOURNAL_SUFFIX}').exists():
+                raise click.ClickException(f'No submission journal found for {prefix} in {logs_dir}')
+        else:
+            # Generate prefix based on YEARMMDD_HHMM format, with seconds if that one was already used
+            now = datetime.now()
+            prefix = now.strftime('%Y%m%d_%H%M')
+            if (logs_dir / f'{prefix}{JOURNAL_SUFFIX}').exists():
+                prefix = now.strftime('%Y%m%d_%H%M%S')
+            if self.receipt_file is None:
+                raise click.ClickException('Missing RECEIPT_FILE, or --resume with the prefix of a previous submission')
+        self.journal = SubmissionJournal(logs_dir / f'{prefix}{JOURNAL_SUFFIX}')
 
         # Set up formatters
         formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
@@ -166,89 +463,85 @@ class Submit(CLI.Command, _mixins.ContractMixin, _mixins.TokenMixin):
         self.console_logger.addHandler(console_handler)
 
         self.console_logger.info(f'Logging to: {logs_dir / f"{prefix}.log"}')
+        if self.resume:
+            self.console_logger.info('Resuming submission %s', prefix)
+            return
         self.console_logger.debug(f'Starting submission for file: {self.receipt_file}')
 
         # Copy input files to logs directory with prefix
         files_to_copy = [('Invoice/receipt file', self.receipt_file)] + [
             ('Supporting attachment file', attachment) for attachment in self.other_attachments or []
         ]
+        self.input_copies = []
         for file_label, file in files_to_copy:
             file_copy = logs_dir / f'{prefix}_{file.name}'
             shutil.copy2(file, file_copy)
+            self.input_copies.append(file_copy)
             self.console_logger.debug('%s copied to: %s', file_label, file_copy)
 
     @cached_property
     def refunds_request_setup(self):
         return self.contract.refunds_request_setup()
 
-    def get_service(self):
-        cands = self.refunds_request_setup.services
-        if self.service:
-            ls = self.service.lower()
-            cands = [service for service in cands if ls in service.name.lower()]
-
-        if not cands:
-            raise click.ClickException(f"No service found matching '{self.service}'")
+    def check_feature(self):
+        if not self.contract.validate_feature('REFUNDS_SUBMISSION'):
+            raise click.ClickException('Refund submission not available')
 
-        if len(cands) == 1:
-            return cands[0]
-
-        choices = [f'{i + 1}. {cand.name}' for i, cand in enumerate(cands)]
-        click.secho('Multiple services found:', fg='red')
-        for choice in choices:
-            click.echo(choice)
-
-        if not self.interactive:
+    def check_duplicate(self, data: ReceiptData, person: Person):
+        if self.allow_duplicate:
+            return
+        duplicate = self.ledger.find_duplicate(
+            person.card_number, data.business_nif, data.invoice_number, data.total_amount, data.date
+        )
+        if duplicate:
             raise click.ClickException(
-                'Multiple services found. Pass --service with a more specific value, or use --interactive.'
+                f'Receipt {data.invoice_number} looks already submitted: {duplicate}. '
+                'Pass --allow-duplicate to submit it anyway.'
             )
 
-        while True:
-            try:
-                selection = click.prompt('Select service number', type=int, default=1)
-                if 1 <= selection <= len(cands):
-                    return cands[selection - 1]
-                else:
-                    click.echo(f'Please enter a number between 1 and {len(cands)}')
-            except click.Abort:
-                raise click.ClickException('Service selection cancelled')
+    def prefetch_setup(self):
+        if self.journaled('service') is None or self.journaled('person') is None:
+            return self.refunds_request_setup
+
+    def prefetch_buildings(self, nif: str) -> dict[str, list[Building]]:
+        """Fetch buildings for a valid NIF ahead of `get_building`, which otherwise fetches them itself."""
+        if not utils.validate_nif(nif) or self.journaled('building') is not None:
+            return {}
+        return {nif: self.contract.load_buildings(nif)}
+
+    def select_building(self, data: ReceiptData, known_buildings: dict[str, list[Building]] | None = None) -> Building:
+        building, new_nif = self.get_building(data.business_nif, known_buildings)
+        self.console_logger.info('Building selected: %s', building)
+        if new_nif != data.business_nif:
+            self.console_logger.info('NIF fixed from %s to %s', data.business_nif, new_nif)
+            data.business_nif = new_nif
+        self.record('building', building=building.model_dump(), nif=new_nif)
+        return building
+
+    def select_service(self) -> Service:
+        service = self.get_service()
+        self.console_logger.info('Service selected: %s - %s', service.id, service.name)
+        self.record('service', service=service.model_dump(by_alias=True))
+        return service
+
+    def select_person(self) -> Person:
+        person = self.get_person()
+        self.console_logger.info('Person selected: %s - %s', person.card_number, person.name)
+        self.record('person', person=person.model_dump(by_alias=True))
+        return person
+
+    def get_service(self):
+        return select_service(self.refunds_request_setup.services, self.service, prompt=self.interactive)
 
     def get_person(self):
-        cands = self.refunds_request_setup.insured_persons
-        if self.person:
-            lp = self.person.lower()
-            cands = [person for person in cands if lp in person.name.lower()]
-
-        if not cands:
-            raise click.ClickException(f"No person found matching '{self.person}'")
-        if len(cands) == 1:
-            return cands[0]
-
-        choices = [f'{i + 1}. {cand.name}' for i, cand in enumerate(cands)]
-        click.secho('Multiple persons found:', fg='red')
-        for choice in choices:
-            click.echo(choice)
-
-        if not self.interactive:
-            raise click.ClickException(
-                'Multiple persons found. Pass --person with a more specific value, or use --interactive.'
-            )
+        return select_person(self.refunds_request_setup.insured_persons, self.person, prompt=self.interactive)
 
-        while True:
-            try:
-                selection = click.prompt('Select person number', type=int, default=1)
-                if 1 <= selection <= len(cands):
-                    return cands[selection - 1]
-                else:
-                    click.echo(f'Please enter a number between 1 and {len(cands)}')
-            except click.Abort:
-                raise click.ClickException('Person selection cancelled')
-
-    def get_building(self, nif: str) -> tuple[Building, str]:
+    def get_building(self, nif: str, known_buildings: dict[str, list[Building]] | None = None) -> tuple[Building, str]:
         return select_building(
             self.contract,
             nif,
             self.building,
             prompt_for_nif=self.interactive,
             prompt_for_building=self.interactive,
+            known_buildings=known_buildings,
         )
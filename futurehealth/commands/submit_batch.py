@@ -0,0 +1,249 @@
+import csv
+import json
+import logging
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+
+import classyclick
+import click
+import pydantic
+
+from .. import client
+from ..client.models import Person, Service
+from ..utils.models import ManifestRow
+from . import _mixins
+from .cli import CLI
+from .fetch_error_details import ensure_error_details_files, translated_api_error_message
+from .nifs import select_building
+from .submit import normalize_date, select_person, select_service, submit_refunds, upload_documents
+
+LOGGER = logging.getLogger(__name__)
+
+
+@dataclass
+class RowResult:
+    row: int
+    receipt: str | None
+    status: str
+    documents: list[str] = field(default_factory=list)
+    error: str | None = None
+    elapsed: float = 0.0
+
+
+@dataclass
+class ResolvedRow:
+    result: RowResult
+    data: ManifestRow
+    service: Service
+    person: Person
+
+
+@contextmanager
+def row_errors(result: RowResult):
+    """Record any error raised while processing a row in its result: one broken row must not abort the batch."""
+    try:
+        yield
+    except pydantic.ValidationError as e:
+        result.error = '; '.join(f'{".".join(map(str, err["loc"]))}: {err["msg"]}' for err in e.errors())
+    except click.ClickException as e:
+        result.error = e.message
+    except client.exceptions.ClientError as e:
+        result.error = error_message(e)
+    except Exception as e:
+        LOGGER.exception('Unexpected error processing row %s', result.row)
+        result.error = f'Unexpected error: {e}'
+
+
+def error_message(error: client.exceptions.ClientError) -> str:
+    if isinstance(error, client.exceptions.ClientAPIError):
+        return translated_api_error_message(error) or str(error)
+    return str(error)
+
+
+def read_manifest(path: Path) -> list[tuple[int, dict]]:
+    """Read a CSV (with header) or JSONL manifest into (row number, fields) pairs.
+
+    Empty CSV cells are dropped, and relative receipt/attachment paths are resolved against
+    the manifest directory.
+    """
+    try:
+        with path.open(newline='') as f:
+            if path.suffix.lower() in ('.jsonl', '.ndjson'):
+                rows = [json.loads(line) for line in f if line.strip()]
+            else:
+                rows = [{k: v for k, v in row.items() if v not in (None, '')} for row in csv.DictReader(f)]
+    except (OSError, ValueError, csv.Error) as e:
+        raise click.ClickException(f'Could not read manifest {path}: {e}')
+
+    base = path.parent
+    for row in rows:
+        if row.get('receipt'):
+            row['receipt'] = base / row['receipt']
+        attachments = ManifestRow.split_attachments(row.get('attachments') or [])
+        row['attachments'] = [base / attachment for attachment in attachments]
+    return list(enumerate(rows, start=1))
+
+
+class SubmitBatch(CLI.Command, _mixins.ContractMixin, _mixins.LedgerMixin, _mixins.TokenMixin):
+    """Submit many expenses listed in a CSV or JSONL manifest.
+
+    Each row needs receipt, business_nif, invoice_number, total_amount and date, and may set attachments
+    (";"-separated in CSV), person, service, building and primary_entity.
+    """
+
+    manifest: Path = classyclick.Argument()
+    results: Path = classyclick.Option(
+        help='File to write per-row JSONL results to', show_default='MANIFEST.results.jsonl next to the manifest'
+    )
+    workers: int = classyclick.Option(default=4, help='Number of rows processed concurrently')
+    batch_size: int = classyclick.Option(
+        default=client.REFUND_SUBMISSIONS_BATCH_SIZE, help='Number of rows submitted in each API request'
+    )
+    allow_duplicate: bool = classyclick.Option(
+        help='Submit rows even if the local ledger or synced refund history already has their receipt'
+    )
+
+    def __call__(self):
+        ensure_error_details_files(tls_verify=self.tls_verify)
+        if self.workers <= 0:
+            raise click.ClickException('--workers must be greater than 0')
+        if self.batch_size <= 0:
+            raise click.ClickException('--batch-size must be greater than 0')
+        rows = read_manifest(self.manifest)
+
+        # resolved once, shared by every row
+        try:
+            if not self.contract.validate_feature('REFUNDS_SUBMISSION'):
+                raise click.ClickException('Refund submission not available')
+            setup = self.contract.refunds_request_setup()
+        except client.exceptions.ClientError as e:
+            raise click.ClickException(str(e))
+
+        results_path = self.results or self.manifest.with_name(f'{self.manifest.stem}.results.jsonl')
+        counts = Counter()
+        start = time.monotonic()
+        try:
+            with results_path.open('w') as out:
+
+                def report(result: RowResult):
+                    counts[result.status] += 1
+                    out.write(json.dumps(asdict(result)) + '\n')
+                    out.flush()
+                    message = f'Row {result.row} ({result.receipt}): {result.status}'
+                    click.echo(f'{message} - {result.error}' if result.error else message)
+
+                # rows are validated and checked for duplicates locally first...
+                resolved = []
+                seen = {}
+                for number, row in rows:
+                    checked = self.check_row(number, row, setup, seen)
+                    if isinstance(checked, RowResult):
+                        report(checked)
+                    else:
+                        resolved.append(checked)
+
+                # ...then their buildings are looked up and documents uploaded concurrently...
+                prepared = []
+                with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                    futures = {pool.submit(self.prepare_row, row): row for row in resolved}
+                    for future in as_completed(futures):
+                        result, submission = futures[future].result, future.result()
+                        if submission is None:
+                            report(result)
+                        else:
+                            prepared.append((result, submission))
+
+                # ...and then submitted, up to --batch-size rows per request
+                prepared.sort(key=lambda item: item[0].row)
+                for result, submitted in zip(
+                    (result for result, _ in prepared),
+                    submit_refunds(
+                        self.contract,
+                        self.ledger,
+                        [submission for _, submission in prepared],
+                        batch_size=self.batch_size,
+                        logger=LOGGER,
+                    ),
+                ):
+                    if submitted.success:
+                        result.status = 'submitted'
+                        self.client.forget_uploads(result.documents)
+                    else:
+                        result.error = error_message(submitted.error)
+                    report(result)
+
+                elapsed = time.monotonic() - start
+                summary = {
+                    'rows': len(rows),
+                    'submitted': counts['submitted'],
+                    'failed': counts['failed'],
+                    'elapsed': round(elapsed, 3),
+                    'rows_per_second': round(len(rows) / elapsed, 3) if elapsed else None,
+                }
+                out.write(json.dumps({'summary': summary}) + '\n')
+        finally:
+            # documents of rows not submitted are left for the next run to reuse
+            self.client.release_uploads()
+
+        click.echo(
+            f'{summary["submitted"]} submitted, {summary["failed"]} failed in {elapsed:.1f}s '
+            f'({summary["rows_per_second"] or 0:.2f} rows/s). Results written to {results_path}'
+        )
+        if counts['failed']:
+            raise click.ClickException(f'{counts["failed"]} of {len(rows)} rows failed, see {results_path}')
+
+    def check_row(self, number: int, row: dict, setup, seen: dict[str, int]) -> RowResult | ResolvedRow:
+        """Validate a row and resolve its service and person, rejecting likely duplicates before any request.
+
+        Returns the resolved row, or its (failed) result. `seen` maps the expenses of rows already checked
+        to their row number, to catch duplicates within the manifest.
+        """
+        result = RowResult(row=number, receipt=str(row['receipt']) if row.get('receipt') else None, status='failed')
+        with row_errors(result):
+            data = ManifestRow.model_validate(row)
+            data.date = normalize_date(data.date)
+            service = select_service(setup.services, data.service)
+            person = select_person(setup.insured_persons, data.person)
+            expense = (person.card_number, data.business_nif, data.invoice_number, data.total_amount, data.date)
+            key = client.submission_key(*expense)
+            if key in seen:
+                raise click.ClickException(f'Duplicate of row {seen[key]}')
+            seen[key] = number
+            if not self.allow_duplicate and (duplicate := self.ledger.find_duplicate(*expense)):
+                raise click.ClickException(f'Looks already submitted: {duplicate}')
+            return ResolvedRow(result, data, service, person)
+        return result
+
+    def prepare_row(self, row: ResolvedRow) -> client.RefundSubmission | None:
+        """Look up the building and upload the documents of a row, returning the submission ready to send."""
+        result, data = row.result, row.data
+        start = time.monotonic()
+        submission = None
+        with row_errors(result):
+            building, nif = select_building(
+                self.contract,
+                data.business_nif,
+                data.building,
+                prompt_for_nif=False,
+                prompt_for_building=False,
+            )
+            result.documents = upload_documents(self.client, data.receipt, data.attachments)
+            submission = client.RefundSubmission(
+                row.person.card_number,
+                row.service.id,
+                nif,
+                data.invoice_number,
+                data.total_amount,
+                data.date,
+                result.documents,
+                data.primary_entity,
+                False,
+                building.id,
+                row.person.email,
+            )
+        result.elapsed = round(time.monotonic() - start, 3)
+        return submission
@@ -4,6 +4,9 @@ from pathlib import Path
 TOKEN_FILENAME = 'token.txt'
 LOG_DIRNAME = 'logs'
 ERRORS_FILENAME = 'errors.json'
+REFUNDS_DB_FILENAME = 'refunds.sqlite3'
+CACHE_FILENAME = 'cache.sqlite3'
+RATE_BUDGET_FILENAME = 'ratelimit.sqlite3'
 SUPPORTED_LOCALES = ('pt-PT', 'en-US')
 DEFAULT_LOCALE = 'en-US'
 
@@ -55,6 +58,30 @@ def errors_path(config_path: Path | str | None = None, override: Path | str | No
     return config_dir(config_path) / ERRORS_FILENAME
 
 
+def refunds_db_path(config_path: Path | str | None = None, override: Path | str | None = None) -> Path:
+    if override is not None:
+        return Path(override)
+    if context_value := _context_path('refunds_db'):
+        return context_value
+    return config_dir(config_path) / REFUNDS_DB_FILENAME
+
+
+def cache_path(config_path: Path | str | None = None, override: Path | str | None = None) -> Path:
+    if override is not None:
+        return Path(override)
+    if context_value := _context_path('cache_path'):
+        return context_value
+    return config_dir(config_path) / CACHE_FILENAME
+
+
+def rate_budget_path(config_path: Path | str | None = None, override: Path | str | None = None) -> Path:
+    if override is not None:
+        return Path(override)
+    if context_value := _context_path('rate_budget_path'):
+        return context_value
+    return config_dir(config_path) / RATE_BUDGET_FILENAME
+
+
 def normalize_locale(value: str | None) -> str | None:
     if not value:
         return None
@@ -0,0 +1,67 @@
+from collections.abc import Callable, Iterable
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+
+
+@dataclass
+class Step:
+    fn: Callable
+    after: tuple[str, ...]
+    main: bool
+
+
+class StepGraph:
+    """Run named steps as soon as the steps they depend on are done.
+
+    Each step is called with the results of its dependencies, in the order they were listed.
+    Steps run on a thread pool, except `main=True` ones (such as interactive prompts), which run in
+    the calling thread one at a time, in the order they were added. The first failure cancels the
+    steps not started yet and is raised by `run`.
+    """
+
+    def __init__(self, max_workers=4):
+        self.max_workers = max_workers
+        self.steps: dict[str, Step] = {}
+
+    def add(self, name: str, fn: Callable, after: Iterable[str] = (), main=False):
+        after = tuple(after)
+        unknown = [dep for dep in after if dep not in self.steps]
+        if unknown:
+            # dependencies must be added first, which also rules out cycles
+            raise ValueError(f'Step {name} depends on unknown steps: {", ".join(unknown)}')
+        if name in self.steps:
+            raise ValueError(f'Step {name} already added')
+        self.steps[name] = Step(fn, after, main)
+
+    def run(self) -> dict:
+        """Run every step, returning their results by name."""
+        results = {}
+        pending = list(self.steps)
+        running = {}
+
+        def ready(name):
+            return all(dep in results for dep in self.steps[name].after)
+
+        def call(name):
+            step = self.steps[name]
+            return step.fn(*(results[dep] for dep in step.after))
+
+        pool = ThreadPoolExecutor(max_workers=self.max_workers)
+        try:
+            while pending or running:
+                for name in [name for name in pending if not self.steps[name].main and ready(name)]:
+                    pending.remove(name)
+                    running[pool.submit(call, name)] = name
+
+                main = next((name for name in pending if self.steps[name].main), None)
+                if main is not None and ready(main):
+                    pending.remove(main)
+                    results[main] = call(main)
+                    continue
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    results[running.pop(future)] = future.result()
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+        return results
@@ -0,0 +1,51 @@
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+
+class SubmissionJournal:
+    """Append-only JSONL record of the steps a submission completed, and their outputs.
+
+    Each line is `{"step": ..., "at": ..., "data": {...}}`. Lines are flushed to disk as they are
+    written, so a journal survives the process being interrupted at any point. When a step is
+    recorded more than once, the last record wins.
+    """
+
+    def __init__(self, path: Path | str):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self.steps = self.read(self.path)
+
+    @staticmethod
+    def read(path: Path) -> dict[str, dict]:
+        steps = {}
+        try:
+            with path.open() as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # a line cut short by an interruption
+                        continue
+                    steps[entry['step']] = entry.get('data') or {}
+        except FileNotFoundError:
+            pass
+        return steps
+
+    def __contains__(self, step: str) -> bool:
+        return step in self.steps
+
+    def get(self, step: str, default=None):
+        return self.steps.get(step, default)
+
+    def record(self, step: str, **data):
+        line = json.dumps({'step': step, 'at': time.time(), 'data': data}, default=str)
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with self.path.open('a') as f:
+                f.write(line + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            self.steps[step] = data
@@ -1,4 +1,7 @@
-from pydantic import BaseModel, ConfigDict
+from pathlib import Path
+from typing import Optional
+
+from pydantic import BaseModel, ConfigDict, field_validator
 
 
 class ReceiptData(BaseModel):
@@ -8,3 +11,22 @@ class ReceiptData(BaseModel):
     invoice_number: str
     total_amount: float
     date: str
+
+
+class ManifestRow(ReceiptData):
+    """One receipt to submit, as listed in a `submit-batch` manifest."""
+
+    receipt: Path
+    attachments: list[Path] = []
+    person: Optional[str] = None
+    service: Optional[str] = None
+    building: Optional[str] = None
+    primary_entity: bool = False
+
+    @field_validator('attachments', mode='before')
+    @classmethod
+    def split_attachments(cls, value):
+        # CSV manifests list attachments in a single column, separated by ";"
+        if isinstance(value, str):
+            return [part.strip() for part in value.split(';') if part.strip()]
+        return value
@@ -0,0 +1,274 @@
+import datetime as dt
+import json
+import sqlite3
+import time
+from collections.abc import Iterator
+from contextlib import closing
+from dataclasses import dataclass
+from pathlib import Path
+
+from ..client import submission_key
+from ..client.models import Reimbursement
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS refunds (
+    process_nr TEXT PRIMARY KEY,
+    expense_date TEXT,
+    invoice_nr TEXT,
+    practice_name TEXT,
+    person_name TEXT,
+    total_value REAL,
+    status TEXT,
+    data TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS refunds_expense_date ON refunds (expense_date DESC, process_nr DESC);
+CREATE INDEX IF NOT EXISTS refunds_invoice ON refunds (lower(trim(invoice_nr)), expense_date);
+CREATE TABLE IF NOT EXISTS claims (
+    process_nr TEXT NOT NULL REFERENCES refunds (process_nr) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    card_number TEXT,
+    claim_status TEXT,
+    date_of_treatment TEXT,
+    total_insurer REAL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (process_nr, position)
+);
+CREATE TABLE IF NOT EXISTS sync_state (
+    name TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS submissions (
+    key TEXT PRIMARY KEY,
+    origin_id INTEGER NOT NULL,
+    card_number TEXT,
+    nif TEXT,
+    invoice_nr TEXT,
+    total_value REAL,
+    expense_date TEXT,
+    status TEXT NOT NULL,
+    documents TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+"""
+
+# submission ledger statuses: PENDING means the outcome is unknown (e.g. the request timed out)
+PENDING = 'pending'
+SUBMITTED = 'submitted'
+FAILED = 'failed'
+
+
+def iso_date(value) -> str | None:
+    """Normalize the date formats used by the API to YYYY-MM-DD, or None when unparseable."""
+    if not value:
+        return None
+    date_value = str(value).split('T', 1)[0]
+    for date_format in ('%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y'):
+        try:
+            return dt.datetime.strptime(date_value, date_format).date().isoformat()
+        except ValueError:
+            pass
+    return None
+
+
+@dataclass
+class LedgerEntry:
+    key: str
+    origin_id: int
+    status: str
+    attempts: int
+    documents: list[str]
+    error: str | None
+    updated_at: float
+
+
+@dataclass
+class SyncResult:
+    fetched: int = 0
+    changed: int = 0
+
+
+class RefundStore:
+    """Local SQLite copy of the refund history, keyed by `process_nr`.
+
+    It also holds the ledger of submissions made from this machine, keyed by `RefundSubmission.key`.
+    """
+
+    def __init__(self, path: Path | str):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(self.path)
+        self.conn.execute('PRAGMA foreign_keys = ON')
+        self.conn.executescript(SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.conn.close()
+
+    def upsert(self, refund: Reimbursement) -> bool:
+        """Store or update a refund and its claims. Returns True if anything changed."""
+        data = refund.model_dump_json(by_alias=True)
+        row = self.conn.execute('SELECT data FROM refunds WHERE process_nr = ?', (refund.process_nr,)).fetchone()
+        if row and row[0] == data:
+            return False
+
+        with self.conn:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO refunds '
+                '(process_nr, expense_date, invoice_nr, practice_name, person_name, total_value, status, data, '
+                'updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (
+                    refund.process_nr,
+                    iso_date(refund.expense_date),
+                    refund.invoice_nr,
+                    refund.practice_name,
+                    refund.person_name,
+                    refund.total_value,
+                    refund.status,
+                    data,
+                    time.time(),
+                ),
+            )
+            self.conn.execute('DELETE FROM claims WHERE process_nr = ?', (refund.process_nr,))
+            self.conn.executemany(
+                'INSERT INTO claims '
+                '(process_nr, position, card_number, claim_status, date_of_treatment, total_insurer, data) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                [
+                    (
+                        refund.process_nr,
+                        position,
+                        claim.card_number,
+                        claim.claim_status,
+                        iso_date(claim.date_of_treatment),
+                        claim.total_insurer,
+                        claim.model_dump_json(by_alias=True),
+                    )
+                    for position, claim in enumerate(refund.claims or [])
+                ],
+            )
+        return True
+
+    def get(self, process_nr: str) -> Reimbursement | None:
+        row = self.conn.execute('SELECT data FROM refunds WHERE process_nr = ?', (process_nr,)).fetchone()
+        return Reimbursement.model_validate_json(row[0]) if row else None
+
+    def refunds(self) -> Iterator[Reimbursement]:
+        """Yield stored refunds, newest first."""
+        with closing(self.conn.execute('SELECT data FROM refunds ORDER BY expense_date DESC, process_nr DESC')) as cur:
+            for (data,) in cur:
+                yield Reimbursement.model_validate_json(data)
+
+    def submission(self, key: str) -> LedgerEntry | None:
+        """Ledger entry of a submission, by `RefundSubmission.key`."""
+        row = self.conn.execute(
+            'SELECT key, origin_id, status, attempts, documents, error, updated_at FROM submissions WHERE key = ?',
+            (key,),
+        ).fetchone()
+        if row is None:
+            return None
+        return LedgerEntry(row[0], row[1], row[2], row[3], json.loads(row[4] or '[]'), row[5], row[6])
+
+    def record_submission(self, submission, status: str, error: str | None = None, attempt=False):
+        """Record the status of a `RefundSubmission` in the ledger, counting an attempt if `attempt`."""
+        now = time.time()
+        with self.conn:
+            self.conn.execute(
+                'INSERT INTO submissions '
+                '(key, origin_id, card_number, nif, invoice_nr, total_value, expense_date, status, documents, '
+                'attempts, error, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) '
+                'ON CONFLICT (key) DO UPDATE SET status = excluded.status, documents = excluded.documents, '
+                'attempts = attempts + excluded.attempts, error = excluded.error, updated_at = excluded.updated_at',
+                (
+                    submission.key,
+                    submission.origin_id,
+                    submission.card_number,
+                    submission.nif,
+                    submission.receipt,
+                    submission.total,
+                    iso_date(submission.treatment_date),
+                    status,
+                    json.dumps(submission.docs),
+                    int(attempt),
+                    error,
+                    now,
+                    now,
+                ),
+            )
+
+    def find_duplicate(self, card_number: str, nif: str, invoice_nr: str, total: float, date: str) -> str | None:
+        """Describe a previous submission or synced refund of this expense, or None if there is none.
+
+        Submissions are matched exactly (by `submission_key`) in the ledger. The refund history has no
+        NIF, so refunds are matched on invoice number, amount and date, for the same card when their
+        claims tell it. `date` is sent as the date of treatment, which the history keeps on claims and
+        may differ from the refund's expense date, so either one matches. Both lookups are indexed.
+        """
+        entry = self.submission(submission_key(card_number, nif, invoice_nr, total, date))
+        if entry is not None and entry.status == SUBMITTED:
+            submitted_at = dt.datetime.fromtimestamp(entry.updated_at).strftime('%Y-%m-%d %H:%M')
+            return f'submitted from this machine on {submitted_at}'
+
+        row = self.conn.execute(
+            'SELECT process_nr, practice_name, status FROM refunds AS r '
+            'WHERE lower(trim(invoice_nr)) = lower(trim(?)) AND abs(total_value - ?) < 0.005 '
+            'AND (expense_date = ? '
+            'OR EXISTS (SELECT 1 FROM claims WHERE process_nr = r.process_nr AND date_of_treatment = ?)) '
+            'AND (EXISTS (SELECT 1 FROM claims WHERE process_nr = r.process_nr AND card_number = ?) '
+            'OR NOT EXISTS (SELECT 1 FROM claims WHERE process_nr = r.process_nr AND card_number IS NOT NULL)) '
+            'LIMIT 1',
+            (invoice_nr, float(total), iso_date(date), iso_date(date), card_number),
+        ).fetchone()
+        if row is not None:
+            return f'refund {row[0]} ({row[1]}, {row[2]})'
+        return None
+
+    def count(self) -> int:
+        return self.conn.execute('SELECT COUNT(*) FROM refunds').fetchone()[0]
+
+    @property
+    def history_complete(self) -> bool:
+        """Whether a sync ever walked the refund history down to its oldest page."""
+        row = self.conn.execute("SELECT value FROM sync_state WHERE name = 'history_complete'").fetchone()
+        return row is not None and row[0] == '1'
+
+    def _set_history_complete(self):
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO sync_state (name, value) VALUES ('history_complete', '1')")
+
+    def sync(self, contract, page_size=20, prefetch=0, full=False, stop_after=None) -> SyncResult:
+        """Incrementally sync the refund history of `contract` into the store.
+
+        Pages are walked newest first and the walk stops once `stop_after` (default: `page_size`)
+        consecutive refunds are already stored and unchanged, so a refresh usually costs one or
+        two requests. `full=True` walks the whole history, as does every sync until one reached the
+        oldest page: an interrupted first sync would otherwise leave older refunds missing for good.
+        """
+        if stop_after is None:
+            stop_after = page_size
+        full = full or not self.history_complete
+        result = SyncResult()
+        unchanged = 0
+        with closing(contract.iter_unified_refunds(page_size=page_size, prefetch=prefetch)) as refunds:
+            for refund in refunds:
+                if not refund.process_nr:
+                    continue
+                result.fetched += 1
+                if self.upsert(refund):
+                    result.changed += 1
+                    unchanged = 0
+                else:
+                    unchanged += 1
+                    if not full and unchanged >= stop_after:
+                        break
+            else:
+                self._set_history_complete()
+        return result
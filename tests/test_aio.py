@@ -0,0 +1,265 @@
+import asyncio
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+import httpx
+
+from futurehealth.client import RefundSubmission, exceptions
+from futurehealth.client.aio import AsyncClient, AsyncContractClient
+from futurehealth.client.breaker import CircuitBreaker
+from futurehealth.client.middleware import Middleware
+from futurehealth.client.retry import RetryPolicy
+
+
+def json_response(body, status_code=200, success=True):
+    return httpx.Response(status_code, json={'success': success, 'body': body})
+
+
+class TestAsyncClient(unittest.IsolatedAsyncioTestCase):
+    def client(self, handler, **kwargs):
+        return AsyncClient(base_url='https://example.test', transport=httpx.MockTransport(handler), **kwargs)
+
+    async def test_request_sends_api_headers_and_token(self):
+        requests = []
+
+        def handler(request):
+            requests.append(request)
+            return json_response({'Contracts': [{'Token': 'c1'}]})
+
+        async with self.client(handler, token='tok', language='pt-PT') as client:
+            contracts = await client.contracts()
+
+        self.assertEqual(contracts, [{'Token': 'c1'}])
+        self.assertEqual(str(requests[0].url), 'https://example.test/contracts')
+        self.assertEqual(requests[0].headers['Authorization'], 'Bearer tok')
+        self.assertEqual(requests[0].headers['X-Language'], 'pt-PT')
+        self.assertEqual(requests[0].headers['X-Partnership'], 'vic')
+
+    async def test_login_stores_token(self):
+        def handler(request):
+            self.assertEqual(json.loads(request.content), {'username': 'u', 'password': 'p'})
+            self.assertNotIn('Authorization', request.headers)
+            return json_response({'token': 'new-token'})
+
+        async with self.client(handler) as client:
+            await client.login('u', 'p')
+
+        self.assertEqual(client.token, 'new-token')
+
+    async def test_login_maps_errors_to_login_error(self):
+        async with self.client(lambda request: httpx.Response(500, text='boom')) as client:
+            with self.assertRaisesRegex(exceptions.LoginError, 'Unexpected error: boom'):
+                await client.login('u', 'p')
+
+    async def test_request_raises_structured_api_error(self):
+        def handler(request):
+            return httpx.Response(
+                409,
+                json={'success': False, 'resultMessage': 'Validation failed', 'resultCodeDetail': 'error.api.x'},
+            )
+
+        async with self.client(handler) as client:
+            with self.assertRaises(exceptions.ClientAPIError) as raised:
+                await client.get('contracts')
+
+        self.assertEqual(str(raised.exception), 'Contracts - Validation failed - error.api.x (409)')
+        self.assertEqual(raised.exception.status_code, 409)
+
+    async def test_files_uploads_multipart_with_invoice_header(self):
+        async def handler(request):
+            content = await request.aread()
+            self.assertEqual(request.headers['X-Isinvoice'], 'true')
+            self.assertEqual(int(request.headers['Content-Length']), len(content))
+            self.assertIn(b'filename="receipt.pdf"', content)
+            self.assertIn(b'pdf-bytes', content)
+            return json_response({'guid': 'g1'})
+
+        progress = []
+        with tempfile.TemporaryDirectory() as tmp:
+            receipt = Path(tmp) / 'receipt.pdf'
+            receipt.write_bytes(b'pdf-bytes')
+            async with self.client(handler) as client:
+                r = await client.files(receipt, is_invoice=True, progress=progress.append)
+
+        self.assertEqual(r, {'guid': 'g1'})
+        self.assertTrue(progress[-1].done)
+
+    async def test_concurrency_is_bounded(self):
+        in_flight = 0
+        peak = 0
+
+        async def handler(request):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            return json_response({'valid': True})
+
+        async with self.client(handler, max_concurrency=3) as client:
+            contract = AsyncContractClient(client, 'c/1')
+            results = await asyncio.gather(*(contract.validate_feature('X') for _ in range(10)))
+
+        self.assertEqual(results, [True] * 10)
+        self.assertEqual(peak, 3)
+
+    async def test_single_flight_shares_identical_reads(self):
+        requests = []
+
+        async def handler(request):
+            requests.append(json.loads(request.content))
+            await asyncio.sleep(0.01)
+            return json_response({'buildings': [{'id': 'b1'}]})
+
+        async with self.client(handler, token='tok', single_flight=True) as client:
+            contract = AsyncContractClient(client, 'c1')
+            calls = [contract.load_buildings('123456789') for _ in range(5)] + [contract.load_buildings('500000000')]
+            results = await asyncio.gather(*calls)
+            await contract.load_buildings('123456789')
+
+        self.assertEqual([len(result) for result in results], [1] * 6)
+        self.assertEqual([body['practiceNif'] for body in requests], ['123456789', '500000000', '123456789'])
+        self.assertEqual(client.flights.shared, 4)
+
+    async def test_single_flight_survives_a_cancelled_caller(self):
+        release = asyncio.Event()
+
+        async def handler(request):
+            await release.wait()
+            return json_response({'valid': True})
+
+        async with self.client(handler, single_flight=True) as client:
+            contract = AsyncContractClient(client, 'c1')
+            first = asyncio.ensure_future(contract.validate_feature('X'))
+            second = asyncio.ensure_future(contract.validate_feature('X'))
+            await asyncio.sleep(0.01)
+            first.cancel()
+            release.set()
+
+            self.assertTrue(await second)
+            with self.assertRaises(asyncio.CancelledError):
+                await first
+
+    async def test_middlewares_see_every_call(self):
+        class Statuses(Middleware):
+            def __init__(self):
+                self.seen = []
+
+            def after(self, call, response):
+                self.seen.append((call.endpoint, response.status_code))
+                return response
+
+        def handler(request):
+            return json_response({'Contracts': []})
+
+        statuses = Statuses()
+        async with self.client(handler, middlewares=[statuses]) as client:
+            await client.contracts()
+
+        self.assertEqual(statuses.seen, [('contracts', 200)])
+
+    async def test_retries_overloaded_reads(self):
+        statuses = iter([503, 429, 200])
+
+        def handler(request):
+            status_code = next(statuses)
+            return json_response({'Contracts': []}, status_code=status_code, success=status_code == 200)
+
+        async with self.client(handler, retry=RetryPolicy(base_delay=0, max_delay=0)) as client:
+            self.assertEqual(await client.contracts(), [])
+
+        self.assertEqual(client.metrics.get('retries', 'contracts'), 2)
+
+    async def test_circuit_breaker_fails_fast(self):
+        sent = []
+
+        def handler(request):
+            sent.append(request)
+            return json_response({}, status_code=502, success=False)
+
+        async with self.client(handler, breaker=CircuitBreaker(failures=1)) as client:
+            with self.assertRaises(exceptions.ClientAPIError):
+                await client.contracts()
+            with self.assertRaises(exceptions.ClientCircuitOpenError):
+                await client.contracts()
+
+        self.assertEqual(len(sent), 1)
+        self.assertEqual(client.metrics.get('circuit_opened', 'contracts'), 1)
+
+
+class TestAsyncContractClient(unittest.IsolatedAsyncioTestCase):
+    async def test_contract_endpoints_are_scoped_to_contract_token(self):
+        seen = []
+
+        def handler(request):
+            seen.append((request.method, request.url.raw_path.split(b'?')[0].decode(), request.url.params.get('page')))
+            if request.url.path.endswith('/refunds-requests/setup'):
+                return json_response(
+                    {
+                        'Services': [
+                            {'Id': 1, 'Name': 'S', 'IsMandatoryInvoiceFile': True, 'IsMandatoryAditionalFile': False}
+                        ],
+                        'InsuredPersons': [{'CardNumber': '1', 'Name': 'P', 'Email': 'e'}],
+                        'Other': 1,
+                    }
+                )
+            if request.url.path.endswith('/unified-refunds'):
+                return json_response({'Refunds': [{'ProcessNr': '9'}], 'PaginationResult': {'TotalPages': 1}})
+            return json_response({'buildings': [{'id': 'b1', 'name': 'B'}]})
+
+        async with AsyncClient(base_url='https://example.test', transport=httpx.MockTransport(handler)) as client:
+            contract = AsyncContractClient(client, 'c/1')
+            setup = await contract.refunds_request_setup()
+            refunds = await contract.unified_refunds(page=2)
+            buildings = await contract.load_buildings('123456789')
+
+        self.assertEqual(setup.services[0].name, 'S')
+        self.assertEqual(setup.insured_persons[0].card_number, '1')
+        self.assertEqual(setup.other, {'Other': 1})
+        self.assertEqual(refunds.refunds[0].process_nr, '9')
+        self.assertEqual(buildings[0].id, 'b1')
+        self.assertEqual(
+            seen,
+            [
+                ('GET', '/contracts/c%2F1/refunds-requests/setup', None),
+                ('GET', '/contracts/c%2F1/unified-refunds', '2'),
+                ('POST', '/contracts/c%2F1/refunds-requests/loadBuildings', None),
+            ],
+        )
+
+    async def test_multiple_refunds_requests_batch(self):
+        payloads = []
+
+        def handler(request):
+            payloads.append([entry['ReceiptNumber'] for entry in json.loads(request.content)['refundSubmissions']])
+            return json_response({})
+
+        submissions = [
+            RefundSubmission('1', 2, '509876543', f'R{i}', 1.0, '2026-01-01', [], False, False, 'b', 'e')
+            for i in range(3)
+        ]
+        async with AsyncClient(base_url='https://example.test', transport=httpx.MockTransport(handler)) as client:
+            results = await AsyncContractClient(client, 'c').multiple_refunds_requests_batch(submissions, batch_size=2)
+
+        self.assertEqual(payloads, [['R0', 'R1'], ['R2']])
+        self.assertEqual([(r.index, r.success) for r in results], [(0, True), (1, True), (2, True)])
+
+    async def test_multiple_refunds_requests_batch_refused_as_a_whole_is_sent_one_by_one(self):
+        payloads = []
+
+        def handler(request):
+            receipts = [entry['ReceiptNumber'] for entry in json.loads(request.content)['refundSubmissions']]
+            payloads.append(receipts)
+            return json_response({}, status_code=400 if len(receipts) > 1 or receipts == ['R1'] else 200)
+
+        submissions = [
+            RefundSubmission('1', 2, '509876543', f'R{i}', 1.0, '2026-01-01', [], False, False, 'b', 'e')
+            for i in range(2)
+        ]
+        async with AsyncClient(base_url='https://example.test', transport=httpx.MockTransport(handler)) as client:
+            results = await AsyncContractClient(client, 'c').multiple_refunds_requests_batch(submissions)
+
+        self.assertEqual(payloads, [['R0', 'R1'], ['R0'], ['R1']])
+        self.assertEqual([(r.index, r.success) for r in results], [(0, True), (1, False)])
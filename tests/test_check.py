@@ -1,9 +1,12 @@
 import datetime as dt
+import tempfile
 import unittest
+from pathlib import Path
 from unittest.mock import MagicMock, patch
 
 import click
 
+from futurehealth.client import ContractClient
 from futurehealth.client.models import Reimbursement, ReimbursementPaginationResult, UnifiedRefundsResult
 from futurehealth.commands.check import Check
 
@@ -29,10 +32,16 @@ def refund(expense_date, process_nr='1'):
     )
 
 
+def contract_client():
+    contract = ContractClient(MagicMock(), 'contract_token')
+    contract.validate_feature = MagicMock(return_value=True)
+    contract.unified_refunds = MagicMock()
+    return contract
+
+
 class TestCheck(unittest.TestCase):
     def test_limit_stops_after_requested_number_of_refunds(self):
-        contract = MagicMock()
-        contract.validate_feature.return_value = True
+        contract = contract_client()
         contract.unified_refunds.return_value = refunds_page(
             [refund('2026-07-02', '1'), refund('2026-07-01', '2'), refund('2026-06-30', '3')],
             current_page=1,
@@ -50,11 +59,10 @@ class TestCheck(unittest.TestCase):
 
         ensure_error_details.assert_called_once_with(tls_verify=True)
         self.assertEqual(echo.call_count, 2)
-        contract.unified_refunds.assert_called_once_with(page_size=20, page=1)
+        contract.unified_refunds.assert_called_once_with(page_size=2, page=1)
 
     def test_last_days_stops_when_refund_is_older_than_cutoff(self):
-        contract = MagicMock()
-        contract.validate_feature.return_value = True
+        contract = contract_client()
         contract.unified_refunds.return_value = refunds_page(
             [refund('2026-07-02', '1'), refund('2026-06-25', '2'), refund('2026-06-24', '3')],
             current_page=1,
@@ -76,6 +84,69 @@ class TestCheck(unittest.TestCase):
         self.assertEqual(echo.call_count, 2)
         contract.unified_refunds.assert_called_once_with(page_size=20, page=1)
 
+    def test_refunds_are_streamed_with_workers_as_prefetch_depth(self):
+        contract = MagicMock()
+        contract.validate_feature.return_value = True
+        contract.iter_unified_refunds.return_value = (r for r in [refund('2026-07-02', '1'), refund('2026-07-01', '2')])
+
+        cmd = Check(workers=3)
+        cmd.contract = contract
+
+        with (
+            patch.object(Check, 'show_refund') as show_refund,
+            patch('futurehealth.commands.check.ensure_error_details_files'),
+        ):
+            cmd()
+
+        contract.iter_unified_refunds.assert_called_once_with(page_size=20, prefetch=3)
+        self.assertEqual([call.args[0].process_nr for call in show_refund.call_args_list], ['1', '2'])
+
+    def test_sync_updates_local_store_and_lists_from_it(self):
+        contract = contract_client()
+        contract.unified_refunds.return_value = refunds_page([refund('2026-07-02', '2'), refund('2026-07-01', '1')])
+
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = Path(tmp) / 'refunds.sqlite3'
+            for _ in range(2):
+                cmd = Check(sync=True)
+                cmd.contract = contract
+                with (
+                    patch('futurehealth.commands.check.utils.refunds_db_path', return_value=db_path),
+                    patch.object(Check, 'show_refund') as show_refund,
+                    patch('futurehealth.commands.check.click.echo') as echo,
+                    patch('futurehealth.commands.check.ensure_error_details_files'),
+                ):
+                    cmd()
+
+                self.assertEqual([call.args[0].process_nr for call in show_refund.call_args_list], ['2', '1'])
+
+        self.assertEqual(
+            [call.args[0] for call in echo.call_args_list],
+            ['Synced 2 refunds, 0 new or updated'],
+        )
+
+    def test_full_sync_walks_whole_history_with_prefetch(self):
+        contract = contract_client()
+
+        with tempfile.TemporaryDirectory() as tmp:
+            cmd = Check(sync=True, full=True, workers=3)
+            cmd.contract = contract
+            with (
+                patch('futurehealth.commands.check.utils.refunds_db_path', return_value=Path(tmp) / 'refunds.sqlite3'),
+                patch('futurehealth.commands.check.RefundStore.sync') as sync,
+                patch('futurehealth.commands.check.RefundStore.history_complete', True),
+                patch.object(Check, 'show_refunds'),
+                patch('futurehealth.commands.check.click.echo'),
+                patch('futurehealth.commands.check.ensure_error_details_files'),
+            ):
+                cmd()
+
+        sync.assert_called_once_with(contract, page_size=20, prefetch=3, full=True)
+
+    def test_full_requires_sync(self):
+        with self.assertRaisesRegex(click.ClickException, '--full requires --sync'):
+            Check(sync=False, full=True).validate_options()
+
     def test_invalid_limit_is_rejected(self):
         cmd = Check(limit=0)
 
@@ -87,3 +158,9 @@ class TestCheck(unittest.TestCase):
 
         with self.assertRaises(click.ClickException):
             cmd.validate_options()
+
+    def test_invalid_workers_is_rejected(self):
+        cmd = Check(workers=0)
+
+        with self.assertRaises(click.ClickException):
+            cmd.validate_options()
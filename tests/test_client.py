@@ -1,9 +1,38 @@
+import datetime as dt
+import email
+import email.policy
+import email.utils
+import itertools
+import json
+import sqlite3
+import tempfile
+import threading
+import time
 import unittest
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 from unittest.mock import MagicMock, patch
 
+import httpx
 import requests
 
-from futurehealth.client import Client, exceptions
+from futurehealth.client import Client, ContractClient, RefundSubmission, exceptions
+from futurehealth.client.breaker import CircuitBreaker
+from futurehealth.client.cache import DiskCache
+from futurehealth.client.hedge import Hedger
+from futurehealth.client.limiter import AdaptiveLimiter, RateBudget
+from futurehealth.client.middleware import Middleware, endpoint_name
+from futurehealth.client.models import Reimbursement, ReimbursementPaginationResult, UnifiedRefundsResult
+from futurehealth.client.retry import RetryPolicy, parse_retry_after
+from futurehealth.client.singleflight import SingleFlight
+from futurehealth.client.transport import HttpxTransport
+
+
+def refunds_page(page, total_pages, page_size=2):
+    return UnifiedRefundsResult(
+        refunds=[Reimbursement(process_nr=f'{page}-{i}') for i in range(page_size)],
+        pagination_result=ReimbursementPaginationResult(current_page=page, total_pages=total_pages),
+    )
 
 
 class TestClientRequestTimeout(unittest.TestCase):
@@ -32,6 +61,47 @@ class TestClientRequestTimeout(unittest.TestCase):
         self.assertNotIn('timeout', mock_request.call_args.kwargs)
 
 
+class TestClientConnectionPool(unittest.TestCase):
+    def test_pools_are_sized_for_threads_sharing_the_client(self):
+        client = Client(base_url='https://example.test')
+        self.assertEqual(client.get_adapter('https://example.test')._pool_maxsize, 20)
+
+        client = Client(base_url='https://example.test', pool_connections=2, pool_maxsize=64)
+        for url in ('https://example.test', 'http://example.test'):
+            adapter = client.get_adapter(url)
+            self.assertEqual((adapter._pool_connections, adapter._pool_maxsize), (2, 64))
+
+    def test_login_does_not_change_the_token_of_requests_already_built(self):
+        client = Client(base_url='https://example.test', token='old')
+        seen = []
+        sending = threading.Event()
+        logged_in = threading.Event()
+
+        def send(method, url, headers=None, **kwargs):
+            response = MagicMock(status_code=200)
+            if url.endswith('/login'):
+                response.json.return_value = {'success': True, 'body': {'token': 'new'}}
+                logged_in.set()
+            else:
+                # this request was built before the login completed
+                sending.set()
+                logged_in.wait(5)
+                seen.append(headers['Authorization'])
+                response.json.return_value = {'success': True, 'body': {'Contracts': []}}
+            return response
+
+        with patch.object(requests.Session, 'request', side_effect=send):
+            with ThreadPoolExecutor(max_workers=2) as pool:
+                contracts = pool.submit(client.contracts)
+                sending.wait(5)
+                pool.submit(client.login, 'u', 'p').result()
+                contracts.result()
+            sending.clear()
+            client.contracts()
+
+        self.assertEqual(seen, ['Bearer old', 'Bearer new'])
+
+
 class TestClientRequestErrors(unittest.TestCase):
     def test_request_raises_structured_api_error_for_error_json_response(self):
         response = MagicMock()
@@ -60,6 +130,15 @@ class TestClientRequestErrors(unittest.TestCase):
         self.assertEqual(exc.result_code_detail, 'error.api.missing_request_data')
         self.assertEqual(exc.body, {'field': 'receipt'})
 
+    def test_request_maps_connection_failures_to_network_error(self):
+        for error in (requests.ConnectionError('refused'), requests.ReadTimeout('timed out')):
+            with patch.object(requests.Session, 'request', side_effect=error):
+                with self.assertRaises(exceptions.ClientNetworkError) as raised:
+                    Client(base_url='https://example.test').get('contracts')
+
+            self.assertIsInstance(raised.exception, exceptions.ClientError)
+            self.assertIs(raised.exception.__cause__, error)
+
     def test_request_raises_generic_client_error_for_non_json_error_response(self):
         response = MagicMock()
         response.status_code = 500
@@ -72,3 +151,1184 @@ class TestClientRequestErrors(unittest.TestCase):
 
         self.assertIs(type(raised.exception), exceptions.ClientError)
         self.assertEqual(str(raised.exception), 'Unexpected error: Internal server error')
+
+
+class TestContractClient(unittest.TestCase):
+    def test_requests_go_through_the_parent_client(self):
+        client = Client(base_url='https://example.test', token='t')
+        contract = ContractClient(client, 'c/1')
+        self.assertNotIsInstance(contract, requests.Session)
+
+        response = MagicMock(status_code=200)
+        response.json.return_value = {'success': True, 'body': {'valid': True}}
+        with patch.object(client, 'send', return_value=response) as send:
+            self.assertTrue(contract.validate_feature('X'))
+
+        prepared = send.call_args.args[0]
+        self.assertEqual(prepared.url, 'https://example.test/contracts/c%2F1/validate-feature')
+        self.assertEqual(prepared.headers['Authorization'], 'Bearer t')
+
+
+class TestContractClientIterUnifiedRefunds(unittest.TestCase):
+    def contract(self, total_pages):
+        contract = ContractClient(MagicMock(), 'contract_token')
+        contract.unified_refunds = MagicMock(
+            side_effect=lambda page_size, page: refunds_page(page, total_pages, page_size=page_size)
+        )
+        return contract
+
+    def test_yields_all_pages_in_order_with_prefetch(self):
+        contract = self.contract(total_pages=5)
+
+        refunds = list(contract.iter_unified_refunds(page_size=2, prefetch=2))
+
+        self.assertEqual(
+            [r.process_nr for r in refunds],
+            [f'{page}-{i}' for page in range(1, 6) for i in range(2)],
+        )
+        self.assertEqual(
+            sorted(call.kwargs['page'] for call in contract.unified_refunds.call_args_list), [1, 2, 3, 4, 5]
+        )
+
+    def test_yields_all_pages_in_order_without_prefetch(self):
+        contract = self.contract(total_pages=3)
+
+        refunds = list(contract.iter_unified_refunds(page_size=1, prefetch=0))
+
+        self.assertEqual([r.process_nr for r in refunds], ['1-0', '2-0', '3-0'])
+
+    def test_single_page_does_not_request_more(self):
+        contract = self.contract(total_pages=1)
+
+        self.assertEqual(len(list(contract.iter_unified_refunds(page_size=2))), 2)
+        contract.unified_refunds.assert_called_once_with(page_size=2, page=1)
+
+    def test_closing_early_only_fetches_prefetched_pages(self):
+        contract = self.contract(total_pages=50)
+
+        refunds = contract.iter_unified_refunds(page_size=2, prefetch=2)
+        self.assertEqual([next(refunds).process_nr for _ in range(3)], ['1-0', '1-1', '2-0'])
+        refunds.close()
+
+        self.assertLessEqual(contract.unified_refunds.call_count, 4)
+
+
+class RecordingAdapter(requests.adapters.HTTPAdapter):
+    """Transport adapter that consumes the request body like a real connection would."""
+
+    def __init__(self):
+        super().__init__()
+        self.requests = []
+
+    def send(self, request, **kwargs):
+        chunks = list(request.body)
+        self.requests.append((request, chunks))
+        response = requests.Response()
+        response.status_code = 200
+        response._content = b'{"success": true, "body": {"guid": "g1"}}'
+        return response
+
+
+class TestHttpxTransport(unittest.TestCase):
+    def client(self, handler):
+        transport = HttpxTransport(transport=httpx.MockTransport(handler))
+        return Client(base_url='https://example.test', token='tok', transport=transport)
+
+    def test_requests_and_uploads_go_through_httpx(self):
+        sent = []
+
+        def handler(request):
+            sent.append((request, request.read()))
+            return httpx.Response(200, json={'success': True, 'body': {'guid': 'g1', 'valid': True}})
+
+        client = self.client(handler)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / 'receipt.pdf'
+            path.write_bytes(b'x' * 100_000)
+            self.assertEqual(client.files(path), {'guid': 'g1', 'valid': True})
+        self.assertTrue(ContractClient(client, 'c1').validate_feature('X'))
+        client.close()
+
+        upload, body = sent[0]
+        self.assertEqual(upload.headers['Authorization'], 'Bearer tok')
+        self.assertEqual(int(upload.headers['Content-Length']), len(body))
+        self.assertIn(b'x' * 100_000, body)
+        request, body = sent[1]
+        self.assertEqual(str(request.url), 'https://example.test/contracts/c1/validate-feature')
+        self.assertEqual(json.loads(body), {'feature': 'X'})
+
+    def test_errors_are_mapped_like_requests(self):
+        def handler(request):
+            if request.url.path == '/contracts':
+                raise httpx.ConnectError('refused')
+            return httpx.Response(400, json={'resultMessage': 'Bad', 'resultCodeDetail': 'X1'})
+
+        client = self.client(handler)
+        with self.assertRaisesRegex(exceptions.ClientNetworkError, 'Network error: refused'):
+            client.contracts()
+        with self.assertRaises(exceptions.ClientAPIError) as raised:
+            ContractClient(client, 'c1').load_buildings('123456789')
+        self.assertEqual(str(raised.exception), 'Contracts - Bad - X1 (400)')
+        self.assertEqual(raised.exception.status_code, 400)
+
+
+class TestClientFiles(unittest.TestCase):
+    def client(self):
+        client = Client(base_url='https://example.test', token='tok')
+        adapter = RecordingAdapter()
+        client.mount('https://', adapter)
+        return client, adapter
+
+    def test_upload_is_streamed_in_chunks_with_invoice_header(self):
+        client, adapter = self.client()
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / 'receipt "1".pdf'
+            path.write_bytes(b'x' * 150_000)
+            progress = []
+
+            r = client.files(path, is_invoice=True, progress=progress.append)
+
+        self.assertEqual(r, {'guid': 'g1'})
+        request, chunks = adapter.requests[0]
+        self.assertEqual(request.headers['X-Isinvoice'], 'true')
+        self.assertEqual(request.headers['Authorization'], 'Bearer tok')
+        body = b''.join(chunks)
+        self.assertEqual(int(request.headers['Content-Length']), len(body))
+        # head, three file chunks and tail
+        self.assertEqual(len(chunks), 5)
+        self.assertTrue(max(map(len, chunks)) <= 64 * 1024)
+
+        message = email.message_from_bytes(
+            b'Content-Type: ' + request.headers['Content-Type'].encode() + b'\r\n\r\n' + body,
+            policy=email.policy.HTTP,
+        )
+        (part,) = message.iter_parts()
+        self.assertEqual(part.get_param('name', header='content-disposition'), 'filename')
+        self.assertEqual(part.get_filename(), 'receipt %221%22.pdf')
+        self.assertEqual(part.get_content_type(), 'application/pdf')
+        self.assertEqual(part.get_payload(decode=True), b'x' * 150_000)
+
+        self.assertEqual([p.sent for p in progress], list(itertools.accumulate(map(len, chunks))))
+        self.assertTrue(progress[-1].done)
+        self.assertEqual(progress[-1].total, len(body))
+        self.assertGreaterEqual(progress[-1].throughput, 0)
+
+    def test_missing_file(self):
+        client, adapter = self.client()
+
+        with self.assertRaisesRegex(exceptions.ClientError, 'File not found'):
+            client.files(Path('/does/not/exist.pdf'))
+
+        self.assertEqual(adapter.requests, [])
+
+
+def submission(receipt):
+    return RefundSubmission('111', 1, '509876543', receipt, 10.0, '2026-01-01', ['g'], False, False, 'b1', 'e@x')
+
+
+class TestRefundSubmission(unittest.TestCase):
+    def test_origin_id_is_derived_from_the_expense(self):
+        first = submission('INV 1')
+        retry = RefundSubmission('111', 2, '509876543', ' inv 1 ', 10, '2026-01-01', ['other'], True, True, 'b2', 'x')
+
+        self.assertEqual(first.key, retry.key)
+        self.assertEqual(first.payload()['originId'], retry.payload()['originId'])
+        self.assertLess(first.origin_id, 10**9)
+        self.assertNotEqual(first.key, submission('INV 2').key)
+        self.assertNotEqual(
+            first.key,
+            RefundSubmission('111', 1, '509876543', 'INV 1', 10.01, '2026-01-01', [], False, False, 'b1', 'e').key,
+        )
+
+
+class TestContractClientMultipleRefundsRequestsBatch(unittest.TestCase):
+    def contract(self, *responses):
+        client = MagicMock()
+        client.request.side_effect = responses
+        return ContractClient(client, 'contract_token'), client
+
+    def test_packs_submissions_into_batches(self):
+        contract, client = self.contract({'success': True, 'body': {}}, {'success': True, 'body': {}})
+
+        results = contract.multiple_refunds_requests_batch([submission(f'R{i}') for i in range(5)], batch_size=3)
+
+        self.assertEqual(
+            [(r.index, r.submission.receipt, r.success) for r in results],
+            [(0, 'R0', True), (1, 'R1', True), (2, 'R2', True), (3, 'R3', True), (4, 'R4', True)],
+        )
+        payloads = [call.kwargs['json']['refundSubmissions'] for call in client.request.call_args_list]
+        self.assertEqual(
+            [[entry['ReceiptNumber'] for entry in payload] for payload in payloads], [['R0', 'R1', 'R2'], ['R3', 'R4']]
+        )
+        self.assertEqual(client.request.call_args.args, ('POST', 'contracts/contract_token/multiple-refunds-requests'))
+
+    def test_per_entry_errors_are_mapped_to_their_submission(self):
+        contract, client = self.contract(
+            {
+                'success': True,
+                'body': {
+                    'results': [
+                        {'success': True, 'processNr': '1'},
+                        {'success': False, 'resultMessage': 'Duplicated', 'resultCodeDetail': 'error.api.dup'},
+                    ]
+                },
+            }
+        )
+
+        ok, failed = contract.multiple_refunds_requests_batch([submission('R0'), submission('R1')])
+
+        self.assertTrue(ok.success)
+        self.assertEqual(ok.data, {'success': True, 'processNr': '1'})
+        self.assertIsInstance(failed.error, exceptions.ClientAPIError)
+        self.assertEqual(failed.error.result_code_detail, 'error.api.dup')
+        self.assertEqual(str(failed.error), 'Refund submission - Duplicated - error.api.dup')
+
+    def test_failed_batch_fails_its_submissions_and_continues(self):
+        error = exceptions.ClientNetworkError('Connection reset')
+        contract, client = self.contract(error, {'success': True, 'body': None})
+
+        results = contract.multiple_refunds_requests_batch([submission(f'R{i}') for i in range(3)], batch_size=2)
+
+        self.assertEqual([r.error for r in results], [error, error, None])
+        self.assertEqual(client.request.call_count, 2)
+
+    def test_error_body_with_entries_only_fails_the_reported_ones(self):
+        error = exceptions.ClientAPIError(
+            {'success': False, 'body': [{'success': True}, {'errorCode': 'error.api.invalid_nif'}]}, status_code=409
+        )
+        contract, client = self.contract(error)
+
+        ok, failed = contract.multiple_refunds_requests_batch([submission('R0'), submission('R1')])
+
+        self.assertTrue(ok.success)
+        self.assertEqual(failed.error.result_code_detail, 'error.api.invalid_nif')
+        self.assertEqual(failed.error.status_code, 409)
+
+    def test_rows_not_flagged_in_a_refused_batch_are_sent_again_one_by_one(self):
+        r0, r1, r2 = (submission(f'R{i}') for i in range(3))
+        refused = exceptions.ClientAPIError(
+            {'resultCode': -499, 'resultCodeDetail': [{'originId': str(r1.origin_id), 'resultCode': -473}]},
+            status_code=400,
+        )
+        contract, client = self.contract(refused, {'success': True, 'body': {}}, {'success': True, 'body': {}})
+
+        results = contract.multiple_refunds_requests_batch([r0, r1, r2])
+
+        self.assertEqual([(r.index, r.success) for r in results], [(0, True), (1, False), (2, True)])
+        self.assertEqual(results[1].error.result_code, -473)
+        payloads = [call.kwargs['json']['refundSubmissions'] for call in client.request.call_args_list]
+        self.assertEqual(
+            [[entry['ReceiptNumber'] for entry in payload] for payload in payloads],
+            [['R0', 'R1', 'R2'], ['R0'], ['R2']],
+        )
+
+    def test_entry_result_codes_may_be_strings(self):
+        r0, r1 = submission('R0'), submission('R1')
+        contract, client = self.contract(
+            {
+                'success': True,
+                'body': {
+                    'results': [
+                        {'originId': r0.origin_id, 'resultCode': '0'},
+                        {'originId': r1.origin_id, 'resultCode': '-473'},
+                    ]
+                },
+            }
+        )
+
+        ok, failed = contract.multiple_refunds_requests_batch([r0, r1])
+
+        self.assertTrue(ok.success)
+        self.assertEqual(failed.error.result_code, '-473')
+
+    def test_lists_of_unrelated_keys_are_not_entry_results(self):
+        contract, client = self.contract({'success': True, 'body': {'warnings': [{'success': False}, 'x']}})
+
+        results = contract.multiple_refunds_requests_batch([submission('R0'), submission('R1')])
+
+        self.assertTrue(all(r.success for r in results))
+
+    def test_batch_refused_as_a_whole_is_sent_again_one_by_one(self):
+        refused = exceptions.ClientAPIError({'success': False, 'resultMessage': 'Bad'}, status_code=400)
+        invalid = exceptions.ClientAPIError({'success': False, 'resultCodeDetail': 'error.api.dup'}, status_code=400)
+        contract, client = self.contract(refused, {'success': True, 'body': {}}, invalid, {'success': True, 'body': {}})
+
+        results = contract.multiple_refunds_requests_batch([submission(f'R{i}') for i in range(3)], batch_size=3)
+
+        self.assertEqual([(r.index, r.error) for r in results], [(0, None), (1, invalid), (2, None)])
+        payloads = [call.kwargs['json']['refundSubmissions'] for call in client.request.call_args_list]
+        self.assertEqual(
+            [[entry['ReceiptNumber'] for entry in payload] for payload in payloads],
+            [['R0', 'R1', 'R2'], ['R0'], ['R1'], ['R2']],
+        )
+
+    def test_server_errors_are_not_sent_again_one_by_one(self):
+        error = exceptions.ClientAPIError({'success': False}, status_code=503)
+        contract, client = self.contract(error)
+
+        results = contract.multiple_refunds_requests_batch([submission('R0'), submission('R1')])
+
+        self.assertEqual([r.error for r in results], [error, error])
+        self.assertEqual(client.request.call_count, 1)
+
+    def test_invalid_batch_size(self):
+        contract, client = self.contract()
+
+        with self.assertRaises(ValueError):
+            contract.multiple_refunds_requests_batch([submission('R0')], batch_size=0)
+
+
+class TestClientCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache = DiskCache(Path(self.tmp.name) / 'cache.sqlite3')
+
+    def tearDown(self):
+        self.cache.close()
+        self.tmp.cleanup()
+
+    def response(self, body):
+        response = MagicMock()
+        response.status_code = 200
+        response.json.return_value = {'success': True, 'body': body}
+        return response
+
+    def setup_body(self):
+        return {
+            'Services': [{'Id': 1, 'Name': 'S', 'IsMandatoryInvoiceFile': True, 'IsMandatoryAditionalFile': False}],
+            'InsuredPersons': [{'CardNumber': '1', 'Name': 'P', 'Email': 'e'}],
+        }
+
+    def test_contract_metadata_is_served_from_cache(self):
+        bodies = {
+            'contracts': {'Contracts': [{'Token': 'c1'}]},
+            'validate-feature': {'valid': True},
+            'refunds-requests/setup': self.setup_body(),
+        }
+
+        def request(method, url, **kwargs):
+            return self.response(next(body for path, body in bodies.items() if url.endswith(path)))
+
+        with patch.object(requests.Session, 'request', side_effect=request) as mock_request:
+            for _ in range(3):
+                client = Client(base_url='https://example.test', token='tok', cache=self.cache)
+                contract = ContractClient(client, client.contracts()[0]['Token'])
+                self.assertTrue(contract.validate_feature('REFUNDS_SUBMISSION'))
+                self.assertEqual(contract.refunds_request_setup().services[0].name, 'S')
+
+        self.assertEqual(mock_request.call_count, 3)
+
+    def test_cache_is_keyed_by_account_and_language(self):
+        with patch.object(
+            requests.Session, 'request', return_value=self.response({'Contracts': [{'Token': 'c1'}]})
+        ) as mock_request:
+            Client(base_url='https://example.test', token='a', cache=self.cache).contracts()
+            Client(base_url='https://example.test', token='b', cache=self.cache).contracts()
+            Client(base_url='https://example.test', token='b', language='pt-PT', cache=self.cache).contracts()
+            Client(base_url='https://example.test', token='b', language='pt-PT', cache=self.cache).contracts()
+
+        self.assertEqual(mock_request.call_count, 3)
+
+    def test_refresh_skips_cached_values_but_stores_fresh_ones(self):
+        self.cache.set('contracts', 'x', ['stale'], 60)
+        with patch.object(
+            requests.Session, 'request', return_value=self.response({'Contracts': ['fresh']})
+        ) as mock_request:
+            Client(base_url='https://example.test', token='tok', cache=self.cache).contracts()
+            self.assertEqual(
+                Client(base_url='https://example.test', token='tok', cache=self.cache, refresh_cache=True).contracts(),
+                ['fresh'],
+            )
+
+        self.assertEqual(mock_request.call_count, 2)
+
+    def test_zero_ttl_disables_endpoint_cache(self):
+        with patch.object(requests.Session, 'request', return_value=self.response({'Contracts': []})) as mock_request:
+            for _ in range(2):
+                Client(base_url='https://example.test', cache=self.cache, cache_ttls={'contracts': 0}).contracts()
+
+        self.assertEqual(mock_request.call_count, 2)
+
+    def test_login_with_new_token_invalidates_cache(self):
+        self.cache.set('contracts', 'k', ['old'], 60)
+        self.cache.set('other', 'k', ['kept'], 60)
+
+        with patch.object(requests.Session, 'request', return_value=self.response({'token': 'new'})):
+            Client(base_url='https://example.test', token='old', cache=self.cache).login('u', 'p')
+
+        self.assertIsNone(self.cache.get('contracts', 'k'))
+        self.assertEqual(self.cache.get('other', 'k'), ['kept'])
+
+    def test_buildings_index_is_shared_across_accounts_and_survives_login(self):
+        buildings = {'buildings': [{'id': 'b1', 'name': 'Clinic'}]}
+        with patch.object(requests.Session, 'request', return_value=self.response(buildings)) as mock_request:
+            client = Client(base_url='https://example.test', token='a', cache=self.cache)
+            ContractClient(client, 'c1').load_buildings('123456789')
+            client.invalidate_cache()
+            other = Client(base_url='https://example.test', token='b', cache=self.cache)
+            result = ContractClient(other, 'c2').load_buildings('123456789')
+
+        self.assertEqual(mock_request.call_count, 1)
+        self.assertEqual(result[0].name, 'Clinic')
+
+    def test_buildings_index_is_not_shared_across_partnerships_or_api_urls(self):
+        buildings = {'buildings': [{'id': 'b1', 'name': 'Clinic'}]}
+        with patch.object(requests.Session, 'request', return_value=self.response(buildings)) as mock_request:
+            for base_url, partnership in (
+                ('https://example.test', 'p1'),
+                ('https://example.test', 'p2'),
+                ('https://staging.example.test', 'p1'),
+                ('https://example.test', 'p1'),
+            ):
+                client = Client(base_url=base_url, partnership=partnership, token='a', cache=self.cache)
+                ContractClient(client, 'c1').load_buildings('123456789')
+
+        self.assertEqual(mock_request.call_count, 3)
+
+    def test_empty_buildings_are_cached_for_a_short_time(self):
+        client = Client(base_url='https://example.test', cache=self.cache)
+        with (
+            patch.object(requests.Session, 'request', return_value=self.response({'buildings': []})) as mock_request,
+            patch('futurehealth.client.cache.time.time', return_value=1000),
+        ):
+            self.assertEqual(ContractClient(client, 'c1').load_buildings('123456789'), [])
+            self.assertEqual(ContractClient(client, 'c1').load_buildings('123456789'), [])
+        self.assertEqual(mock_request.call_count, 1)
+
+        with (
+            patch.object(requests.Session, 'request', return_value=self.response({'buildings': []})) as mock_request,
+            patch('futurehealth.client.cache.time.time', return_value=1000 + 2 * 60 * 60),
+        ):
+            ContractClient(client, 'c1').load_buildings('123456789')
+        self.assertEqual(mock_request.call_count, 1)
+
+
+class TestClientUploadCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.cache = DiskCache(Path(self.tmp.name) / 'cache.sqlite3')
+        self.addCleanup(self.cache.close)
+        self.adapter = RecordingAdapter()
+        self.guids = iter(f'g{i}' for i in range(1, 100))
+        self.adapter.send = self.send
+
+    def send(self, request, **kwargs):
+        list(request.body)
+        self.adapter.requests.append(request)
+        response = requests.Response()
+        response.status_code = 200
+        response._content = f'{{"success": true, "body": {{"guid": "{next(self.guids)}"}}}}'.encode()
+        return response
+
+    def client(self, **kwargs):
+        client = Client(base_url='https://example.test', token='tok', cache=self.cache, **kwargs)
+        client.mount('https://', self.adapter)
+        return client
+
+    def file(self, name, content):
+        path = Path(self.tmp.name) / name
+        path.write_bytes(content)
+        return path
+
+    def test_identical_content_is_uploaded_once_per_invoice_flag(self):
+        receipt = self.file('receipt.pdf', b'same')
+        copy = self.file('copy.pdf', b'same')
+        other = self.file('other.pdf', b'different')
+        client = self.client()
+        client.files(receipt, is_invoice=True)
+        client.release_uploads()
+
+        # survives the client, e.g. when retrying a failed submit
+        client = self.client()
+        guids = [
+            client.files(copy, is_invoice=True)['guid'],
+            client.files(receipt)['guid'],
+            client.files(other, is_invoice=True)['guid'],
+        ]
+
+        self.assertEqual(guids, ['g1', 'g2', 'g3'])
+        self.assertEqual(len(self.adapter.requests), 3)
+
+    def test_a_document_is_handed_out_once_until_released(self):
+        receipt = self.file('receipt.pdf', b'same')
+        client = self.client()
+        client.files(receipt)
+        self.assertEqual(self.client().files(receipt), {'guid': 'g2'})
+        client.release_uploads()
+
+        # as from two processes sharing the cache
+        first, second = self.client(), self.client()
+        self.assertEqual(first.files(receipt), {'guid': 'g1'})
+        self.assertEqual(second.files(receipt), {'guid': 'g3'})
+        second.release_uploads()
+        self.assertEqual(self.client().files(receipt), {'guid': 'g3'})
+
+    def test_forgotten_uploads_are_uploaded_again(self):
+        client = self.client()
+        receipt = self.file('receipt.pdf', b'same')
+        guid = client.files(receipt, is_invoice=True)['guid']
+
+        client.forget_uploads([guid, 'unknown'])
+        client.release_uploads()
+
+        self.assertEqual(client.files(receipt, is_invoice=True), {'guid': 'g2'})
+
+    def test_zero_ttl_disables_upload_cache(self):
+        client = self.client(cache_ttls={'files': 0})
+        receipt = self.file('receipt.pdf', b'same')
+
+        client.files(receipt)
+        client.files(receipt)
+
+        self.assertEqual(len(self.adapter.requests), 2)
+
+    def test_uploads_are_not_shared_across_accounts(self):
+        receipt = self.file('receipt.pdf', b'same')
+        client = self.client()
+        client.files(receipt)
+        client.release_uploads()
+
+        other = Client(base_url='https://example.test', token='other', cache=self.cache)
+        other.mount('https://', self.adapter)
+
+        self.assertEqual(other.files(receipt), {'guid': 'g2'})
+
+
+class TestDiskCache(unittest.TestCase):
+    def test_entries_expire(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = DiskCache(Path(tmp) / 'nested' / 'cache.sqlite3')
+            cache.set('ns', 'a', {'v': 1}, 60)
+            cache.set('ns', 'b', False, 60)
+            with patch('futurehealth.client.cache.time.time', return_value=0):
+                cache.set('ns', 'c', 1, 60)
+
+            self.assertEqual(cache.get('ns', 'a'), {'v': 1})
+            self.assertIs(cache.get('ns', 'b'), False)
+            self.assertIsNone(cache.get('ns', 'c'))
+            self.assertIsNone(cache.get('other', 'a'))
+            cache.close()
+
+    def test_max_entries_evicts_least_recently_used(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = DiskCache(Path(tmp) / 'cache.sqlite3')
+            with patch('futurehealth.client.cache.time.time', side_effect=range(100, 200)):
+                cache.set('ns', 'a', 1, 1000, max_entries=2)
+                cache.set('ns', 'b', 2, 1000, max_entries=2)
+                self.assertEqual(cache.get('ns', 'a', touch=True), 1)
+                cache.set('ns', 'c', 3, 1000, max_entries=2)
+                cache.set('other', 'x', 4, 1000)
+
+                self.assertEqual(cache.get('ns', 'a'), 1)
+                self.assertIsNone(cache.get('ns', 'b'))
+                self.assertEqual(cache.get('ns', 'c'), 3)
+                self.assertEqual(cache.get('other', 'x'), 4)
+            cache.close()
+
+    def test_pop_hands_an_entry_to_one_cache_only(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            first, second = DiskCache(Path(tmp) / 'cache.sqlite3'), DiskCache(Path(tmp) / 'cache.sqlite3')
+            first.set('ns', 'a', {'v': 1}, 60)
+            with patch('futurehealth.client.cache.time.time', return_value=0):
+                first.set('ns', 'old', 1, 60)
+
+            self.assertEqual(second.pop('ns', 'a'), {'v': 1})
+            self.assertIsNone(first.pop('ns', 'a'))
+            self.assertIsNone(second.pop('ns', 'old'))
+            self.assertIsNone(first.get('ns', 'old'))
+            first.close()
+            second.close()
+
+    def test_outdated_schema_is_recreated(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / 'cache.sqlite3'
+            conn = sqlite3.connect(path)
+            conn.execute('CREATE TABLE cache (namespace TEXT, key TEXT, value TEXT, expires_at REAL)')
+            conn.commit()
+            conn.close()
+
+            cache = DiskCache(path)
+            cache.set('ns', 'a', 1, 60)
+            self.assertEqual(cache.get('ns', 'a'), 1)
+            cache.close()
+
+
+class TestSingleFlight(unittest.TestCase):
+    def test_concurrent_calls_share_one_result_and_later_calls_run_again(self):
+        flights = SingleFlight()
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+
+        def fn():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return {'n': len(calls)}
+
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            leader = pool.submit(flights.do, 'k', fn)
+            started.wait(5)
+            followers = [pool.submit(flights.do, 'k', fn) for _ in range(3)]
+            while flights.shared < 3:
+                time.sleep(0.001)
+            release.set()
+            results = [leader.result(), *(f.result() for f in followers)]
+
+        self.assertEqual(results, [{'n': 1}] * 4)
+        self.assertIs(results[0], results[1])
+        self.assertEqual(flights.do('k', fn), {'n': 2})
+
+    def test_errors_are_shared_too(self):
+        flights = SingleFlight()
+        release = threading.Event()
+
+        def fn():
+            release.wait(5)
+            raise exceptions.ClientNetworkError('down')
+
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            futures = [pool.submit(flights.do, 'k', fn) for _ in range(2)]
+            while flights.shared < 1:
+                time.sleep(0.001)
+            release.set()
+            for future in futures:
+                with self.assertRaisesRegex(exceptions.ClientNetworkError, 'down'):
+                    future.result()
+
+
+class TestClientSingleFlight(unittest.TestCase):
+    def run_concurrently(self, client, calls):
+        """Run `calls` at once against `client`, with every request held until all calls reached it."""
+        sent = []
+        barrier = threading.Barrier(len(calls), timeout=5)
+
+        def send(method, url, *args, **kwargs):
+            sent.append((method, url, kwargs.get('json')))
+            response = MagicMock(status_code=200)
+            response.json.return_value = {'success': True, 'body': {'buildings': [], 'valid': True}}
+            # hold the leaders until the followers joined them
+            while client.flights is not None and client.flights.shared + len(sent) < len(calls):
+                time.sleep(0.001)
+            return response
+
+        with patch.object(requests.Session, 'request', side_effect=send):
+            with ThreadPoolExecutor(max_workers=len(calls)) as pool:
+                futures = [pool.submit(lambda call: barrier.wait() is not None and call(), call) for call in calls]
+                results = [future.result() for future in futures]
+        return sent, results
+
+    def test_identical_reads_share_one_request(self):
+        client = Client(base_url='https://example.test', token='t', single_flight=True)
+        contract = ContractClient(client, 'c1')
+
+        sent, results = self.run_concurrently(
+            client,
+            [lambda: contract.load_buildings('123456789')] * 3
+            + [lambda: contract.load_buildings('500000000')]
+            + [lambda: ContractClient(client, 'c2').load_buildings('123456789')],
+        )
+
+        self.assertEqual(results, [[]] * 5)
+        self.assertCountEqual(
+            [(url, body['practiceNif']) for _, url, body in sent],
+            [
+                ('https://example.test/contracts/c1/refunds-requests/loadBuildings', '123456789'),
+                ('https://example.test/contracts/c1/refunds-requests/loadBuildings', '500000000'),
+                ('https://example.test/contracts/c2/refunds-requests/loadBuildings', '123456789'),
+            ],
+        )
+        self.assertEqual(client.flights.shared, 2)
+
+    def test_identical_gets_share_one_request(self):
+        client = Client(base_url='https://example.test', token='t', single_flight=True)
+
+        sent, _ = self.run_concurrently(client, [lambda: ContractClient(client, 'c1').get('unified-refunds')] * 2)
+
+        self.assertEqual(len(sent), 1)
+
+    def test_writes_and_disabled_single_flight_are_never_shared(self):
+        client = Client(base_url='https://example.test', token='t', single_flight=True)
+        contract = ContractClient(client, 'c1')
+
+        sent, _ = self.run_concurrently(client, [lambda: contract.post('multiple-refunds-requests', json={})] * 2)
+        self.assertEqual(len(sent), 2)
+
+        client = Client(base_url='https://example.test', token='t')
+        sent, _ = self.run_concurrently(client, [lambda: ContractClient(client, 'c1').validate_feature('X')] * 2)
+        self.assertEqual(len(sent), 2)
+
+    def test_endpoint_name_strips_contract_token(self):
+        self.assertEqual(endpoint_name('contracts/c%2F1/refunds-requests/setup'), 'refunds-requests/setup')
+        self.assertEqual(endpoint_name('/contracts?x=1'), 'contracts')
+        self.assertEqual(endpoint_name('files'), 'files')
+
+
+class RecordingMiddleware(Middleware):
+    def __init__(self, name, log, replace_errors=False):
+        self.name = name
+        self.log = log
+        self.replace_errors = replace_errors
+
+    def before(self, call):
+        self.log.append((self.name, 'before', call.url, call.endpoint, (call.headers or {}).get('Authorization')))
+
+    def after(self, call, response):
+        self.log.append((self.name, 'after', response.status_code))
+        return response
+
+    def on_error(self, call, error):
+        self.log.append((self.name, 'on_error', type(error).__name__))
+        if self.replace_errors:
+            return exceptions.ClientError(f'{call.endpoint} failed: {error}')
+
+
+class TestClientMiddlewares(unittest.TestCase):
+    def client(self, *middlewares, status_code=200):
+        response = MagicMock(status_code=status_code, text='oops')
+        response.json.return_value = {'success': True, 'body': {'valid': True}, 'resultMessage': 'Bad'}
+        transport = MagicMock()
+        transport.send.return_value = response
+        return Client(base_url='https://example.test', token='t', transport=transport, middlewares=middlewares)
+
+    def test_stages_run_around_the_built_in_ones(self):
+        log = []
+        client = self.client(RecordingMiddleware('outer', log), RecordingMiddleware('inner', log))
+
+        self.assertTrue(ContractClient(client, 'c1').validate_feature('X'))
+
+        url = 'https://example.test/contracts/c1/validate-feature'
+        self.assertEqual(
+            log,
+            [
+                ('outer', 'before', url, 'validate-feature', 'Bearer t'),
+                ('inner', 'before', url, 'validate-feature', 'Bearer t'),
+                ('inner', 'after', 200),
+                ('outer', 'after', 200),
+            ],
+        )
+        self.assertEqual(client.transport.send.call_args.kwargs['timeout'], 30)
+
+    def test_errors_go_through_on_error_stages(self):
+        log = []
+        client = self.client(
+            RecordingMiddleware('outer', log, replace_errors=True), RecordingMiddleware('inner', log), status_code=503
+        )
+
+        with self.assertRaisesRegex(
+            exceptions.ClientError, r'contracts failed: Contracts - Bad - None \(503\)'
+        ) as raised:
+            client.contracts()
+
+        self.assertIsInstance(raised.exception.__cause__, exceptions.ClientAPIError)
+        self.assertEqual(
+            [entry[:3] for entry in log[2:]],
+            [
+                ('inner', 'after', 503),
+                ('outer', 'after', 503),
+                ('inner', 'on_error', 'ClientAPIError'),
+                ('outer', 'on_error', 'ClientAPIError'),
+            ],
+        )
+
+    def test_network_errors_skip_after_stages(self):
+        log = []
+        client = self.client(RecordingMiddleware('m', log))
+        client.transport.send.side_effect = exceptions.ClientNetworkError('down')
+
+        with self.assertRaises(exceptions.ClientNetworkError):
+            client.contracts()
+
+        self.assertEqual([entry[1] for entry in log], ['before', 'on_error'])
+
+
+def api_response(status_code=200, headers=None):
+    response = MagicMock(status_code=status_code, text='oops', headers=headers or {})
+    response.json.return_value = {
+        'success': status_code == 200,
+        'body': {'valid': True, 'buildings': []},
+        'resultMessage': 'Busy',
+    }
+    return response
+
+
+@patch('futurehealth.client.time.sleep')
+class TestClientRetry(unittest.TestCase):
+    def client(self, *responses, **policy):
+        transport = MagicMock()
+        transport.send.side_effect = responses
+        return Client(base_url='https://example.test', token='t', transport=transport, retry=RetryPolicy(**policy))
+
+    def test_overloaded_idempotent_calls_are_retried(self, mock_sleep):
+        client = self.client(api_response(503), api_response(429), api_response())
+
+        self.assertTrue(ContractClient(client, 'c1').validate_feature('X'))
+
+        self.assertEqual(client.transport.send.call_count, 3)
+        self.assertEqual(mock_sleep.call_count, 2)
+        self.assertEqual(client.metrics.get('retries', 'validate-feature'), 2)
+        self.assertEqual(client.metrics.get('retries_exhausted'), 0)
+
+    def test_network_errors_are_retried(self, mock_sleep):
+        client = self.client(exceptions.ClientNetworkError('down'), api_response())
+
+        self.assertTrue(ContractClient(client, 'c1').validate_feature('X'))
+        self.assertEqual(client.metrics.snapshot(), {'retries': {'validate-feature': 1}})
+
+    def test_gives_up_after_attempts(self, mock_sleep):
+        client = self.client(*[api_response(502)] * 3, attempts=3)
+
+        with self.assertRaisesRegex(exceptions.ClientAPIError, r'\(502\)'):
+            client.contracts()
+
+        self.assertEqual(client.transport.send.call_count, 3)
+        self.assertEqual(client.metrics.get('retries', 'contracts'), 2)
+        self.assertEqual(client.metrics.get('retries_exhausted', 'contracts'), 1)
+
+    def test_waits_use_jittered_backoff_and_retry_after(self, mock_sleep):
+        client = self.client(
+            api_response(503), api_response(503, {'Retry-After': '7'}), api_response(), base_delay=1, max_delay=10
+        )
+
+        with patch('futurehealth.client.retry.random.uniform', side_effect=lambda low, high: high) as mock_uniform:
+            ContractClient(client, 'c1').validate_feature('X')
+
+        self.assertEqual([c.args for c in mock_uniform.call_args_list], [(1, 1), (1, 3)])
+        self.assertEqual([c.args[0] for c in mock_sleep.call_args_list], [1, 7])
+
+    def test_retry_after_beyond_max_delay_fails_right_away(self, mock_sleep):
+        client = self.client(api_response(429, {'Retry-After': '120'}), max_delay=30)
+
+        with self.assertRaises(exceptions.ClientAPIError):
+            client.contracts()
+
+        mock_sleep.assert_not_called()
+        self.assertEqual(client.metrics.get('retries_exhausted', 'contracts'), 1)
+
+    def test_writes_and_other_errors_are_not_retried(self, mock_sleep):
+        client = self.client(api_response(503), api_response(400))
+
+        with self.assertRaises(exceptions.ClientAPIError):
+            ContractClient(client, 'c1').post('multiple-refunds-requests', json={})
+        with self.assertRaisesRegex(exceptions.ClientAPIError, r'\(400\)'):
+            client.contracts()
+
+        self.assertEqual(client.transport.send.call_count, 2)
+        mock_sleep.assert_not_called()
+        self.assertEqual(client.metrics.snapshot(), {})
+
+
+class TestParseRetryAfter(unittest.TestCase):
+    def test_seconds_and_dates(self):
+        self.assertEqual(parse_retry_after('12'), 12)
+        self.assertEqual(parse_retry_after('-3'), 0)
+        self.assertIsNone(parse_retry_after(None))
+        self.assertIsNone(parse_retry_after('soon'))
+        self.assertEqual(parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT'), 0)
+        in_a_minute = email.utils.format_datetime(
+            dt.datetime.now(dt.timezone.utc) + dt.timedelta(seconds=60), usegmt=True
+        )
+        self.assertAlmostEqual(parse_retry_after(in_a_minute), 60, delta=2)
+
+
+class TestAdaptiveLimiter(unittest.TestCase):
+    def finish(self, limiter, status_code=200, latency=0.0, endpoint='contracts'):
+        started = limiter.acquire()
+        with patch('futurehealth.client.limiter.time.monotonic', return_value=started + latency):
+            limiter.release(started, None if status_code is None else MagicMock(status_code=status_code), endpoint)
+
+    def test_limit_grows_additively_while_healthy(self):
+        limiter = AdaptiveLimiter(initial=2, maximum=3)
+
+        self.finish(limiter)
+        self.assertEqual(limiter.limit, 2.5)
+        for _ in range(2):
+            self.finish(limiter)
+        self.assertEqual(limiter.limit, 3)
+        for _ in range(10):
+            self.finish(limiter)
+        self.assertEqual(limiter.limit, 3)
+        self.assertEqual(limiter.in_flight, 0)
+
+    def test_limit_halves_on_overload_once_per_round_trip(self):
+        limiter = AdaptiveLimiter(initial=16)
+        started = [limiter.acquire() for _ in range(3)]
+
+        limiter.release(started[0], MagicMock(status_code=429))
+        limiter.release(started[1], MagicMock(status_code=503))
+        self.assertEqual(limiter.limit, 8)
+
+        self.finish(limiter, status_code=None)
+        self.assertEqual(limiter.limit, 4)
+        self.finish(limiter, status_code=502)
+        self.assertEqual(limiter.limit, 2)
+
+    def test_limit_halves_on_latency_spikes(self):
+        limiter = AdaptiveLimiter(initial=8)
+        self.finish(limiter, latency=1.0)
+
+        self.finish(limiter, latency=1.5)
+        self.assertGreater(limiter.limit, 8)
+        self.finish(limiter, latency=3.0)
+        self.assertLess(limiter.limit, 5)
+
+    def test_latency_is_compared_per_endpoint(self):
+        limiter = AdaptiveLimiter(initial=8)
+        self.finish(limiter, latency=0.1, endpoint='contracts')
+        self.finish(limiter, latency=5.0, endpoint='files')
+
+        for _ in range(3):
+            self.finish(limiter, latency=0.1, endpoint='contracts')
+            self.finish(limiter, latency=6.0, endpoint='files')
+
+        self.assertGreater(limiter.limit, 8)
+        self.assertEqual(set(limiter.latencies), {'contracts', 'files'})
+        self.finish(limiter, latency=1.0, endpoint='contracts')
+        self.assertLess(limiter.limit, 8)
+
+    def test_calls_beyond_the_limit_wait_for_a_slot(self):
+        limiter = AdaptiveLimiter(initial=1)
+        started = limiter.acquire()
+        acquired = threading.Event()
+        thread = threading.Thread(target=lambda: limiter.acquire() and acquired.set())
+        thread.start()
+
+        self.assertFalse(acquired.wait(0.05))
+        limiter.release(started, MagicMock(status_code=200))
+        self.assertTrue(acquired.wait(5))
+        thread.join()
+
+    def test_budget_tokens_are_taken_once_a_slot_is_free(self):
+        budget = MagicMock()
+        limiter = AdaptiveLimiter(initial=1, budget=budget)
+        started = limiter.acquire()
+        acquired = threading.Event()
+        thread = threading.Thread(target=lambda: limiter.acquire() and acquired.set())
+        thread.start()
+
+        self.assertFalse(acquired.wait(0.05))
+        self.assertEqual(budget.take.call_count, 1)
+        limiter.release(started, MagicMock(status_code=200))
+        self.assertTrue(acquired.wait(5))
+        thread.join()
+        self.assertEqual(budget.take.call_count, 2)
+
+    def test_client_reports_every_attempt(self):
+        transport = MagicMock()
+        transport.send.side_effect = [MagicMock(status_code=503, text='busy'), exceptions.ClientNetworkError('down')]
+        limiter = AdaptiveLimiter(initial=8)
+        client = Client(base_url='https://example.test', transport=transport, limiter=limiter)
+
+        with self.assertRaises(exceptions.ClientError):
+            client.contracts()
+        with self.assertRaises(exceptions.ClientNetworkError):
+            client.contracts()
+
+        self.assertEqual(limiter.limit, 2)
+        self.assertEqual(limiter.in_flight, 0)
+
+    def test_client_reports_the_endpoint_of_each_call(self):
+        transport = MagicMock()
+        transport.send.return_value.status_code = 200
+        transport.send.return_value.json.return_value = {'success': True, 'body': {'Contracts': []}}
+        limiter = AdaptiveLimiter()
+        client = Client(base_url='https://example.test', token='t', transport=transport, limiter=limiter)
+
+        client.contracts()
+
+        self.assertEqual(set(limiter.latencies), {'contracts'})
+
+
+class TestRateBudget(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = Path(tmp.name) / 'ratelimit.sqlite3'
+
+    def budget(self, **kwargs):
+        budget = RateBudget(self.path, **kwargs)
+        self.addCleanup(budget.close)
+        return budget
+
+    @patch('futurehealth.client.limiter.time.time', return_value=1000.0)
+    def test_burst_then_waits_for_refill(self, mock_time):
+        budget = self.budget(rate=2, burst=2)
+
+        self.assertEqual([budget.reserve() for _ in range(4)], [0, 0, 0.5, 1.0])
+        mock_time.return_value = 1001.0
+        self.assertEqual(budget.reserve(), 0.5)
+
+    @patch('futurehealth.client.limiter.time.time', return_value=1000.0)
+    def test_budget_is_shared_through_the_file(self, mock_time):
+        first, second = self.budget(rate=1), self.budget(rate=1)
+
+        self.assertEqual(first.reserve(), 0)
+        self.assertEqual(second.reserve(), 1.0)
+
+    @patch('futurehealth.client.limiter.time.time', return_value=1000.0)
+    @patch('futurehealth.client.limiter.time.sleep')
+    def test_limiter_takes_a_token_per_call(self, mock_sleep, mock_time):
+        limiter = AdaptiveLimiter(budget=self.budget(rate=10, burst=1))
+
+        for _ in range(3):
+            limiter.release(limiter.acquire(), MagicMock(status_code=200))
+
+        self.assertEqual([c.args[0] for c in mock_sleep.call_args_list], [0.1, 0.2])
+
+
+class TestHedger(unittest.TestCase):
+    def test_delay_is_the_observed_percentile(self):
+        hedger = Hedger(percentile=0.9, min_samples=10)
+
+        for latency in range(1, 10):
+            hedger.observe('refunds-requests/setup', latency)
+        self.assertIsNone(hedger.delay('refunds-requests/setup'))
+        hedger.observe('refunds-requests/setup', 10)
+        self.assertEqual(hedger.delay('refunds-requests/setup'), 9)
+        self.assertIsNone(hedger.delay('refunds-requests/loadBuildings'))
+        self.assertEqual(Hedger(delay=0.2).delay('refunds-requests/setup'), 0.2)
+
+    def test_hedges_are_capped_to_max_rate(self):
+        hedger = Hedger(max_rate=0.25)
+
+        allowed = []
+        for _ in range(8):
+            hedger.started()
+            allowed.append(hedger.allow())
+
+        self.assertEqual(allowed.count(True), 2)
+
+
+class TestClientHedging(unittest.TestCase):
+    def client(self, send, **hedger):
+        transport = MagicMock()
+        transport.send.side_effect = send
+        client = Client(base_url='https://example.test', token='t', transport=transport, hedger=Hedger(**hedger))
+        self.addCleanup(client.close)
+        return client
+
+    def slow_then_fast(self):
+        """Transport send holding the first request until the test ends, answering the others right away."""
+        release = threading.Event()
+        self.addCleanup(release.set)
+        calls = itertools.count()
+
+        def send(method, url, **kwargs):
+            if next(calls) == 0:
+                release.wait(5)
+            return api_response()
+
+        return send
+
+    def test_slow_read_is_hedged_and_first_success_wins(self):
+        client = self.client(self.slow_then_fast(), delay=0.05, max_rate=1)
+
+        self.assertEqual(ContractClient(client, 'c1').load_buildings('123456789'), [])
+
+        self.assertEqual(client.transport.send.call_count, 2)
+        self.assertEqual(client.metrics.get('hedges', 'refunds-requests/loadBuildings'), 1)
+        self.assertEqual(client.metrics.ratio('hedge_wins', 'hedges'), 1)
+
+    def test_hedge_rate_is_capped(self):
+        client = self.client(lambda *args, **kwargs: api_response(), delay=0, max_rate=0.5)
+
+        for _ in range(10):
+            ContractClient(client, 'c1').get('refunds-requests/setup')
+
+        self.assertLessEqual(client.metrics.get('hedges'), 5)
+
+    def test_fast_reads_and_other_endpoints_are_not_hedged(self):
+        client = self.client(lambda *args, **kwargs: api_response(), delay=5)
+
+        ContractClient(client, 'c1').load_buildings('123456789')
+        ContractClient(client, 'c1').validate_feature('X')
+
+        self.assertEqual(client.transport.send.call_count, 2)
+        self.assertEqual(client.metrics.snapshot(), {})
+        self.assertIsNone(client.metrics.ratio('hedge_wins', 'hedges'))
+
+    def test_latencies_are_observed_until_a_delay_is_known(self):
+        client = self.client(lambda *args, **kwargs: api_response(), min_samples=3)
+
+        for _ in range(3):
+            ContractClient(client, 'c1').load_buildings('123456789')
+
+        self.assertIsNotNone(client.hedger.delay('refunds-requests/loadBuildings'))
+
+
+@patch('futurehealth.client.breaker.time.monotonic', return_value=100.0)
+class TestCircuitBreaker(unittest.TestCase):
+    def client(self, *responses, **breaker):
+        transport = MagicMock()
+        transport.send.side_effect = responses
+        return Client(
+            base_url='https://example.test', token='t', transport=transport, breaker=CircuitBreaker(**breaker)
+        )
+
+    def test_opens_after_consecutive_failures_and_fails_fast(self, mock_monotonic):
+        client = self.client(api_response(503), exceptions.ClientNetworkError('down'), failures=2, reset_timeout=30)
+
+        with self.assertRaises(exceptions.ClientAPIError):
+            client.contracts()
+        self.assertEqual(client.breaker.state('contracts'), 'closed')
+        with self.assertRaises(exceptions.ClientNetworkError):
+            client.contracts()
+        self.assertEqual(client.breaker.states(), {'contracts': 'open'})
+
+        mock_monotonic.return_value = 110.0
+        with self.assertRaisesRegex(exceptions.ClientCircuitOpenError, 'contracts is failing') as raised:
+            client.contracts()
+        self.assertEqual(raised.exception.retry_in, 20)
+        self.assertEqual(client.transport.send.call_count, 2)
+        self.assertEqual(
+            client.metrics.snapshot(), {'circuit_opened': {'contracts': 1}, 'circuit_rejected': {'contracts': 1}}
+        )
+
+    def test_circuits_are_per_endpoint_and_successes_reset_failures(self, mock_monotonic):
+        client = self.client(api_response(503), api_response(), api_response(503), api_response(503), failures=2)
+
+        for path in ('contracts', 'contracts', 'contracts', 'contracts/c1/validate-feature'):
+            try:
+                client.get(path)
+            except exceptions.ClientAPIError:
+                pass
+
+        self.assertEqual(client.breaker.states(), {'contracts': 'closed', 'validate-feature': 'closed'})
+        self.assertEqual(client.metrics.snapshot(), {})
+
+    def test_half_open_probe_closes_or_reopens(self, mock_monotonic):
+        client = self.client(api_response(503), api_response(503), api_response(), failures=1, reset_timeout=30)
+        with self.assertRaises(exceptions.ClientAPIError):
+            client.contracts()
+
+        mock_monotonic.return_value = 130.0
+        with self.assertRaises(exceptions.ClientAPIError):
+            client.contracts()
+        self.assertEqual(client.breaker.state('contracts'), 'open')
+
+        mock_monotonic.return_value = 160.0
+        client.breaker.before('contracts')
+        self.assertEqual(client.breaker.state('contracts'), 'half-open')
+        with self.assertRaises(exceptions.ClientCircuitOpenError):
+            client.contracts()
+        client.breaker.record('contracts', api_response())
+
+        self.assertEqual(client.breaker.state('contracts'), 'closed')
+        self.assertEqual(client.metrics.get('circuit_opened', 'contracts'), 2)
+        self.assertEqual(client.metrics.get('circuit_closed', 'contracts'), 1)
+
+    def test_open_circuit_stops_retries(self, mock_monotonic):
+        transport = MagicMock()
+        transport.send.return_value = api_response(503)
+        client = Client(
+            base_url='https://example.test',
+            transport=transport,
+            retry=RetryPolicy(attempts=4),
+            breaker=CircuitBreaker(failures=2),
+        )
+
+        with patch('futurehealth.client.time.sleep'), self.assertRaises(exceptions.ClientCircuitOpenError):
+            client.contracts()
+
+        self.assertEqual(transport.send.call_count, 2)
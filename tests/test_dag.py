@@ -0,0 +1,63 @@
+import threading
+import time
+import unittest
+
+from futurehealth.utils.dag import StepGraph
+
+
+class TestStepGraph(unittest.TestCase):
+    def test_steps_receive_dependency_results(self):
+        steps = StepGraph()
+        steps.add('a', lambda: 1)
+        steps.add('b', lambda: 2)
+        steps.add('sum', lambda a, b: a + b, after=('a', 'b'))
+
+        self.assertEqual(steps.run(), {'a': 1, 'b': 2, 'sum': 3})
+
+    def test_independent_steps_run_concurrently(self):
+        barrier = threading.Barrier(3, timeout=1)
+        steps = StepGraph(max_workers=3)
+        for name in 'abc':
+            steps.add(name, barrier.wait)
+
+        start = time.monotonic()
+        steps.run()
+
+        self.assertLess(time.monotonic() - start, 1)
+
+    def test_main_steps_run_in_calling_thread_in_order(self):
+        seen = []
+        steps = StepGraph()
+        steps.add('slow', lambda: time.sleep(0.05))
+        steps.add('fast', lambda: None)
+        steps.add('first', lambda _: seen.append(('first', threading.current_thread())), after=('slow',), main=True)
+        steps.add('second', lambda _: seen.append(('second', threading.current_thread())), after=('fast',), main=True)
+
+        steps.run()
+
+        self.assertEqual(seen, [('first', threading.current_thread()), ('second', threading.current_thread())])
+
+    def test_failure_is_raised_and_dependents_never_run(self):
+        dependent = []
+        steps = StepGraph()
+        steps.add('ok', lambda: 1)
+        steps.add('bad', lambda: 1 / 0)
+        steps.add('after', lambda *_: dependent.append(True), after=('ok', 'bad'))
+
+        with self.assertRaises(ZeroDivisionError):
+            steps.run()
+
+        self.assertEqual(dependent, [])
+
+    def test_dependencies_must_be_added_first(self):
+        steps = StepGraph()
+
+        with self.assertRaisesRegex(ValueError, 'unknown steps: missing'):
+            steps.add('a', lambda _: None, after=('missing',))
+
+    def test_duplicate_step(self):
+        steps = StepGraph()
+        steps.add('a', lambda: None)
+
+        with self.assertRaisesRegex(ValueError, 'already added'):
+            steps.add('a', lambda: None)
@@ -0,0 +1,31 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from futurehealth.utils.journal import SubmissionJournal
+
+
+class TestSubmissionJournal(unittest.TestCase):
+    def test_records_are_appended_and_reloaded(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / 'logs' / 'x.journal.jsonl'
+            journal = SubmissionJournal(path)
+            journal.record('service', service={'Id': 1})
+            journal.record('docs', documents=['g1'])
+            journal.record('docs', documents=['g1', 'g2'])
+
+            reloaded = SubmissionJournal(path)
+
+            self.assertEqual(len(path.read_text().splitlines()), 3)
+        self.assertIn('service', reloaded)
+        self.assertNotIn('submitted', reloaded)
+        self.assertEqual(reloaded.get('docs'), {'documents': ['g1', 'g2']})
+
+    def test_truncated_last_line_is_ignored(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / 'x.journal.jsonl'
+            SubmissionJournal(path).record('person', person={'CardNumber': '1'})
+            with path.open('a') as f:
+                f.write('{"step": "docs", "data": {"docu')
+
+            self.assertEqual(SubmissionJournal(path).steps, {'person': {'person': {'CardNumber': '1'}}})
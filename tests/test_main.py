@@ -1,13 +1,15 @@
 import unittest
 from pathlib import Path
 from tempfile import TemporaryDirectory
-from unittest.mock import MagicMock, patch
+from unittest.mock import ANY, MagicMock, patch
 
 import click
 from click.testing import CliRunner
 
 from futurehealth import utils
+from futurehealth.client.hedge import Hedger
 from futurehealth.client.models import Building, Person, Service
+from futurehealth.client.retry import RetryPolicy
 from futurehealth.commands import login
 from futurehealth.commands._mixins import ContractMixin, TokenMixin
 from futurehealth.commands.beneficiaries import Beneficiaries
@@ -17,6 +19,19 @@ from futurehealth.commands.nifs import Nifs
 from futurehealth.commands.services import Services
 from futurehealth.utils.models import ReceiptData
 
+# arguments of the Client built by commands, see ClientMixin.client_kwargs
+CLIENT_KWARGS = {
+    'verify': True,
+    'cache': ANY,
+    'cache_ttls': {'files': 86400},
+    'refresh_cache': False,
+    'single_flight': True,
+    'retry': RetryPolicy(),
+    'limiter': ANY,
+    'hedger': None,
+    'breaker': ANY,
+}
+
 
 class Test(unittest.TestCase):
     def test_login(self):
@@ -140,7 +155,7 @@ class TestMixins(unittest.TestCase):
         mixin.__dict__['token'] = 'test_token'
 
         self.assertIs(mixin.client, mock_client_class.return_value)
-        mock_client_class.assert_called_once_with(token='test_token', verify=True)
+        mock_client_class.assert_called_once_with(token='test_token', **CLIENT_KWARGS)
 
     @patch('futurehealth.commands._mixins.ContractClient')
     def test_contract_mixin(self, mock_contract_client):
@@ -182,7 +197,7 @@ class TestCommands(unittest.TestCase):
         cmd = login.Login(username='user', password='pass')
         cmd()
 
-        mock_client_class.assert_called_once_with(verify=True)
+        mock_client_class.assert_called_once_with(**CLIENT_KWARGS)
         mock_client_class.return_value.login.assert_called_once_with('user', 'pass')
         mock_path.parent.mkdir.assert_called_once_with(parents=True, exist_ok=True, mode=0o700)
         mock_path.write_text.assert_called_once_with('auth_token')
@@ -228,7 +243,7 @@ class TestCommands(unittest.TestCase):
 
             self.assertEqual(result.exit_code, 0, result.output)
             self.assertEqual(token_file.read_text(), 'auth_token')
-            mock_client_class.assert_called_once_with(verify=True)
+            mock_client_class.assert_called_once_with(**CLIENT_KWARGS)
 
     @patch('futurehealth.commands._mixins.Client')
     def test_group_locale_option_does_not_control_login_client_language(self, mock_client_class):
@@ -254,7 +269,57 @@ class TestCommands(unittest.TestCase):
             )
 
             self.assertEqual(result.exit_code, 0, result.output)
-            mock_client_class.assert_called_once_with(verify=True)
+            mock_client_class.assert_called_once_with(**CLIENT_KWARGS)
+
+    @patch('futurehealth.commands._mixins.Client')
+    def test_group_cache_options_control_client_cache(self, mock_client_class):
+        mock_client_class.return_value.login.return_value = {'body': {'token': 'auth_token'}}
+
+        with TemporaryDirectory() as tmp:
+            tmp_path = Path(tmp)
+            args = ['--config', str(tmp_path / 'config.toml')]
+            login_args = ['login', '-u', 'user', '-p', 'pass']
+
+            result = CliRunner().invoke(CLI.click, args + ['--refresh'] + login_args)
+            self.assertEqual(result.exit_code, 0, result.output)
+            cache = mock_client_class.call_args.kwargs['cache']
+            self.assertEqual(cache.path, tmp_path / 'cache.sqlite3')
+            self.assertTrue(mock_client_class.call_args.kwargs['refresh_cache'])
+
+            result = CliRunner().invoke(CLI.click, args + ['--no-cache'] + login_args)
+            self.assertEqual(result.exit_code, 0, result.output)
+            self.assertIsNone(mock_client_class.call_args.kwargs['cache'])
+
+    @patch('futurehealth.commands._mixins.Client')
+    def test_group_rate_limit_option_controls_shared_budget(self, mock_client_class):
+        mock_client_class.return_value.login.return_value = {'body': {'token': 'auth_token'}}
+
+        with TemporaryDirectory() as tmp:
+            tmp_path = Path(tmp)
+            args = ['--config', str(tmp_path / 'config.toml')]
+            login_args = ['login', '-u', 'user', '-p', 'pass']
+
+            result = CliRunner().invoke(CLI.click, args + ['--rate-limit', '2.5'] + login_args)
+            self.assertEqual(result.exit_code, 0, result.output)
+            budget = mock_client_class.call_args.kwargs['limiter'].budget
+            self.assertEqual(budget.path, tmp_path / 'ratelimit.sqlite3')
+            self.assertEqual(budget.rate, 2.5)
+
+            result = CliRunner().invoke(CLI.click, args + login_args)
+            self.assertEqual(result.exit_code, 0, result.output)
+            self.assertIsNone(mock_client_class.call_args.kwargs['limiter'].budget)
+
+    @patch('futurehealth.commands._mixins.Client')
+    def test_group_hedge_option_enables_hedging(self, mock_client_class):
+        mock_client_class.return_value.login.return_value = {'body': {'token': 'auth_token'}}
+
+        with TemporaryDirectory() as tmp:
+            result = CliRunner().invoke(
+                CLI.click, ['--config', str(Path(tmp) / 'config.toml'), '--hedge', 'login', '-u', 'user', '-p', 'pass']
+            )
+
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIsInstance(mock_client_class.call_args.kwargs['hedger'], Hedger)
 
     def test_group_locale_option_rejects_unsupported_locale(self):
         result = CliRunner().invoke(CLI.click, ['--locale', 'fr-FR', 'config'])
@@ -1,10 +1,15 @@
+import io
+import json
+import tempfile
+import threading
 import unittest
+from pathlib import Path
 from unittest.mock import MagicMock, patch
 
 import click
 
 from futurehealth.client.models import Building
-from futurehealth.commands.nifs import Nifs
+from futurehealth.commands.nifs import Nifs, read_nifs
 
 
 class TestNifsCommand(unittest.TestCase):
@@ -16,7 +21,7 @@ class TestNifsCommand(unittest.TestCase):
             Building(id='b2', name='Hospital B', address='456 Oak St'),
         ]
 
-        cmd = Nifs(nif='123456789')
+        cmd = Nifs(nifs=('123456789',))
         cmd.contract = contract
 
         with patch('futurehealth.commands.nifs.click.echo') as echo:
@@ -36,10 +41,70 @@ class TestNifsCommand(unittest.TestCase):
         contract = MagicMock()
         contract.validate_feature.return_value = True
 
-        cmd = Nifs(nif='invalid')
+        cmd = Nifs(nifs=('invalid',))
         cmd.contract = contract
 
         with self.assertRaisesRegex(click.ClickException, 'invalid is not a valid NIF'):
             cmd()
 
         contract.load_buildings.assert_not_called()
+
+    def test_bulk_lookup_streams_jsonl_and_looks_up_each_nif_once(self):
+        contract = MagicMock()
+        contract.validate_feature.return_value = True
+        lines = []
+        release = threading.Event()
+
+        def load_buildings(nif):
+            if nif == '500000000':
+                # the slow lookup must not hold back the others
+                release.wait(5)
+                return [Building(id='b1', name='Hospital A')]
+            return {'123456789': [Building(id='b2', name='Clinic', address='Rua 1')], '500000018': []}[nif]
+
+        contract.load_buildings.side_effect = load_buildings
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / 'nifs.txt'
+            path.write_text('# clinics\n500 000 000\n123456789, 500000018\ninvalid\n')
+            cmd = Nifs(nifs=('123456789',), file=path, workers=3)
+            cmd.contract = contract
+            with patch('futurehealth.commands.nifs.click.echo') as echo:
+                echo.side_effect = lambda line: lines.append(json.loads(line)) or len(lines) == 3 and release.set()
+                with self.assertRaisesRegex(click.ClickException, '2 of 4 NIFs could not be resolved'):
+                    cmd()
+
+        self.assertEqual(lines[0], {'nif': 'invalid', 'error': 'invalid is not a valid NIF'})
+        self.assertEqual(lines[-1], {'nif': '500000000', 'buildings': [{'id': 'b1', 'name': 'Hospital A'}]})
+        self.assertCountEqual(
+            lines[1:3],
+            [
+                {'nif': '123456789', 'buildings': [{'id': 'b2', 'name': 'Clinic', 'address': 'Rua 1'}]},
+                {'nif': '500000018', 'error': '500000018 has no buildings'},
+            ],
+        )
+        self.assertEqual(
+            sorted(call.args[0] for call in contract.load_buildings.call_args_list),
+            ['123456789', '500000000', '500000018'],
+        )
+
+    def test_requires_nifs(self):
+        cmd = Nifs(nifs=(), file=None)
+        cmd.contract = MagicMock()
+
+        with patch('futurehealth.commands.nifs.click.get_text_stream') as stdin:
+            stdin.return_value.isatty.return_value = True
+            with self.assertRaisesRegex(click.ClickException, 'No NIFs given'):
+                cmd()
+
+
+class TestReadNifs(unittest.TestCase):
+    def test_arguments_and_stdin_are_merged_without_duplicates(self):
+        with patch('click.open_file', return_value=io.StringIO('500000018\n123 456 789,,500000000\n')):
+            self.assertEqual(
+                read_nifs([' 123456789 ', '500000018'], Path('-')), ['123456789', '500000018', '500000000']
+            )
+
+    def test_unreadable_file(self):
+        with self.assertRaisesRegex(click.ClickException, 'Could not read NIFs from /does/not/exist'):
+            read_nifs([], Path('/does/not/exist'))
@@ -0,0 +1,167 @@
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import MagicMock
+
+from futurehealth.client import ContractClient, RefundSubmission
+from futurehealth.client.exceptions import ClientNetworkError
+from futurehealth.client.models import (
+    Reimbursement,
+    ReimbursementClaim,
+    ReimbursementPaginationResult,
+    UnifiedRefundsResult,
+)
+from futurehealth.utils.store import PENDING, SUBMITTED, RefundStore, iso_date
+
+
+def refund(process_nr, expense_date='2026-07-01', status='Submitted'):
+    return Reimbursement(
+        process_nr=process_nr,
+        expense_date=expense_date,
+        invoice_nr=f'INV-{process_nr}',
+        total_value=10,
+        status=status,
+        claims=[ReimbursementClaim(card_number='123', total_insurer=5)],
+    )
+
+
+class ContractStub(ContractClient):
+    """ContractClient serving a fixed, newest-first refund history."""
+
+    def __init__(self, history, page_size):
+        super().__init__(MagicMock(), 'contract_token')
+        self.history = history
+        self.page_size = page_size
+        self.unified_refunds = MagicMock(side_effect=self.page)
+
+    def page(self, page_size, page):
+        total_pages = max(1, -(-len(self.history) // page_size))
+        start = (page - 1) * page_size
+        return UnifiedRefundsResult(
+            refunds=self.history[start : start + page_size],
+            pagination_result=ReimbursementPaginationResult(current_page=page, total_pages=total_pages),
+        )
+
+
+class TestRefundStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = RefundStore(Path(self.tmp.name) / 'nested' / 'refunds.sqlite3')
+
+    def tearDown(self):
+        self.store.close()
+        self.tmp.cleanup()
+
+    def test_upsert_reports_changes_and_round_trips_claims(self):
+        self.assertTrue(self.store.upsert(refund('1')))
+        self.assertFalse(self.store.upsert(refund('1')))
+        self.assertTrue(self.store.upsert(refund('1', status='Paid')))
+
+        stored = self.store.get('1')
+        self.assertEqual(stored.status, 'Paid')
+        self.assertEqual(stored.claims[0].total_insurer, 5)
+        self.assertEqual(self.store.count(), 1)
+        self.assertIsNone(self.store.get('missing'))
+
+    def test_refunds_are_listed_newest_first(self):
+        self.store.upsert(refund('1', expense_date='01/06/2026'))
+        self.store.upsert(refund('2', expense_date='2026-07-01T00:00:00'))
+        self.store.upsert(refund('3', expense_date='2026-06-15'))
+
+        self.assertEqual([r.process_nr for r in self.store.refunds()], ['2', '3', '1'])
+
+    def test_first_sync_fetches_whole_history(self):
+        contract = ContractStub([refund(str(i)) for i in range(50, 0, -1)], page_size=10)
+
+        result = self.store.sync(contract, page_size=10)
+
+        self.assertEqual((result.fetched, result.changed), (50, 50))
+        self.assertEqual(contract.unified_refunds.call_count, 5)
+
+    def test_incremental_sync_stops_at_unchanged_known_refunds(self):
+        history = [refund(str(i)) for i in range(50, 0, -1)]
+        self.store.sync(ContractStub(history, page_size=10), page_size=10)
+
+        contract = ContractStub([refund('52'), refund('51'), refund('50', status='Paid')] + history[1:], page_size=10)
+        result = self.store.sync(contract, page_size=10)
+
+        self.assertEqual(result.changed, 3)
+        self.assertEqual(contract.unified_refunds.call_count, 2)
+        self.assertEqual(self.store.count(), 52)
+        self.assertEqual(self.store.get('50').status, 'Paid')
+
+    def test_full_sync_walks_everything(self):
+        history = [refund(str(i)) for i in range(30, 0, -1)]
+        self.store.sync(ContractStub(history, page_size=10), page_size=10)
+
+        contract = ContractStub(history, page_size=10)
+        result = self.store.sync(contract, page_size=10, full=True)
+
+        self.assertEqual((result.fetched, result.changed), (30, 0))
+        self.assertEqual(contract.unified_refunds.call_count, 3)
+
+    def test_interrupted_first_sync_keeps_walking_until_history_is_complete(self):
+        history = [refund(str(i)) for i in range(100, 0, -1)]
+        contract = ContractStub(history, page_size=10)
+
+        def page(page_size, page):
+            if page == 4:
+                raise ClientNetworkError('timeout')
+            return contract.page(page_size, page)
+
+        contract.unified_refunds.side_effect = page
+        with self.assertRaises(ClientNetworkError):
+            self.store.sync(contract, page_size=10)
+        self.assertEqual(self.store.count(), 30)
+        self.assertFalse(self.store.history_complete)
+
+        contract = ContractStub(history, page_size=10)
+        result = self.store.sync(contract, page_size=10)
+
+        self.assertEqual((result.fetched, result.changed), (100, 70))
+        self.assertTrue(self.store.history_complete)
+        contract = ContractStub(history, page_size=10)
+        self.store.sync(contract, page_size=10)
+        self.assertEqual(contract.unified_refunds.call_count, 1)
+
+    def test_find_duplicate_matches_submitted_ledger_entries_exactly(self):
+        submission = RefundSubmission('123', 1, '500000000', 'INV-1', 10, '2026-07-01', [], False, False, 'b1', None)
+        self.store.record_submission(submission, PENDING)
+        self.assertIsNone(self.store.find_duplicate('123', '500000000', 'INV-1', 10, '2026-07-01'))
+
+        self.store.record_submission(submission, SUBMITTED)
+        self.assertRegex(
+            self.store.find_duplicate('123', '500000000', ' inv-1 ', 10.0, '2026-07-01'), 'submitted from this machine'
+        )
+        self.assertIsNone(self.store.find_duplicate('123', '500000001', 'INV-1', 10, '2026-07-01'))
+
+    def test_find_duplicate_matches_refund_history(self):
+        self.store.upsert(refund('1', expense_date='01/07/2026'))
+        self.store.upsert(refund('2', expense_date='2026-07-02').model_copy(update={'claims': []}))
+
+        self.assertEqual(
+            self.store.find_duplicate('123', '500000000', 'inv-1', 10.001, '2026-07-01'), 'refund 1 (None, Submitted)'
+        )
+        # different card, amount or date
+        self.assertIsNone(self.store.find_duplicate('456', '500000000', 'INV-1', 10, '2026-07-01'))
+        self.assertIsNone(self.store.find_duplicate('123', '500000000', 'INV-1', 11, '2026-07-01'))
+        self.assertIsNone(self.store.find_duplicate('123', '500000000', 'INV-1', 10, '2026-07-02'))
+        # refunds without card numbers match any card
+        self.assertRegex(self.store.find_duplicate('456', '500000000', 'INV-2', 10, '2026-07-02'), 'refund 2')
+
+    def test_find_duplicate_matches_the_treatment_date_of_claims(self):
+        claims = [ReimbursementClaim(card_number='123', date_of_treatment='2026-06-20', total_insurer=5)]
+        self.store.upsert(refund('1', expense_date='2026-07-01').model_copy(update={'claims': claims}))
+
+        self.assertRegex(self.store.find_duplicate('123', '500000000', 'INV-1', 10, '2026-06-20'), 'refund 1')
+        self.assertRegex(self.store.find_duplicate('123', '500000000', 'INV-1', 10, '2026-07-01'), 'refund 1')
+        self.assertIsNone(self.store.find_duplicate('123', '500000000', 'INV-1', 10, '2026-06-21'))
+
+
+class TestIsoDate(unittest.TestCase):
+    def test_supported_formats(self):
+        self.assertEqual(iso_date('2026-07-01T10:00:00'), '2026-07-01')
+        self.assertEqual(iso_date('01/07/2026'), '2026-07-01')
+        self.assertEqual(iso_date('01-07-2026'), '2026-07-01')
+        self.assertIsNone(iso_date('July 1st'))
+        self.assertIsNone(iso_date(None))
@@ -1,16 +1,33 @@
+import itertools
 import tempfile
+import threading
+import time
 import unittest
 from pathlib import Path
 from unittest.mock import MagicMock, patch
 
 import click
 
-from futurehealth.client import exceptions
-from futurehealth.client.models import Building, Person, Service
-from futurehealth.commands.submit import Submit
+from futurehealth.client import Client, RefundSubmission, RefundSubmissionResult, exceptions
+from futurehealth.client.cache import DiskCache
+from futurehealth.client.models import Building, Person, Reimbursement, Service
+from futurehealth.commands.submit import Submit, submit_refund, submit_refunds, upload_documents
+from futurehealth.utils.store import SUBMITTED, RefundStore
 
 
-class TestSubmitCommand(unittest.TestCase):
+class IsolatedLedgerTestCase(unittest.TestCase):
+    """Keeps the submissions ledger of commands under test in a temporary database."""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.refunds_db = Path(tmp.name) / 'refunds.sqlite3'
+        patcher = patch('futurehealth.commands._mixins.refunds_db_path', return_value=self.refunds_db)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+
+class TestSubmitCommand(IsolatedLedgerTestCase):
     """Test cases for the Submit command."""
 
     def test_submit_initialization(self):
@@ -66,7 +83,7 @@ class TestSubmitCommand(unittest.TestCase):
         calls = []
 
         mock_building = Building(id='building_123', name='Hospital A', address='123 Main St')
-        mock_get_building.side_effect = lambda nif: calls.append('building') or (mock_building, nif)
+        mock_get_building.side_effect = lambda nif, known: calls.append('building') or (mock_building, nif)
 
         mock_service = Service(id=1, name='Medical Service', mantory_invoice_file=True, mantory_additional_file=False)
         mock_get_service.side_effect = lambda: calls.append('service') or mock_service
@@ -96,11 +113,11 @@ class TestSubmitCommand(unittest.TestCase):
         mock_ensure_error_details.assert_called_once_with(tls_verify=True)
         mock_client_class.assert_called_once()
         mock_contract.validate_feature.assert_called_once_with('REFUNDS_SUBMISSION')
-        mock_get_building.assert_called_once_with('123456789')
+        mock_get_building.assert_called_once_with('123456789', {'123456789': mock_contract.load_buildings.return_value})
         mock_client.files.assert_called_once()
         mock_get_service.assert_called_once()
         mock_get_person.assert_called_once()
-        self.assertEqual(calls, ['building', 'service', 'person', 'files'])
+        self.assertEqual(calls, ['service', 'person', 'building', 'files'])
         mock_contract.multiple_refunds_requests.assert_called_once_with(
             '123456789',  # person.card_number
             1,  # service.id
@@ -114,6 +131,7 @@ class TestSubmitCommand(unittest.TestCase):
             'building_123',  # building.id
             'john@example.com',  # person.email
         )
+        mock_client.forget_uploads.assert_called_once_with(['file_guid'], keys=None)
 
     @patch('futurehealth.commands.submit.Submit.setup_logging')
     @patch('futurehealth.commands.submit.ensure_error_details_files')
@@ -143,6 +161,151 @@ class TestSubmitCommand(unittest.TestCase):
 
         mock_ensure_error_details.assert_called_once_with(tls_verify=True)
 
+    @patch('futurehealth.commands.submit.Submit.setup_logging')
+    @patch('futurehealth.commands.submit.Submit.get_building')
+    @patch('futurehealth.commands.submit.Submit.get_service')
+    @patch('futurehealth.commands.submit.Submit.get_person')
+    @patch('futurehealth.commands.submit.ensure_error_details_files')
+    @patch('futurehealth.commands._mixins.Client')
+    def test_submit_rejects_duplicates_before_building_and_uploads(
+        self,
+        mock_client_class,
+        mock_ensure_error_details,
+        mock_get_person,
+        mock_get_service,
+        mock_get_building,
+        mock_setup_logging,
+    ):
+        """Test submit refuses receipts found in the refund history unless --allow-duplicate."""
+        with RefundStore(self.refunds_db) as store:
+            store.upsert(
+                Reimbursement(
+                    process_nr='P1', expense_date='2023-01-01', invoice_nr='INV001', total_value=100.5, status='Paid'
+                )
+            )
+        mock_client = MagicMock()
+        mock_client_class.return_value = mock_client
+        mock_client.files.return_value = {'guid': 'file_guid'}
+        mock_get_building.return_value = (Building(id='building_123', name='Hospital A'), '123456789')
+        mock_get_service.return_value = Service(
+            id=1, name='Medical Service', mantory_invoice_file=True, mantory_additional_file=False
+        )
+        mock_get_person.return_value = Person(card_number='123456789', name='John Doe', email='john@example.com')
+
+        for allow_duplicate in (False, True):
+            mock_contract = MagicMock()
+            mock_contract.validate_feature.return_value = True
+            submit = Submit(
+                receipt_file=Path('test.pdf'),
+                business_nif='123456789',
+                invoice_number='INV001',
+                total_amount=100.50,
+                date='2023-01-01',
+                allow_duplicate=allow_duplicate,
+            )
+            submit.contract = mock_contract
+            submit.file_logger = MagicMock()
+            submit.console_logger = MagicMock()
+            submit.token = 'test_token'
+
+            if allow_duplicate:
+                submit()
+                mock_contract.multiple_refunds_requests.assert_called_once()
+            else:
+                with self.assertRaisesRegex(click.ClickException, r'looks already submitted: refund P1 \(None, Paid\)'):
+                    submit()
+                mock_get_building.assert_not_called()
+                mock_client.files.assert_not_called()
+                mock_contract.multiple_refunds_requests.assert_not_called()
+
+    @patch('futurehealth.commands.submit.Submit.setup_logging')
+    @patch('futurehealth.commands.submit.Submit.get_building')
+    @patch('futurehealth.commands.submit.Submit.get_service')
+    @patch('futurehealth.commands.submit.Submit.get_person')
+    @patch('futurehealth.commands.submit.ensure_error_details_files')
+    @patch('futurehealth.commands._mixins.Client')
+    def test_submit_rejects_duplicates_of_the_fixed_nif_before_uploads(
+        self,
+        mock_client_class,
+        mock_ensure_error_details,
+        mock_get_person,
+        mock_get_service,
+        mock_get_building,
+        mock_setup_logging,
+    ):
+        """Test submit checks the ledger again once the building selection fixed the NIF."""
+        with RefundStore(self.refunds_db) as store:
+            store.record_submission(
+                RefundSubmission('1', 1, '500000000', 'INV001', 100.5, '2023-01-01', [], False, False, 'b1', None),
+                SUBMITTED,
+            )
+        mock_client = MagicMock()
+        mock_client_class.return_value = mock_client
+        mock_get_building.return_value = (Building(id='building_123', name='Hospital A'), '500000000')
+        mock_get_service.return_value = Service(
+            id=1, name='Medical Service', mantory_invoice_file=True, mantory_additional_file=False
+        )
+        mock_get_person.return_value = Person(card_number='1', name='John Doe', email='john@example.com')
+        mock_contract = MagicMock()
+        mock_contract.validate_feature.return_value = True
+
+        submit = Submit(
+            receipt_file=Path('test.pdf'),
+            business_nif='123456789',
+            invoice_number='INV001',
+            total_amount=100.50,
+            date='2023-01-01',
+        )
+        submit.contract = mock_contract
+        submit.file_logger = MagicMock()
+        submit.console_logger = MagicMock()
+        submit.token = 'test_token'
+
+        with self.assertRaisesRegex(click.ClickException, 'looks already submitted: submitted from this machine'):
+            submit()
+
+        mock_get_building.assert_called_once()
+        mock_client.files.assert_not_called()
+        mock_contract.multiple_refunds_requests.assert_not_called()
+
+    @patch('futurehealth.commands.submit.Submit.setup_logging')
+    @patch('futurehealth.commands.submit.Submit.get_building')
+    @patch('futurehealth.commands.submit.ensure_error_details_files')
+    @patch('futurehealth.commands._mixins.Client')
+    def test_submit_does_not_upload_when_building_selection_fails(
+        self, mock_client_class, mock_ensure_error_details, mock_get_building, mock_setup_logging
+    ):
+        """Test submit resolves the building before uploading documents."""
+        mock_client = MagicMock()
+        mock_client_class.return_value = mock_client
+        mock_contract = MagicMock()
+        mock_contract.validate_feature.return_value = True
+        mock_contract.refunds_request_setup.return_value = MagicMock(
+            services=[Service(id=1, name='Dentist', mantory_invoice_file=True, mantory_additional_file=False)],
+            insured_persons=[Person(card_number='1', name='John Doe', email='john@example.com')],
+        )
+        mock_get_building.side_effect = click.ClickException('Multiple buildings found')
+
+        submit = Submit(
+            receipt_file=Path('test.pdf'),
+            business_nif='123456789',
+            invoice_number='INV001',
+            total_amount=100.50,
+            date='2023-01-01',
+            person=None,
+            service=None,
+        )
+        submit.contract = mock_contract
+        submit.file_logger = MagicMock()
+        submit.console_logger = MagicMock()
+        submit.token = 'test_token'
+
+        with self.assertRaisesRegex(click.ClickException, 'Multiple buildings found'):
+            submit()
+
+        mock_client.files.assert_not_called()
+        mock_contract.multiple_refunds_requests.assert_not_called()
+
     @patch('futurehealth.commands.submit.Submit.setup_logging')
     @patch('futurehealth.commands.submit.Submit.get_building')
     @patch('futurehealth.commands.submit.Submit.get_service')
@@ -184,6 +347,7 @@ class TestSubmitCommand(unittest.TestCase):
         mock_ensure_error_details.assert_called_once_with(tls_verify=True)
         mock_client.files.assert_not_called()
         mock_contract.multiple_refunds_requests.assert_not_called()
+        mock_client.forget_uploads.assert_not_called()
 
     @patch('futurehealth.commands.submit.Submit.setup_logging')
     @patch('futurehealth.commands.submit.Submit.get_building')
@@ -615,3 +779,370 @@ class TestSubmitCommand(unittest.TestCase):
                 submit.get_building('123456789')
 
         mock_prompt.assert_not_called()
+
+
+class TestSubmitSteps(IsolatedLedgerTestCase):
+    @patch('futurehealth.commands.submit.Submit.setup_logging')
+    @patch('futurehealth.commands.submit.ensure_error_details_files')
+    def test_independent_steps_run_concurrently(self, mock_ensure_error_details, mock_setup_logging):
+        def slow(value):
+            def call(*args, **kwargs):
+                time.sleep(0.2)
+                return value
+
+            return call
+
+        mock_contract = MagicMock()
+        mock_contract.validate_feature.side_effect = slow(True)
+        mock_contract.load_buildings.side_effect = slow([Building(id='b1', name='Hospital A')])
+        mock_contract.refunds_request_setup.side_effect = slow(
+            MagicMock(
+                services=[Service(id=1, name='Dentist', mantory_invoice_file=True, mantory_additional_file=False)],
+                insured_persons=[Person(card_number='1', name='John Doe', email='john@example.com')],
+            )
+        )
+        mock_client = MagicMock()
+        mock_client.files.return_value = {'guid': 'g1'}
+
+        submit = Submit(
+            receipt_file=Path('test.pdf'),
+            business_nif='123456789',
+            invoice_number='INV001',
+            total_amount=10,
+            date='2023-01-01',
+            person=None,
+            service=None,
+            building=None,
+        )
+        submit.contract = mock_contract
+        submit.client = mock_client
+        submit.file_logger = MagicMock()
+        submit.console_logger = MagicMock()
+
+        start = time.monotonic()
+        submit()
+
+        # feature check, refunds setup and buildings are fetched at the same time
+        self.assertLess(time.monotonic() - start, 0.5)
+        # prefetched buildings are not fetched again by the selection
+        mock_contract.load_buildings.assert_called_once_with('123456789')
+        mock_contract.multiple_refunds_requests.assert_called_once_with(
+            '1', 1, '123456789', 'INV001', 10.0, '2023-01-01', ['g1'], False, False, 'b1', 'john@example.com'
+        )
+
+
+class TestSubmitResume(IsolatedLedgerTestCase):
+    def setUp(self):
+        super().setUp()
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp_path = Path(tmp.name)
+        self.logs_dir = self.tmp_path / 'logs'
+        self.receipt = self.tmp_path / 'receipt.pdf'
+        self.receipt.write_text('receipt')
+        self.prescription = self.tmp_path / 'prescription.pdf'
+        self.prescription.write_text('prescription')
+        patcher = patch('futurehealth.commands.submit.utils.logs_path', return_value=self.logs_dir)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = patch('futurehealth.commands.submit.ensure_error_details_files')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def run_submit(self, contract, api_client, **kwargs):
+        kwargs = {'person': None, 'service': None, 'building': None, **kwargs}
+        submit = Submit(**kwargs)
+        submit.contract = contract
+        submit.client = api_client
+        try:
+            submit()
+        finally:
+            for logger in (submit.file_logger, submit.console_logger):
+                for handler in list(logger.handlers):
+                    logger.removeHandler(handler)
+                    handler.close()
+        return submit
+
+    def contract(self):
+        contract = MagicMock()
+        contract.validate_feature.return_value = True
+        contract.load_buildings.return_value = [Building(id='b1', name='Hospital A')]
+        contract.refunds_request_setup.return_value = MagicMock(
+            services=[Service(id=1, name='Dentist', mantory_invoice_file=True, mantory_additional_file=False)],
+            insured_persons=[Person(card_number='111', name='John Doe', email='john@example.com')],
+        )
+        return contract
+
+    def test_resume_continues_from_last_completed_step(self):
+        contract = self.contract()
+        contract.multiple_refunds_requests.side_effect = exceptions.ClientError('Read timed out')
+        api_client = MagicMock()
+        api_client.files.side_effect = lambda path, is_invoice=False: {'guid': f'guid-{path.name}'}
+        api_client.upload_keys.side_effect = lambda guids: {guid: ('digest', False) for guid in guids}
+
+        with self.assertRaisesRegex(click.ClickException, 'Read timed out'):
+            self.run_submit(
+                contract,
+                api_client,
+                receipt_file=self.receipt,
+                other_attachments=[self.prescription],
+                business_nif='123456789',
+                invoice_number='INV001',
+                total_amount=10,
+                date='2023-01-01',
+            )
+
+        (journal,) = self.logs_dir.glob('*.journal.jsonl')
+        prefix = journal.name.removesuffix('.journal.jsonl')
+        first_call = contract.multiple_refunds_requests.call_args
+
+        resumed_contract = self.contract()
+        resumed_client = MagicMock()
+        self.run_submit(resumed_contract, resumed_client, receipt_file=None, resume=prefix)
+
+        resumed_contract.load_buildings.assert_not_called()
+        resumed_contract.refunds_request_setup.assert_not_called()
+        resumed_client.files.assert_not_called()
+        self.assertEqual(resumed_contract.multiple_refunds_requests.call_args, first_call)
+        self.assertEqual(
+            first_call.args,
+            (
+                '111',
+                1,
+                '123456789',
+                'INV001',
+                10.0,
+                '2023-01-01',
+                ['guid-receipt.pdf', 'guid-prescription.pdf'],
+                False,
+                False,
+                'b1',
+                'john@example.com',
+            ),
+        )
+        resumed_client.forget_uploads.assert_called_once_with(
+            first_call.args[6], keys={guid: ['digest', False] for guid in first_call.args[6]}
+        )
+
+        completed_contract = self.contract()
+        self.run_submit(completed_contract, MagicMock(), receipt_file=None, resume=prefix)
+        completed_contract.multiple_refunds_requests.assert_not_called()
+
+    def test_resumed_submission_forgets_the_uploads_of_the_interrupted_one(self):
+        cache = DiskCache(self.tmp_path / 'cache.sqlite3')
+        guids = (f'g{i}' for i in itertools.count(1))
+
+        def api_client():
+            api_client = Client(token='tok', cache=cache)
+            api_client.post = MagicMock(side_effect=lambda *args, **kwargs: {'body': {'guid': next(guids)}})
+            return api_client
+
+        contract = self.contract()
+        contract.multiple_refunds_requests.side_effect = exceptions.ClientError('Read timed out')
+        with self.assertRaisesRegex(click.ClickException, 'Read timed out'):
+            self.run_submit(
+                contract,
+                api_client(),
+                receipt_file=self.receipt,
+                business_nif='123456789',
+                invoice_number='INV001',
+                total_amount=10,
+                date='2023-01-01',
+            )
+        (journal,) = self.logs_dir.glob('*.journal.jsonl')
+        prefix = journal.name.removesuffix('.journal.jsonl')
+        self.assertEqual(api_client().files(self.receipt, is_invoice=True), {'guid': 'g1'})
+
+        self.run_submit(self.contract(), api_client(), receipt_file=None, resume=prefix)
+
+        self.assertEqual(api_client().files(self.receipt, is_invoice=True), {'guid': 'g2'})
+
+    def test_resume_after_failed_upload_uploads_from_log_copies(self):
+        contract = self.contract()
+        api_client = MagicMock()
+        api_client.files.side_effect = exceptions.ClientError('Connection reset')
+
+        with self.assertRaisesRegex(click.ClickException, 'Connection reset'):
+            self.run_submit(
+                contract,
+                api_client,
+                receipt_file=self.receipt,
+                business_nif='123456789',
+                invoice_number='INV001',
+                total_amount=10,
+                date='2023-01-01',
+            )
+        (journal,) = self.logs_dir.glob('*.journal.jsonl')
+        prefix = journal.name.removesuffix('.journal.jsonl')
+        self.receipt.unlink()
+
+        api_client = MagicMock()
+        api_client.files.return_value = {'guid': 'g1'}
+        self.run_submit(self.contract(), api_client, receipt_file=None, resume=prefix)
+
+        api_client.files.assert_called_once_with(self.logs_dir / f'{prefix}_receipt.pdf', is_invoice=True)
+
+    def test_resume_unknown_prefix(self):
+        with self.assertRaisesRegex(click.ClickException, 'No submission journal found for 20200101_0000'):
+            Submit(receipt_file=None, resume='20200101_0000').setup_logging()
+
+    def test_receipt_file_is_required_without_resume(self):
+        with self.assertRaisesRegex(click.ClickException, 'Missing RECEIPT_FILE'):
+            Submit(receipt_file=None).setup_logging()
+
+
+class TestSubmitRefund(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.ledger = RefundStore(Path(tmp.name) / 'refunds.sqlite3')
+        self.addCleanup(self.ledger.close)
+        patcher = patch('futurehealth.commands.submit.time.sleep')
+        self.sleep = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def submission(self, receipt='INV001'):
+        return RefundSubmission('111', 1, '123456789', receipt, 10.0, '2023-01-01', ['g1'], False, False, 'b1', 'e')
+
+    def test_network_failures_are_retried_with_the_same_origin_id(self):
+        contract = MagicMock()
+        payloads = []
+
+        def post(*args):
+            payloads.append(RefundSubmission(*args).payload())
+            if len(payloads) < 3:
+                raise exceptions.ClientNetworkError('Read timed out')
+
+        contract.multiple_refunds_requests.side_effect = post
+        submission = self.submission()
+
+        self.assertTrue(submit_refund(contract, self.ledger, submission))
+
+        self.assertEqual(len({payload['originId'] for payload in payloads}), 1)
+        self.assertEqual([call.args[0] for call in self.sleep.call_args_list], [1.0, 2.0])
+        entry = self.ledger.submission(submission.key)
+        self.assertEqual((entry.status, entry.attempts, entry.documents), ('submitted', 3, ['g1']))
+        # the ledger now prevents submitting it again
+        self.assertFalse(submit_refund(contract, self.ledger, submission))
+        self.assertEqual(contract.multiple_refunds_requests.call_count, 3)
+
+    def test_exhausted_retries_leave_the_outcome_pending(self):
+        contract = MagicMock()
+        contract.multiple_refunds_requests.side_effect = exceptions.ClientNetworkError('Read timed out')
+        submission = self.submission()
+
+        with self.assertRaises(exceptions.ClientNetworkError):
+            submit_refund(contract, self.ledger, submission, retries=1)
+
+        entry = self.ledger.submission(submission.key)
+        self.assertEqual((entry.status, entry.attempts, entry.error), ('pending', 2, 'Read timed out'))
+
+    def test_api_errors_are_not_retried(self):
+        contract = MagicMock()
+        contract.multiple_refunds_requests.side_effect = exceptions.ClientAPIError({'resultMessage': 'Bad'})
+        submission = self.submission()
+
+        with self.assertRaises(exceptions.ClientAPIError):
+            submit_refund(contract, self.ledger, submission)
+
+        self.assertEqual(contract.multiple_refunds_requests.call_count, 1)
+        self.assertEqual(self.ledger.submission(submission.key).status, 'failed')
+        self.sleep.assert_not_called()
+
+    def test_batch_retries_only_network_failures(self):
+        contract = MagicMock()
+        calls = []
+
+        def batch(submissions, batch_size):
+            calls.append([s.receipt for s in submissions])
+            return [
+                RefundSubmissionResult(
+                    index,
+                    s,
+                    error=exceptions.ClientNetworkError('timeout') if s.receipt == 'B' and len(calls) == 1 else None,
+                )
+                for index, s in enumerate(submissions)
+            ]
+
+        contract.multiple_refunds_requests_batch.side_effect = batch
+        done = self.submission('C')
+        self.ledger.record_submission(done, 'submitted')
+
+        results = submit_refunds(contract, self.ledger, [self.submission('A'), self.submission('B'), done])
+
+        self.assertEqual(calls, [['A', 'B'], ['B']])
+        self.assertEqual([(r.index, r.success) for r in results], [(0, True), (1, True), (2, False)])
+        self.assertEqual(str(results[2].error), 'Already submitted from this machine')
+        self.assertEqual(self.ledger.submission(self.submission('B').key).attempts, 2)
+
+
+class TestUploadDocuments(unittest.TestCase):
+    def test_guids_follow_argument_order(self):
+        delays = {'receipt.pdf': 0.05, 'a.pdf': 0.03, 'b.pdf': 0}
+        api_client = MagicMock()
+
+        def files(path, is_invoice=False):
+            time.sleep(delays[path.name])
+            return {'guid': f'{path.name}:{is_invoice}'}
+
+        api_client.files.side_effect = files
+
+        docs = upload_documents(api_client, Path('receipt.pdf'), [Path('a.pdf'), Path('b.pdf')], workers=3)
+
+        self.assertEqual(docs, ['receipt.pdf:True', 'a.pdf:False', 'b.pdf:False'])
+
+    def test_uploads_run_concurrently_up_to_workers(self):
+        in_flight = 0
+        peak = 0
+        lock = threading.Lock()
+        api_client = MagicMock()
+
+        def files(path, is_invoice=False):
+            nonlocal in_flight, peak
+            with lock:
+                in_flight += 1
+                peak = max(peak, in_flight)
+            time.sleep(0.02)
+            with lock:
+                in_flight -= 1
+            return {'guid': path.name}
+
+        api_client.files.side_effect = files
+
+        upload_documents(api_client, Path('r.pdf'), [Path(f'{i}.pdf') for i in range(5)], workers=2)
+
+        self.assertEqual(peak, 2)
+        self.assertEqual(api_client.files.call_count, 6)
+
+    def test_failure_cancels_pending_uploads(self):
+        release = threading.Event()
+        api_client = MagicMock()
+
+        def files(path, is_invoice=False):
+            if path.name == 'bad.pdf':
+                raise exceptions.ClientError('File not found: bad.pdf')
+            release.wait(1)
+            return {'guid': path.name}
+
+        api_client.files.side_effect = files
+
+        with self.assertRaisesRegex(exceptions.ClientError, 'File not found: bad.pdf'):
+            upload_documents(
+                api_client, Path('r.pdf'), [Path('bad.pdf'), Path('c.pdf'), Path('d.pdf'), Path('e.pdf')], workers=2
+            )
+        release.set()
+
+        uploaded = [call.args[0].name for call in api_client.files.call_args_list]
+        # c.pdf may already be running when bad.pdf fails, uploads after it never start
+        self.assertEqual(uploaded[:2], ['r.pdf', 'bad.pdf'])
+        self.assertNotIn('d.pdf', uploaded)
+        self.assertNotIn('e.pdf', uploaded)
+
+    def test_single_worker_uploads_sequentially(self):
+        api_client = MagicMock()
+        api_client.files.side_effect = [{'guid': 'g1'}, exceptions.ClientError('boom')]
+
+        with self.assertRaisesRegex(exceptions.ClientError, 'boom'):
+            upload_documents(api_client, Path('r.pdf'), [Path('a.pdf'), Path('b.pdf')], workers=1)
+
+        self.assertEqual(api_client.files.call_count, 2)
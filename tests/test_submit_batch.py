@@ -0,0 +1,265 @@
+import hashlib
+import itertools
+import json
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+import click
+
+from futurehealth.client import (
+    Client,
+    RefundsRequestSetupResponse,
+    RefundSubmission,
+    RefundSubmissionResult,
+    exceptions,
+)
+from futurehealth.client.cache import DiskCache
+from futurehealth.client.models import Building, Person, Reimbursement, Service
+from futurehealth.commands.submit_batch import SubmitBatch, read_manifest
+from futurehealth.utils.store import SUBMITTED, RefundStore
+
+from .test_submit import IsolatedLedgerTestCase
+
+
+def setup_response():
+    return RefundsRequestSetupResponse(
+        services=[
+            Service(Id=1, Name='Dentist', IsMandatoryInvoiceFile=True, IsMandatoryAditionalFile=False),
+            Service(Id=2, Name='Medicamentos', IsMandatoryInvoiceFile=True, IsMandatoryAditionalFile=True),
+        ],
+        insured_persons=[
+            Person(CardNumber='111', Name='Alice Doe', Email='alice@example.com'),
+            Person(CardNumber='222', Name='Bob Doe', Email='bob@example.com'),
+        ],
+        other={},
+    )
+
+
+class TestReadManifest(unittest.TestCase):
+    def test_csv_manifest_resolves_paths_and_splits_attachments(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            manifest = Path(tmp) / 'manifest.csv'
+            manifest.write_text(
+                'receipt,attachments,business_nif,invoice_number,total_amount,date,person,service,building\n'
+                'r1.pdf,p1.pdf;p2.pdf,123456789,INV1,10.5,2026-01-01,Alice,Dentist,\n'
+                'r2.pdf,,123456789,INV2,20,2026-01-02,Bob,Dentist,Clinic\n'
+            )
+
+            rows = read_manifest(manifest)
+
+        self.assertEqual([number for number, _ in rows], [1, 2])
+        self.assertEqual(rows[0][1]['receipt'], Path(tmp) / 'r1.pdf')
+        self.assertEqual(rows[0][1]['attachments'], [Path(tmp) / 'p1.pdf', Path(tmp) / 'p2.pdf'])
+        self.assertNotIn('building', rows[0][1])
+        self.assertEqual(rows[1][1]['attachments'], [])
+        self.assertEqual(rows[1][1]['building'], 'Clinic')
+
+    def test_jsonl_manifest(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            manifest = Path(tmp) / 'manifest.jsonl'
+            manifest.write_text(
+                json.dumps({'receipt': '/abs/r1.pdf', 'attachments': ['p1.pdf'], 'business_nif': '123456789'}) + '\n\n'
+            )
+
+            rows = read_manifest(manifest)
+
+        self.assertEqual(
+            rows,
+            [(1, {'receipt': Path('/abs/r1.pdf'), 'attachments': [Path(tmp) / 'p1.pdf'], 'business_nif': '123456789'})],
+        )
+
+    def test_unreadable_manifest(self):
+        with self.assertRaisesRegex(click.ClickException, 'Could not read manifest'):
+            read_manifest(Path('/does/not/exist.csv'))
+
+
+class TestSubmitBatchCommand(IsolatedLedgerTestCase):
+    def run_batch(self, manifest_text, batch_errors=None, api_client=None, files=None, **kwargs):
+        contract = MagicMock()
+        batch_errors = batch_errors or {}
+        contract.multiple_refunds_requests_batch.side_effect = lambda submissions, batch_size: [
+            RefundSubmissionResult(index, submission, error=batch_errors.get(submission.receipt))
+            for index, submission in enumerate(submissions)
+        ]
+        contract.validate_feature.return_value = True
+        contract.refunds_request_setup.return_value = setup_response()
+        contract.load_buildings.return_value = [Building(id='b1', name='Clinic')]
+        if api_client is None:
+            api_client = MagicMock()
+            api_client.files.side_effect = lambda path, is_invoice=False: {'guid': f'guid-{path.name}'}
+
+        with tempfile.TemporaryDirectory() as tmp:
+            manifest = Path(tmp) / 'manifest.csv'
+            manifest.write_text(manifest_text)
+            for name, content in (files or {}).items():
+                (Path(tmp) / name).write_bytes(content)
+            cmd = SubmitBatch(manifest=manifest, results=None, **{'batch_size': 10, **kwargs})
+            cmd.contract = contract
+            cmd.client = api_client
+            error = None
+            with (
+                patch('futurehealth.commands.submit_batch.ensure_error_details_files'),
+                patch('futurehealth.commands.submit_batch.click.echo') as echo,
+            ):
+                try:
+                    cmd()
+                except click.ClickException as e:
+                    error = e
+            lines = [json.loads(line) for line in (Path(tmp) / 'manifest.results.jsonl').read_text().splitlines()]
+        return contract, api_client, lines, echo, error
+
+    def test_rows_are_submitted_with_contract_resolved_once(self):
+        contract, api_client, lines, echo, error = self.run_batch(
+            'receipt,attachments,business_nif,invoice_number,total_amount,date,person,service\n'
+            'r1.pdf,p1.pdf,123456789,INV1,10.5,01/02/2026,Alice,Dentist\n'
+            'r2.pdf,,123456789,INV2,20,2026-02-02,Bob,Medic\n',
+            workers=2,
+            batch_size=3,
+        )
+
+        self.assertIsNone(error)
+        contract.validate_feature.assert_called_once_with('REFUNDS_SUBMISSION')
+        contract.refunds_request_setup.assert_called_once_with()
+        contract.multiple_refunds_requests_batch.assert_called_once()
+        submissions = contract.multiple_refunds_requests_batch.call_args.args[0]
+        self.assertEqual(contract.multiple_refunds_requests_batch.call_args.kwargs, {'batch_size': 3})
+        self.assertEqual(
+            submissions[0],
+            RefundSubmission(
+                '111',
+                1,
+                '123456789',
+                'INV1',
+                10.5,
+                '2026-02-01',
+                ['guid-r1.pdf', 'guid-p1.pdf'],
+                False,
+                False,
+                'b1',
+                'alice@example.com',
+            ),
+        )
+        self.assertEqual((submissions[1].card_number, submissions[1].service_id), ('222', 2))
+
+        rows = sorted((line for line in lines if 'row' in line), key=lambda line: line['row'])
+        self.assertEqual([(row['row'], row['status']) for row in rows], [(1, 'submitted'), (2, 'submitted')])
+        self.assertEqual(rows[0]['documents'], ['guid-r1.pdf', 'guid-p1.pdf'])
+        self.assertEqual(lines[-1]['summary']['rows'], 2)
+        self.assertEqual(lines[-1]['summary']['submitted'], 2)
+        self.assertIn('2 submitted, 0 failed', echo.call_args.args[0])
+
+    def test_rows_sharing_an_attachment_get_their_own_document(self):
+        guids = (f'g{i}' for i in itertools.count(1))
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = DiskCache(Path(tmp) / 'cache.sqlite3')
+            api_client = Client(token='tok', cache=cache)
+            api_client.post = MagicMock(side_effect=lambda *args, **kwargs: {'body': {'guid': next(guids)}})
+            # uploaded by an earlier run that failed to submit it
+            cache_key = api_client._cache_key('files', (hashlib.sha256(b'same').hexdigest(), False))
+            cache.set('files', cache_key, {'guid': 'g0'}, 60)
+
+            contract, api_client, lines, echo, error = self.run_batch(
+                'receipt,attachments,business_nif,invoice_number,total_amount,date,person,service\n'
+                'r1.pdf,prescription.pdf,123456789,INV1,10,2026-02-01,Alice,Dentist\n'
+                'r2.pdf,prescription.pdf,123456789,INV2,20,2026-02-02,Alice,Dentist\n',
+                batch_errors={'INV2': exceptions.ClientError('duplicate')},
+                api_client=api_client,
+                files={'r1.pdf': b'r1', 'r2.pdf': b'r2', 'prescription.pdf': b'same'},
+            )
+            released = cache.get('files', cache_key)
+            cache.close()
+
+        documents = [submission.docs for submission in contract.multiple_refunds_requests_batch.call_args.args[0]]
+        attachments = [docs[1] for docs in documents]
+        self.assertIn('g0', attachments)
+        self.assertEqual(len(set(attachments)), 2)
+        self.assertEqual(sorted(guid for docs in documents for guid in docs), ['g0', 'g1', 'g2', 'g3'])
+        # the failed row's documents are left for the next run
+        self.assertEqual(released, {'guid': attachments[1]})
+
+    def test_failed_rows_are_reported_without_stopping_the_batch(self):
+        contract, api_client, lines, echo, error = self.run_batch(
+            'receipt,business_nif,invoice_number,total_amount,date,person,service\n'
+            'r1.pdf,123456789,INV1,abc,2026-02-01,Alice,Dentist\n'
+            'r2.pdf,123456789,INV2,20,2026-02-02,Doe,Dentist\n'
+            'r3.pdf,123456789,INV3,30,2026-02-03,Alice,Dentist\n'
+            'r4.pdf,123456789,INV4,40,2026-02-04,Alice,Dentist\n',
+            batch_errors={'INV4': exceptions.ClientError('duplicate')},
+        )
+
+        rows = {line['row']: line for line in lines if 'row' in line}
+        self.assertEqual(rows[1]['status'], 'failed')
+        self.assertIn('total_amount', rows[1]['error'])
+        self.assertEqual(rows[2]['status'], 'failed')
+        self.assertIn('Multiple persons found', rows[2]['error'])
+        self.assertEqual(rows[3]['status'], 'submitted')
+        self.assertEqual((rows[4]['status'], rows[4]['error']), ('failed', 'duplicate'))
+        self.assertEqual(rows[4]['documents'], ['guid-r4.pdf'])
+        self.assertEqual(
+            [call.args[0][0].receipt for call in contract.multiple_refunds_requests_batch.call_args_list], ['INV3']
+        )
+        self.assertEqual(lines[-1]['summary']['failed'], 3)
+        self.assertRegex(error.message, '3 of 4 rows failed')
+
+    def test_duplicate_rows_fail_before_any_upload(self):
+        with RefundStore(self.refunds_db) as store:
+            store.record_submission(
+                RefundSubmission('111', 1, '123456789', 'INV1', 10, '2026-02-01', [], False, False, 'b1', None),
+                SUBMITTED,
+            )
+
+        contract, api_client, lines, echo, error = self.run_batch(
+            'receipt,business_nif,invoice_number,total_amount,date,person,service\n'
+            'r1.pdf,123456789,INV1,10,2026-02-01,Alice,Dentist\n'
+            'r2.pdf,123456789,INV2,20,2026-02-02,Alice,Dentist\n'
+            'r3.pdf,123456789,inv2,20.00,02/02/2026,Alice,Dentist\n'
+        )
+
+        rows = {line['row']: line for line in lines if 'row' in line}
+        self.assertRegex(rows[1]['error'], 'Looks already submitted: submitted from this machine')
+        self.assertEqual(rows[2]['status'], 'submitted')
+        self.assertEqual((rows[3]['status'], rows[3]['error']), ('failed', 'Duplicate of row 2'))
+        self.assertEqual([call.args[0].name for call in api_client.files.call_args_list], ['r2.pdf'])
+
+    def test_allow_duplicate_submits_rows_found_in_refund_history(self):
+        with RefundStore(self.refunds_db) as store:
+            store.upsert(Reimbursement(process_nr='P1', expense_date='2026-02-01', invoice_nr='INV1', total_value=10))
+
+        contract, api_client, lines, echo, error = self.run_batch(
+            'receipt,business_nif,invoice_number,total_amount,date,person,service\n'
+            'r1.pdf,123456789,INV1,10,2026-02-01,Alice,Dentist\n',
+            allow_duplicate=True,
+        )
+
+        self.assertIsNone(error)
+        self.assertEqual(lines[0]['status'], 'submitted')
+
+    def test_upload_errors_are_recorded_per_row(self):
+        contract = MagicMock()
+        contract.load_buildings.return_value = [Building(id='b1', name='Clinic')]
+        cmd = SubmitBatch(manifest=Path('m.csv'), results=None)
+        cmd.contract = contract
+        cmd.client = MagicMock()
+        cmd.client.files.side_effect = exceptions.ClientError('File not found: r.pdf')
+
+        resolved = cmd.check_row(
+            7,
+            {
+                'receipt': Path('r.pdf'),
+                'business_nif': '123456789',
+                'invoice_number': 'I',
+                'total_amount': 1,
+                'date': '2026-01-01',
+                'person': 'Alice',
+                'service': 'Dentist',
+            },
+            setup_response(),
+            {},
+        )
+        submission = cmd.prepare_row(resolved)
+
+        self.assertIsNone(submission)
+        result = resolved.result
+        self.assertEqual((result.row, result.status, result.error), (7, 'failed', 'File not found: r.pdf'))
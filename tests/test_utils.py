@@ -3,7 +3,7 @@ from pathlib import Path
 from unittest.mock import patch
 
 from futurehealth.commands.cli import CLI
-from futurehealth.utils import errors_path, logs_path, token_path, validate_nif
+from futurehealth.utils import cache_path, errors_path, logs_path, refunds_db_path, token_path, validate_nif
 from futurehealth.utils import locale as fh_locale
 
 
@@ -12,6 +12,8 @@ class TestPaths(unittest.TestCase):
         self.assertEqual(token_path(), CLI.CONFIG_DEFAULT_PATH.parent / 'token.txt')
         self.assertEqual(logs_path(), CLI.CONFIG_DEFAULT_PATH.parent / 'logs')
         self.assertEqual(errors_path(), CLI.CONFIG_DEFAULT_PATH.parent / 'errors.json')
+        self.assertEqual(refunds_db_path(), CLI.CONFIG_DEFAULT_PATH.parent / 'refunds.sqlite3')
+        self.assertEqual(cache_path(), CLI.CONFIG_DEFAULT_PATH.parent / 'cache.sqlite3')
 
     def test_paths_are_next_to_custom_config(self):
         config = Path('/tmp/future-healthcare/config.toml')
@@ -19,6 +21,8 @@ class TestPaths(unittest.TestCase):
         self.assertEqual(token_path(config), Path('/tmp/future-healthcare/token.txt'))
         self.assertEqual(logs_path(config), Path('/tmp/future-healthcare/logs'))
         self.assertEqual(errors_path(config), Path('/tmp/future-healthcare/errors.json'))
+        self.assertEqual(refunds_db_path(config), Path('/tmp/future-healthcare/refunds.sqlite3'))
+        self.assertEqual(cache_path(config), Path('/tmp/future-healthcare/cache.sqlite3'))
 
     def test_explicit_paths_override_config_defaults(self):
         config = Path('/tmp/future-healthcare/config.toml')